@@ -1,15 +1,41 @@
 
+import os 
 import dash 
 import dash_bootstrap_components as dbc 
+import flask 
 from dash import html 
-from source.graphs.sp500 import sp500_tab
-from source.graphs.russell3000 import russell3000_tab
-from source.graphs.russell2000 import russell2000_tab  
-from source.graphs.nasdaq import nasdaq_tab
-from source.graphs.performance import performance_tab
-from source.graphs.macro_trends import macro_trend_tab 
-
-app = dash.Dash(__name__, external_stylesheets = [dbc.themes.LUX])
+from dash.dependencies import Input, Output 
+from source.graphs.registry import registry, SHARED_DATA 
+from source.graphs.cache import callback_cache 
+from source.graphs.metrics import callback_metrics 
+from source.utils import shared, builds 
+from source.graphs.sp500 import sp500_tab, sp500_layout 
+from source.graphs.russell3000 import russell3000_tab, russell3000_layout 
+from source.graphs.russell2000 import russell2000_tab, russell2000_layout  
+from source.graphs.nasdaq import nasdaq_tab, nasdaq_layout 
+from source.graphs.performance import performance_tab, performance_layout 
+from source.graphs.macro_trends import macro_trend_tab, macro_trend_layout 
+
+# with versioned builds (update.py, versioned_builds: true) the current build is served;
+# a new build is swapped in without a restart (SPEAKINGCHARTS_RELOAD_INTERVAL seconds between checks)
+registry.version = builds.use_current_build()
+if registry.version is not None:
+	callback_cache.invalidate(registry.version)
+
+# importing graph modules only registers callbacks and data loaders;
+# datasets are loaded when a tab is first rendered or by the background prewarm
+# SPEAKINGCHARTS_PREWARM=0 turns the prewarm off (each tab loads on first visit)
+PREWARM = os.environ.get('SPEAKINGCHARTS_PREWARM', '1') not in ('0', 'false', 'False')
+
+tab_layouts = {sp500_tab.tab_id: sp500_layout, 
+				russell3000_tab.tab_id: russell3000_layout, 
+					russell2000_tab.tab_id: russell2000_layout, 
+						nasdaq_tab.tab_id: nasdaq_layout, 
+							performance_tab.tab_id: performance_layout, 
+								macro_trend_tab.tab_id: macro_trend_layout}
+
+# components of tabs are not in the initial layout 
+app = dash.Dash(__name__, external_stylesheets = [dbc.themes.LUX], suppress_callback_exceptions = True)
 server = app.server 
 
 app.layout = html.Div([
@@ -21,8 +47,38 @@ app.layout = html.Div([
 						russell2000_tab,  
 							nasdaq_tab,
 								performance_tab, 
-									macro_trend_tab], id = 'all tabs')
+									macro_trend_tab], id = 'all tabs', active_tab = sp500_tab.tab_id), 
+			html.Div(id = 'tab content')
 	], id = 'app layout')
 
+@app.callback(Output('tab content', 'children'), Input('all tabs', 'active_tab'))
+def render_tab(active_tab):
+	return tab_layouts[active_tab]()
+
+# started on the first request of each worker; threads of a preloading parent do not survive a fork 
+@server.before_request 
+def follow_builds():
+	registry.watch_builds()
+
+# update requests of callbacks are timed by hooks of the server 
+callback_metrics.init_app(server)
+
+# latency, response bytes and cache hits of each callback 
+# of the worker answering the request, in Prometheus text format 
+@server.route('/metrics')
+def metrics():
+	return flask.Response(callback_metrics.render(), mimetype = 'text/plain; version=0.0.4; charset=utf-8')
+
+# memory report of the worker answering the request; with SPEAKINGCHARTS_SHARED_DATA=1
+# the pss of workers (their share of the mapped datasets) is much lower than their rss 
+@server.route('/_memory')
+def memory_report():
+	return flask.jsonify({'memory_kb': shared.memory_usage(), 'shared_data': SHARED_DATA, 'build': registry.version, 
+				'loaded': [name for name in registry.names if registry.is_loaded(name)], 
+					'load_times': registry.load_times})
+
+if PREWARM:
+	registry.prewarm(names = list(tab_layouts.keys()))
+
 if __name__ == '__main__':
 	app.run_server(debug = True, use_reloader = True)
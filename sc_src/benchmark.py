@@ -0,0 +1,207 @@
+# ######################################################## #
+# Offline benchmarks of the hot paths on synthetic indices #
+# ######################################################## #
+
+from source.instruments.indices import Index, SP500, Russell3000
+from source.instruments.panel import PricePanel
+from source.instruments import synthetic
+from source.analytics.performance import Performance
+from source.utils import keys, tools, http_cache, providers
+from timeit import default_timer
+from datetime import datetime
+from os import path
+import statistics
+import platform
+import tempfile
+import argparse
+import shutil
+import json
+import sys
+
+INDEX_CLASSES = {'SP500': SP500, 'Russell3000': Russell3000}
+
+
+def time_call(func, repeats = 3):
+	"""
+	returns run times of func in seconds
+	"""
+	runs = []
+	for _ in range(repeats):
+		start = default_timer()
+		func()
+		runs.append(default_timer() - start)
+	return runs
+
+def summarize(runs):
+	return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+def build_universe(size, years = 5, root = None):
+	"""
+	generates and writes a synthetic index of size (a key of synthetic.UNIVERSES) in root/size;
+		keys.DATA_PATH and keys.LOAD_PATH are set to it so the index is loaded as in the app
+	"""
+	num_tickers, index_name = synthetic.UNIVERSES[size]
+	data_path = tools.make_dir(path.join(root, size))
+	keys.DATA_PATH = data_path
+	keys.LOAD_PATH = data_path
+	http_cache.configure(mode = 'replay', cache_path = path.join(data_path, 'http_cache'))
+	start = default_timer()
+	assets = synthetic.generate_assets(num_tickers = num_tickers, years = years, seed = 0)
+	synthetic.write_index(INDEX_CLASSES[index_name], assets, data_path = data_path)
+	print(f'{size}: wrote {num_tickers} tickers in {default_timer() - start:.1f} s')
+	return INDEX_CLASSES[index_name]
+
+def benchmark_index(index_class, size = None, repeats = 3):
+	"""
+	times loading and the calculations behind the graphs of an index
+	"""
+	results = {}
+	results['load_assets'] = time_call(lambda: index_class.load_assets(), repeats = repeats)
+	results['load_shared'] = time_call(lambda: index_class.load_shared(), repeats = repeats)
+	index = index_class.load_assets()
+	index.main_save_path = path.join(keys.LOAD_PATH, index_class.__name__.upper())
+	synthetic.record_risk_free(index)
+	# the panel is timed on its own above; returns are timed on a built panel as in the app
+	index.panel
+	last_year = (tools.get_one_year_ago(index.date_range[1]), index.date_range[1])
+	results['panel_from_assets'] = time_call(lambda: PricePanel.from_assets(index.assets), repeats = repeats)
+	results['compute_investment_returns'] = time_call(
+				lambda: index.compute_investment_returns(within_dates = last_year), repeats = repeats)
+	results['generate_sector_mean_return_long'] = time_call(
+				lambda: index.generate_sector_mean_return_long(freq = 'M', save_data = False), repeats = repeats)
+	results['compute_risk_return'] = time_call(
+				lambda: index.compute_risk_return(within_dates = last_year), repeats = repeats)
+	performance = Performance(universe = index, main_save_path = path.join(keys.DATA_PATH, 'Performance'))
+	results['compute_investment_return_distribution'] = time_call(
+				lambda: performance.compute_investment_return_distribution(within_dates = last_year), repeats = repeats)
+	shared_index = index_class.load_shared()
+	synthetic.record_risk_free(shared_index)
+	results.update(benchmark_callbacks(shared_index, size = size, repeats = repeats))
+	return results
+
+def benchmark_callbacks(index, size = None, repeats = 3):
+	"""
+	times the callbacks of the components of the index pages; the callback cache is emptied
+		before each run so that every run computes its figure
+	"""
+	try:
+		from source.graphs import components
+		from source.graphs.cache import callback_cache
+	except ImportError as error:
+		print(f'callbacks are not benchmarked: {error}')
+		return {}
+	index_name = f'bench_{size}'
+	start_date, end_date = [date.strftime('%Y-%m-%d') for date in index.date_range]
+	sector_history = components.SectorReturnHistory(index_name = index_name, index_object = index)
+	stock_returns = components.StockReturns(index_name = index_name, index_object = index)
+	risk_return = components.StockRiskReturn(index_name = index_name, index_object = index)
+	intervals = components.IntervalReturnDisplay(index_name = index_name, index_object = index)
+	return_columns = intervals.options[:2]
+	callbacks = {'callback_sector_return_history': lambda: sector_history.plot_sector_return_history(1,
+								start_date, end_date, index.sector_keys[:3]),
+				'callback_stock_return': lambda: stock_returns.plot_stock_return(1, start_date, end_date, 100),
+				'callback_risk_return': lambda: risk_return.plot_risk_return_sharpe(1, start_date, end_date,
+								index.asset_names[:5], 'Sharpe Ratio'),
+				'callback_interval_returns': lambda: intervals.plot_interval_returns(1, *return_columns,
+								'by first value', 100)}
+	results = {}
+	for name, plot in callbacks.items():
+		runs = []
+		for _ in range(repeats):
+			callback_cache.invalidate()
+			runs.extend(time_call(plot, repeats = 1))
+		results[name] = runs
+	return results
+
+def benchmark_ingestion(num_tickers = 500, workers = (1, 4, 8, 16), batch_size = 100, repeats = 3, **provider_options):
+	"""
+	times bulk pulls of num_tickers from the fake provider (see providers.FakeProvider for the options)
+		with each number of workers; returns run times and the ingestion report and provider stats of each
+	"""
+	providers.configure('fake', **provider_options)
+	provider = providers.get_provider()
+	symbols = [f'FAKE{number:05d}' for number in range(num_tickers)]
+	results, reports = {}, {}
+	for max_workers in workers:
+		name = f'bulk_pull_workers_{max_workers}'
+		provider.stats.clear()
+		runs = []
+		for _ in range(repeats):
+			start = default_timer()
+			_, report, _ = Index._pull_symbols(symbols, name = 'BENCH', period = '5y', bulk = True,
+							batch_size = batch_size, max_workers = max_workers, checkpoint = False)
+			runs.append(default_timer() - start)
+		results[name] = runs
+		reports[name] = {'report': report.to_dict(), 'provider': dict(provider.stats)}
+	return results, reports
+
+def compare(results, baseline, tolerance = 0.25, noise = 0.005):
+	"""
+	returns a list of (size, benchmark, baseline median, new median) of regressions
+		a benchmark regresses if its median is more than tolerance slower than the baseline
+		and the difference is larger than noise seconds
+	"""
+	regressions = []
+	for size, benchmarks in results['sizes'].items():
+		for name, summary in benchmarks.items():
+			base = baseline.get('sizes', {}).get(size, {}).get(name)
+			if base is None:
+				continue
+			if summary['median'] > base['median']*(1 + tolerance) and summary['median'] - base['median'] > noise:
+				regressions.append((size, name, base['median'], summary['median']))
+	return regressions
+
+def print_report(results, regressions):
+	for size, benchmarks in results['sizes'].items():
+		print(f'### {size} ###')
+		for name, summary in benchmarks.items():
+			print(f'{name:<45}{summary["median"]*1000:>12.1f} ms (min {summary["min"]*1000:.1f} ms)')
+	for size, name, base, new in regressions:
+		print(f'REGRESSION {size} {name}: {base*1000:.1f} ms -> {new*1000:.1f} ms')
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'benchmarks on synthetic indices')
+	parser.add_argument('-sizes', nargs = '*', type = str, default = ['sp500', 'russell3000'],
+					choices = list(synthetic.UNIVERSES.keys()), help = 'universes to benchmark')
+	parser.add_argument('-repeats', type = int, default = 3, help = 'runs of each benchmark')
+	parser.add_argument('-years', type = int, default = 5, help = 'years of daily bars')
+	parser.add_argument('-output', type = str, default = 'bench_results.json', help = 'results file')
+	parser.add_argument('-baseline', type = str, default = None, help = 'results file to compare with')
+	parser.add_argument('-save_baseline', type = str, default = None, help = 'also write results as a baseline')
+	parser.add_argument('-tolerance', type = float, default = 0.25, help = 'allowed slow down of medians')
+	parser.add_argument('-data_path', type = str, default = None, help = 'where synthetic indices are written')
+	parser.add_argument('-keep_data', action = 'store_true', help = 'keep the synthetic indices')
+	parser.add_argument('-ingestion', type = int, default = 0, help = 'tickers of bulk pulls from the fake provider (0: none)')
+	parser.add_argument('-workers', nargs = '*', type = int, default = [1, 4, 8, 16], help = 'max_workers of bulk pulls')
+	parser.add_argument('-provider_options', type = str, default = '{"latency": 0.05}',
+					help = 'json of options of the fake provider: latency, jitter, error_rate, rate_limit, retries')
+	args = parser.parse_args()
+
+	root = args.data_path if args.data_path is not None else tempfile.mkdtemp(prefix = 'speakingcharts_bench_')
+	results = {'meta': {'time': datetime.now().isoformat(timespec = 'seconds'), 'python': platform.python_version(),
+					'machine': platform.machine(), 'repeats': args.repeats, 'years': args.years}, 'sizes': {}}
+	try:
+		for size in args.sizes:
+			index_class = build_universe(size, years = args.years, root = root)
+			results['sizes'][size] = {name: summarize(runs) for name, runs in
+							benchmark_index(index_class, size = size, repeats = args.repeats).items()}
+		if args.ingestion > 0:
+			runs, results['ingestion'] = benchmark_ingestion(num_tickers = args.ingestion, workers = args.workers,
+							repeats = args.repeats, **json.loads(args.provider_options))
+			results['sizes']['ingestion'] = {name: summarize(name_runs) for name, name_runs in runs.items()}
+	finally:
+		if not args.keep_data and args.data_path is None:
+			shutil.rmtree(root, ignore_errors = True)
+
+	for file_name in [args.output, args.save_baseline]:
+		if file_name is not None:
+			with open(file_name, 'w') as f:
+				json.dump(results, f, indent = 2)
+
+	regressions = []
+	if args.baseline is not None:
+		with open(args.baseline) as f:
+			regressions = compare(results, json.load(f), tolerance = args.tolerance)
+	print_report(results, regressions)
+	if regressions:
+		sys.exit(1)
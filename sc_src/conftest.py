@@ -0,0 +1,8 @@
+# ############################################# #
+# pytest runs from sc_src: python -m pytest     #
+# tests import the source package from here     #
+# ############################################# #
+import sys
+from os import path
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
@@ -0,0 +1,241 @@
+
+# ########################################################## #
+# Load test of the dashboard callbacks: concurrent clients   #
+# post realistic requests to /_dash-update-component         #
+# ########################################################## #
+
+from source.utils import tools
+from timeit import default_timer
+from datetime import datetime, timedelta
+from importlib import import_module
+from threading import Thread, Lock
+import numpy as np
+import argparse
+import random
+import time
+import json
+
+# graph modules of each data key; components of the callbacks are read from them
+GRAPH_MODULES = {'sp500': 'source.graphs.sp500', 'russell3000': 'source.graphs.russell3000',
+					'russell2000': 'source.graphs.russell2000', 'nasdaq': 'source.graphs.nasdaq'}
+
+# date ranges users choose and how often; the fraction of custom ranges (random start and end) is -custom_fraction
+DATE_RANGES = {'all': (None, 0.3), 'two_years': (tools.get_two_years_ago, 0.1),
+				'one_year': (tools.get_one_year_ago, 0.2), 'six_months': (tools.get_six_months_ago, 0.15),
+					'three_months': (tools.get_three_months_ago, 0.1), 'one_month': (tools.get_one_month_ago, 0.1),
+						'one_week': (tools.get_one_week_ago, 0.05)}
+# number of stocks of StockReturns (the dropdown offers multiples of 50) and how often
+STOCK_COUNTS = {50: 0.4, 100: 0.25, 150: 0.1, 200: 0.1, 300: 0.1, 500: 0.05}
+
+
+class RequestMix:
+	"""
+	random requests of the sector return history and stock return callbacks of indices
+		date ranges follow DATE_RANGES within the dates of the index (or date_range if given),
+		1 to 4 sectors of the index are selected and stock counts follow STOCK_COUNTS up to the stocks of the index
+	requests of the same seed are the same; repeated requests hit the callback cache as they would in use
+	"""
+	def __init__(self, components = None, date_range = None, custom_fraction = 0.1, seed = 0):
+		self.components = components
+		self.date_range = date_range
+		self.custom_fraction = custom_fraction
+		self.random = random.Random(seed)
+
+	@staticmethod
+	def _state(component_id, prop, value):
+		return {'id': component_id, 'property': prop, 'value': value}
+
+	@staticmethod
+	def _body(component, value, start, end):
+		return {'output': component.graph_id + '.figure', 'outputs': {'id': component.graph_id, 'property': 'figure'},
+					'inputs': [{'id': component.submit_button_id, 'property': 'n_clicks', 'value': 1}],
+						'state': [RequestMix._state(component.date_picker_id, 'start_date', start),
+							RequestMix._state(component.date_picker_id, 'end_date', end),
+								RequestMix._state(component.dropdown_id, 'value', value)],
+									'changedPropIds': [component.submit_button_id + '.n_clicks']}
+
+	def dates(self, component):
+		if self.date_range is not None:
+			start_date, end_date = self.date_range
+		else:
+			start_date, end_date = tools.to_date(component.index_start_date), tools.to_date(component.index_end_date)
+		days = (end_date - start_date).days
+		if days > 7 and self.random.random() < self.custom_fraction:
+			start = start_date + timedelta(days = self.random.randint(0, days - 7))
+			end = start + timedelta(days = self.random.randint(7, (end_date - start).days))
+		else:
+			names = list(DATE_RANGES.keys())
+			name = self.random.choices(names, weights = [DATE_RANGES[name][1] for name in names])[0]
+			start_of = DATE_RANGES[name][0]
+			start = start_date if start_of is None else max(tools.to_date(start_of(end_date)), start_date)
+			end = end_date
+		return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+	def sector_return_history(self, component):
+		sectors = list(component.index_object.sector_keys)
+		num_sectors = min(self.random.choices([1, 2, 3, 4], weights = [0.4, 0.3, 0.2, 0.1])[0], len(sectors))
+		return self._body(component, self.random.sample(sectors, num_sectors), *self.dates(component))
+
+	def stock_returns(self, component):
+		counts = [count for count in STOCK_COUNTS if count <= max(component.index_object.num_assets, 50)]
+		num_stocks = self.random.choices(counts, weights = [STOCK_COUNTS[count] for count in counts])[0]
+		return self._body(component, num_stocks, *self.dates(component))
+
+	def next(self):
+		"""
+		returns the name of the callback and the request body
+		"""
+		data_key, callback_name, component = self.random.choice(self.components)
+		return f'{data_key}/{callback_name}', getattr(self, callback_name)(component)
+
+
+def load_components(data_keys):
+	"""
+	[(data key, callback name, component)] of the callbacks under test
+		importing graph modules registers their callbacks; the options of requests (dates, sectors,
+		number of stocks) are read from the data of the index, so a remote server must serve the same data
+	"""
+	components = []
+	for data_key in data_keys:
+		module = import_module(GRAPH_MODULES[data_key])
+		components.append((data_key, 'sector_return_history', module.sector_return_history))
+		components.append((data_key, 'stock_returns', module.stock_returns))
+	return components
+
+
+class InProcessClient:
+	"""
+	posts to app.server through the flask test client; one client per thread
+	"""
+	def __init__(self, server):
+		self.client = server.test_client()
+
+	def post(self, body):
+		response = self.client.post('/_dash-update-component', json = body)
+		return response.status_code, len(response.data)
+
+
+class HttpClient:
+	"""
+	posts to a running server (python app.py or gunicorn) over keep alive connections
+	"""
+	def __init__(self, url):
+		import requests
+		self.url = url.rstrip('/') + '/_dash-update-component'
+		self.session = requests.Session()
+
+	def post(self, body):
+		response = self.session.post(self.url, json = body, timeout = 300)
+		return response.status_code, len(response.content)
+
+
+def run_clients(make_client, mixes, duration = 30, requests_per_client = None, think_time = 0.0):
+	"""
+	each client posts requests of its own mix one after another (think_time seconds apart)
+		until duration seconds passed or it posted requests_per_client requests
+	returns a list of (callback name, seconds, status, response bytes) and the wall time
+	"""
+	records = []
+	lock = Lock()
+	deadline = default_timer() + duration
+
+	def client_loop(mix):
+		client = make_client()
+		count = 0
+		while default_timer() < deadline and (requests_per_client is None or count < requests_per_client):
+			name, body = mix.next()
+			start = default_timer()
+			try:
+				status, size = client.post(body)
+			except Exception as error:
+				status, size = type(error).__name__, 0
+			seconds = default_timer() - start
+			with lock:
+				records.append((name, seconds, status, size))
+			count += 1
+			if think_time > 0:
+				time.sleep(max(min(think_time, deadline - default_timer()), 0))
+
+	start = default_timer()
+	threads = [Thread(target = client_loop, args = (mix,), daemon = True) for mix in mixes]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return records, default_timer() - start
+
+def summarize(records, wall_time):
+	"""
+	{callback name: throughput, p50/p95/p99/max latency in ms, errors, mean response bytes}; 'all' sums all callbacks
+	"""
+	names = sorted(set(record[0] for record in records))
+	summary = {}
+	for name in names + ['all']:
+		group = [record for record in records if name == 'all' or record[0] == name]
+		if not group:
+			continue
+		seconds = np.array([record[1] for record in group])
+		ok = [record for record in group if isinstance(record[2], int) and record[2] < 400]
+		summary[name] = {'requests': len(group), 'errors': len(group) - len(ok),
+					'throughput': len(group)/wall_time if wall_time > 0 else 0.0,
+						'p50_ms': float(np.percentile(seconds, 50)*1000), 'p95_ms': float(np.percentile(seconds, 95)*1000),
+							'p99_ms': float(np.percentile(seconds, 99)*1000), 'max_ms': float(seconds.max()*1000),
+								'mean_bytes': float(np.mean([record[3] for record in ok])) if ok else 0.0}
+	return summary
+
+def print_summary(clients, summary):
+	print(f'### {clients} clients ###')
+	print(f'{"callback":<40}{"requests":>10}{"errors":>8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+	for name, stats in summary.items():
+		print(f'{name:<40}{stats["requests"]:>10}{stats["errors"]:>8}{stats["throughput"]:>10.2f}{stats["p50_ms"]:>10.1f}'
+				f'{stats["p95_ms"]:>10.1f}{stats["p99_ms"]:>10.1f}{stats["max_ms"]:>10.1f}')
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'load test of the dashboard callbacks')
+	parser.add_argument('-url', type = str, default = None, help = 'url of a running server; the app is loaded in process if not given')
+	parser.add_argument('-indices', nargs = '*', type = str, default = ['sp500'], choices = list(GRAPH_MODULES.keys()),
+					help = 'indices whose callbacks are called')
+	parser.add_argument('-clients', nargs = '*', type = int, default = [1, 4, 16], help = 'concurrent clients; one run for each number')
+	parser.add_argument('-duration', type = float, default = 30, help = 'seconds of each run')
+	parser.add_argument('-requests', type = int, default = None, help = 'requests of each client (ends a run before duration)')
+	parser.add_argument('-think_time', type = float, default = 0.0, help = 'seconds between requests of a client')
+	parser.add_argument('-custom_fraction', type = float, default = 0.1, help = 'fraction of random date ranges')
+	parser.add_argument('-start_date', type = str, default = None, help = 'first date of ranges (with -end_date); defaults to the first date of each index')
+	parser.add_argument('-end_date', type = str, default = None, help = 'last date of ranges (with -start_date); defaults to the last date of each index')
+	parser.add_argument('-warmup', type = int, default = 1, help = 'requests of each callback before the runs (data loading)')
+	parser.add_argument('-seed', type = int, default = 0, help = 'seed of the request mix')
+	parser.add_argument('-output', type = str, default = 'loadtest_results.json', help = 'results file')
+	args = parser.parse_args()
+
+	if args.url is None:
+		# the whole app is imported so that callbacks are dispatched as in a worker
+		from app import app
+		make_client = lambda: InProcessClient(app.server)
+	else:
+		make_client = lambda: HttpClient(args.url)
+	components = load_components(args.indices)
+
+	date_range = None
+	if args.start_date is not None and args.end_date is not None:
+		date_range = (tools.to_date(args.start_date), tools.to_date(args.end_date))
+
+	# the first requests load the data of indices and fill the caches of index data (date range returns)
+	warmup_mix = RequestMix(components = components, date_range = date_range, custom_fraction = 0, seed = args.seed)
+	warmup_client = make_client()
+	for data_key, callback_name, component in components:
+		for _ in range(args.warmup):
+			warmup_client.post(getattr(warmup_mix, callback_name)(component))
+
+	results = {'meta': {'time': datetime.now().isoformat(timespec = 'seconds'), 'url': args.url or 'in process',
+					'indices': args.indices, 'date_range': [args.start_date, args.end_date],
+						'duration': args.duration, 'think_time': args.think_time, 'seed': args.seed}, 'runs': {}}
+	for clients in args.clients:
+		mixes = [RequestMix(components = components, date_range = date_range,
+					custom_fraction = args.custom_fraction, seed = args.seed*1000 + number) for number in range(clients)]
+		records, wall_time = run_clients(make_client, mixes, duration = args.duration,
+							requests_per_client = args.requests, think_time = args.think_time)
+		results['runs'][clients] = summarize(records, wall_time)
+		print_summary(clients, results['runs'][clients])
+
+	with open(args.output, 'w') as f:
+		json.dump(results, f, indent = 2)
@@ -22,6 +22,7 @@ class IndexReturnVSFedAsset:
 		self.available_date_range = None 
 		self.fed_assets = fed_assets 
 		self.indices = indices 
+		self.index_ordinals = {}
 		self._set_date_ranges()
 	
 	def _set_date_ranges(self):
@@ -30,20 +31,23 @@ class IndexReturnVSFedAsset:
 		"""
 		for df in list(self.fed_assets.values()) + list(self.indices.values()):
 			df.index = pd.to_datetime(df.index)
-	
-		dates = np.array([[df.index.date.min(), df.index.date.max()] 
-					for df in list(self.fed_assets.values()) + list(self.indices.values())])
-		self.common_date_range = (dates[:,0].max(), dates[:,1].min()) 
-		self.available_date_range = (dates[:,0].min(), dates[:,1].max())
+			df.sort_index(inplace = True)
+		
+		# day ordinals of indices are kept for date window slicing 
+		self.index_ordinals = {name:tools.to_ordinals(df.index) for name, df in self.indices.items()}
+		all_ordinals = [tools.to_ordinals(df.index) for df in self.fed_assets.values()] + list(self.index_ordinals.values())
+		ordinals = np.array([[asset_ordinals[0], asset_ordinals[-1]] for asset_ordinals in all_ordinals])
+		self.common_date_range = (tools.ordinal_to_date(ordinals[:,0].max()), tools.ordinal_to_date(ordinals[:,1].min())) 
+		self.available_date_range = (tools.ordinal_to_date(ordinals[:,0].min()), tools.ordinal_to_date(ordinals[:,1].max()))
 	
 	def cumulative_return(self, indices = None, within_dates = None, in_percent = True) -> Dict:
 		if within_dates is None:
-			within_dates = self.date_range 
+			within_dates = self.available_date_range 
 		
 		cm_returns = {}
 		for asset in indices:
 			asset_df = self.indices[asset]
-			asset_data = tools.choose_dates(asset_df, within_dates)
+			asset_data = tools.choose_dates(asset_df, within_dates, ordinals = self.index_ordinals[asset])
 			if asset_data is not None:
 				asset_return = asset_data[asset].resample('M').last().pct_change().dropna()
 				cm_returns[asset] = tools.compute_cumulative_return(returns = asset_return,
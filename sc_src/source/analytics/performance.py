@@ -8,7 +8,8 @@ from os import path, listdir
 from datetime import datetime 
 from collections import namedtuple 
 from .. utils import keys, tools 
-from .. instruments.indices import SP500, Russell3000, Nasdaq
+from .. instruments.indices import Index, SP500, Russell3000, Nasdaq
+from .. instruments.master import SecurityMaster
 
 
 class Performance:
@@ -70,25 +71,48 @@ class Performance:
 		return investment_return_df, return_hist_df 
 
 	# generating required dataframes in dateranges  
-	def compute_and_save_for_dates(self, what = 'return'):
+	def compute_and_save_for_dates(self, what = 'return', incremental = False):
 		"""
 		computes and saves the dataframes
+		incremental: skips the calculations if files are already computed for the latest date
 		"""
+		latest_date_file = path.join(self.main_save_path, 'latest_date.dat')
+		latest_date = self.latest_date.strftime('%Y-%m-%d')
+		if incremental and path.exists(latest_date_file):
+			with open(latest_date_file) as f:
+				computed_date = f.read().strip()
+			if computed_date == latest_date:
+				print(f'{what} distributions are up to date for {latest_date}')
+				return 
 		for date_key,date_range in self.dates.items():
 			univ_df, hist_df = {'return':self.compute_investment_return_distribution}[what](within_dates = date_range)
 			univ_name = what + '_' + date_key + '_UNIVERSE.csv'
 			hist_name = what + '_' + date_key + '_HIST.csv'
 			univ_df.to_csv(path.join(self.main_save_path, univ_name), sep = ',', header = True, index = False, float_format = '%.4f')
 			hist_df.to_csv(path.join(self.main_save_path, hist_name), sep = ',', header = True, index = False, float_format = '%.4f')
+		with open(latest_date_file, 'w') as f:
+			f.write(latest_date)
 				
 	@classmethod
 	def load_assets_from_indices(cls):
+		"""
+		the universe is the union of the membership bitmaps of the indices in the SecurityMaster;
+			each ticker is read once. Indices saved without a master are loaded and added 
+		"""
+		index_classes = [SP500, Russell3000, Nasdaq]
+		main_save_path = path.join(keys.DATA_PATH, 'Performance')
+		master = SecurityMaster.at(keys.LOAD_PATH)
+		if all(master.has_members(index_class.__name__) for index_class in index_classes):
+			assets = master.read_assets(tickers = master.members([index_class.__name__ for index_class in index_classes]))
+			assets, sectors, date_range = Index._collect_assets(assets)
+			universe = Index(assets = assets, sectors = sectors, date_range = date_range)
+			return cls(universe = universe, main_save_path = main_save_path)
+
 		sp_object = SP500.load_assets()
 		ru_object = Russell3000.load_assets()
 		nasdaq_object = Nasdaq.load_assets()
 
 		grand_assets_object = sp_object + ru_object + nasdaq_object 
-		main_save_path = path.join(keys.DATA_PATH, 'Performance')
 		return cls(universe = grand_assets_object, main_save_path = main_save_path)
 
 # #################################################### #
@@ -99,6 +123,8 @@ def load_distributions():
 	names = []
 	values = []
 	for csv_file in listdir(files_path):
+		if not csv_file.endswith('.csv'):
+			continue
 		names.append(csv_file.split('.')[0])
 		values.append(pd.read_csv(path.join(files_path, csv_file), sep = ',', header = 0))
 	Distributions = namedtuple('Distributions', names)
@@ -0,0 +1,201 @@
+# ############################################ #
+# Server side cache of callback results shared #
+# by all users of the app                      #
+# ############################################ #
+import os
+import pickle
+import hashlib
+from os import path, listdir
+from time import time
+from datetime import date, datetime
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from .. utils import tools
+
+# cache settings; environment variables override the defaults
+# SPEAKINGCHARTS_CACHE_DIR: a directory shared by all workers (gunicorn) on the same machine
+CACHE_SIZE = int(os.environ.get('SPEAKINGCHARTS_CACHE_SIZE', 256))
+CACHE_TTL = float(os.environ.get('SPEAKINGCHARTS_CACHE_TTL', 6*3600))
+CACHE_DIR = os.environ.get('SPEAKINGCHARTS_CACHE_DIR', None)
+
+
+class CallbackCache:
+	"""
+	size bounded LRU cache of callback results with time to live (ttl in seconds)
+		keys are the component id and normalised callback inputs
+		disk_path: optional directory; results are also pickled there so that
+			workers of the same machine share hits
+		version: version of the data the results are computed from;
+			invalidate(version) drops all results of other versions
+	"""
+	def __init__(self, max_size = CACHE_SIZE, ttl = CACHE_TTL, disk_path = None, version = 'initial'):
+		self.max_size = max_size
+		self.ttl = ttl
+		self.disk_path = disk_path
+		self.version = version
+		self.hits = 0
+		self.misses = 0
+		# hits and misses of each memoized component id
+		self.component_stats = {}
+		self._entries = OrderedDict()
+		self._lock = Lock()
+
+	@property
+	def size(self):
+		return len(self._entries)
+
+	@property
+	def version_path(self):
+		if self.disk_path is None:
+			return None
+		return path.join(self.disk_path, str(self.version))
+
+	@staticmethod
+	def normalise(value, unordered = False):
+		"""
+		dates and date strings become 'YYYY-MM-DD', lists become tuples
+			unordered: lists are selections whose order does not change the result (sectors, stocks)
+				and become sorted tuples; sets are always sorted
+		"""
+		if isinstance(value, (date, datetime)):
+			return value.strftime('%Y-%m-%d')
+		if isinstance(value, str) and len(value) >= 10 and value[4] == '-' and value[7] == '-':
+			try:
+				return tools.to_date(value[:10]).strftime('%Y-%m-%d')
+			except ValueError:
+				return value
+		if isinstance(value, (list, tuple, set)):
+			items = tuple(CallbackCache.normalise(item) for item in value)
+			return tuple(sorted(items, key = repr)) if unordered or isinstance(value, set) else items
+		if isinstance(value, dict):
+			return tuple(sorted((key, CallbackCache.normalise(item)) for key, item in value.items()))
+		return value
+
+	def make_key(self, component_id, *args, unordered = ()):
+		"""
+		unordered: positions of args that are normalised as unordered selections
+		"""
+		return (component_id,) + tuple(CallbackCache.normalise(arg, unordered = position in unordered)
+							for position, arg in enumerate(args))
+
+	@staticmethod
+	def _file_name(key):
+		return hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl'
+
+	def _read_disk(self, key):
+		if self.version_path is None:
+			return False, None
+		file_name = path.join(self.version_path, CallbackCache._file_name(key))
+		try:
+			if time() - path.getmtime(file_name) > self.ttl:
+				return False, None
+			with open(file_name, 'rb') as f:
+				return True, pickle.load(f)
+		except (OSError, EOFError, pickle.UnpicklingError):
+			return False, None
+
+	def _write_disk(self, key, value):
+		if self.version_path is None:
+			return
+		tools.make_dir(self.version_path)
+		file_name = path.join(self.version_path, CallbackCache._file_name(key))
+		# written next to the target and renamed so other workers never read a half written file
+		tmp_name = file_name + '.' + str(os.getpid()) + '.tmp'
+		try:
+			with open(tmp_name, 'wb') as f:
+				pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+			os.replace(tmp_name, file_name)
+		except (OSError, pickle.PicklingError, TypeError, AttributeError):
+			if path.exists(tmp_name):
+				os.remove(tmp_name)
+
+	def get(self, key):
+		"""
+		returns (True, value) for a hit and (False, None) for a miss
+		"""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				expires, value = entry
+				if expires > time():
+					self._entries.move_to_end(key)
+					self.hits += 1
+					return True, value
+				del self._entries[key]
+		found, value = self._read_disk(key)
+		with self._lock:
+			if found:
+				self.hits += 1
+				self._store(key, value)
+			else:
+				self.misses += 1
+		return found, value
+
+	def _store(self, key, value):
+		self._entries[key] = (time() + self.ttl, value)
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_size:
+			self._entries.popitem(last = False)
+
+	def set(self, key, value):
+		with self._lock:
+			self._store(key, value)
+		self._write_disk(key, value)
+
+	def invalidate(self, version = None):
+		"""
+		drops all results; results on disk of other versions are removed
+		"""
+		with self._lock:
+			self._entries.clear()
+			if version is not None:
+				self.version = str(version)
+		if self.disk_path is not None and path.exists(self.disk_path):
+			for version_dir in listdir(self.disk_path):
+				if version_dir != str(self.version):
+					CallbackCache._remove_dir(path.join(self.disk_path, version_dir))
+
+	@staticmethod
+	def _remove_dir(dir_name):
+		try:
+			for file_name in listdir(dir_name):
+				os.remove(path.join(dir_name, file_name))
+			os.rmdir(dir_name)
+		except OSError:
+			pass
+
+	def _count(self, component_id, found):
+		with self._lock:
+			stats = self.component_stats.setdefault(component_id, {'hits': 0, 'misses': 0})
+			stats['hits' if found else 'misses'] += 1
+
+	def memoize(self, component_id, ignore = (), unordered = ()):
+		"""
+		decorates a callback (or a data method) to cache its results
+		ignore: positions of arguments left out of the key, such as n_clicks of buttons
+		unordered: positions of list arguments whose order does not change the result (selected sectors or stocks);
+			other lists are kept in order, e.g. sort keys and columns of a figure
+		exceptions such as PreventUpdate are raised and not cached
+		results are not cached if the version changes while they are computed
+		"""
+		def decorator(func):
+			@wraps(func)
+			def wrapper(*args, **kwargs):
+				kept = [position for position in range(len(args)) if position not in ignore]
+				key = self.make_key(component_id, *[args[position] for position in kept], kwargs,
+								unordered = [number for number, position in enumerate(kept) if position in unordered])
+				found, value = self.get(key)
+				self._count(component_id, found)
+				if not found:
+					version = self.version
+					value = func(*args, **kwargs)
+					if version == self.version:
+						self.set(key, value)
+				return value
+			return wrapper
+		return decorator
+
+
+# one cache for all components of the app
+callback_cache = CallbackCache(max_size = CACHE_SIZE, ttl = CACHE_TTL, disk_path = CACHE_DIR)
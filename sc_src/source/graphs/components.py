@@ -17,6 +17,8 @@ from dateutil.relativedelta import relativedelta
 from functools import wraps  
 # package modules
 from .. utils import styles, tools, keys 
+from . cache import callback_cache 
+from . registry import registry 
 
 # module vasriables 
 SECTOR_COLORS = {'Real Estate': '#FF00FF', 'Energy': '#000000', 'Consumer Discretionary': '#9400D3', 
@@ -30,31 +32,80 @@ INDEX_COLORS = {'SP500': '#FF4933', 'DowJones': '#FFB833',
 
 
 
+# ###### Base of components ###### #
+class LazyComponent:
+	"""
+	components resolve their data object (an index, distributions, ...) from the data registry 
+		by data_key when it is first needed; a data object can also be passed directly
+	callbacks are registered when a component is created since their ids only depend on names
+	layouts need the data and are built on the first access of layout; they are
+		built again when the registry swaps in data of a new build
+	"""
+	def __init__(self, index_name = None, data_key = None, data_object = None):
+		self.index_name = index_name 
+		self.data_key = data_key 
+		self._data_object = data_object 
+		self._layout = None 
+		self._layout_version = None 
+
+	@property 
+	def data_object(self):
+		if self._data_object is not None:
+			return self._data_object 
+		return registry.get(self.data_key)
+
+	@property 
+	def index_object(self):
+		return self.data_object
+
+	@property 
+	def index_start_date(self):
+		return self.index_object.date_range[0]
+
+	@property 
+	def index_end_date(self):
+		return self.index_object.date_range[1]
+
+	@property 
+	def layout(self):
+		if self._layout is None or self._layout_version != registry.version:
+			self._layout_version = registry.version 
+			self._layout = self.build_layout()
+		return self._layout 
+
+	def reset_layout(self):
+		self._layout = None 
+
+	def build_layout(self):
+		raise NotImplementedError
+
 # ###### Layout Components that are useful for all indices ###### #
 # display the current date to mention data currency 
-class DateRangeDisplay:
+class DateRangeDisplay(LazyComponent):
 	base_name = '_date_display'
-	def __init__(self, index_name = 's&p500', index_start_date = None, index_end_date = None, 
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None, 
 				message = 'Data collected from'):
-		index_start_date = index_start_date.strftime('%Y-%m-%d')
-		index_end_date = index_end_date.strftime('%Y-%m-%d')
-		self.layout = html.Div([
-			html.H3(f'{message} {index_start_date} to {index_end_date} and updated weekly',
+		super(DateRangeDisplay, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
+		self.message = message 
+
+	def build_layout(self):
+		index_start_date = self.index_start_date.strftime('%Y-%m-%d')
+		index_end_date = self.index_end_date.strftime('%Y-%m-%d')
+		return html.Div([
+			html.H3(f'{self.message} {index_start_date} to {index_end_date} and updated weekly',
 					style = styles.h3_style)
-		], id = index_name + self.base_name + '_div')
+		], id = self.index_name + self.base_name + '_div')
 		
 # ### sector return history layout ### #
-class SectorReturnHistory:
+class SectorReturnHistory(LazyComponent):
 	"""
 	layout and callback for sector return history
 	"""
 	base_name = '_sector_return_history_'
-	def __init__(self, index_name = 's&p500', index_start_date = None, index_end_date = None, index_object = None):
-		
-		self.index_start_date = index_start_date 
-		self.index_end_date = index_end_date 
-		self.index_object = index_object
-		self.sector_keys = self.index_object.sector_keys 
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None):
+		super(SectorReturnHistory, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
 
 		# define names
 		self.graph_id = index_name + self.base_name + 'graph'
@@ -62,7 +113,20 @@ class SectorReturnHistory:
 		self.dropdown_id = index_name + self.base_name + 'dropdown'
 		self.submit_button_id = index_name + self.base_name + 'submit'
 
-		self.layout =html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'), 
+				Input(self.submit_button_id, 'n_clicks'), 
+				   State(self.date_picker_id, 'start_date'), 
+				   	  State(self.date_picker_id, 'end_date'), 
+						 State(self.dropdown_id, 'value'), prevent_initial_call = True)(
+						 	callback_cache.memoize(self.graph_id, ignore = (0,), unordered = (3,))(self.plot_sector_return_history))
+
+	@property 
+	def sector_keys(self):
+		return self.index_object.sector_keys 
+
+	def build_layout(self):
+		index_name = self.index_name 
+		return html.Div([
 			html.H2(f'return history for each sector in {index_name}', style = styles.h2_style),
 			dbc.Row([
 				html.Main("""This graph displays the average cumulative return of each sector in a time period.
@@ -85,12 +149,6 @@ class SectorReturnHistory:
 						dcc.Graph(id = self.graph_id, figure = tools.blank_figure(), style = {'width': '95%', 'margin-left': '20px', 'mergin-right': '20px', 'margin-top': '20px'})
 						], id = index_name + self.base_name + '_load' , type='cube')
 					], id = index_name + self.base_name + '_div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'), 
-				Input(self.submit_button_id, 'n_clicks'), 
-				   State(self.date_picker_id, 'start_date'), 
-				   	  State(self.date_picker_id, 'end_date'), 
-						 State(self.dropdown_id, 'value'), prevent_initial_call = True)(self.plot_sector_return_history)
 
 	def plot_sector_return_history(self, n_clicks, start_date, end_date, selected_sectors):
 		start_date, end_date = tools.adjust_dates(start_date, end_date, default_start = self.index_start_date,
@@ -119,28 +177,31 @@ class SectorReturnHistory:
 		return fig
 
 # ###### Return of Individual Stocks ###### #
-class StockReturns:
+class StockReturns(LazyComponent):
 	base_name = '_stock_return_'
-	def __init__(self, index_name = 's&p500', index_start_date = None,
-		index_end_date = None, index_object = None):
-
-		self.index_start_date = index_start_date 
-		self.index_end_date = index_end_date  
-		self.index_object = index_object 
-		# note that the callback can display graphs in batches of 50 assets 
-		self.dropdown_range_max = self.index_object.num_assets//50 + 1 
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None):
+		super(StockReturns, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
 
 		self.date_picker_id = index_name + self.base_name + 'date_picker'
 		self.dropdown_id = index_name + self.base_name + 'dropdow'
 		self.graph_id = index_name + self.base_name + 'graph'
 		self.submit_button_id = index_name + self.base_name + 'submit'
-		# faster way to cache callbacks without using wraps
-		self.callback_start_date = index_start_date  
-		self.callback_end_date = index_end_date 
-		# date_range investment return is calculated only once unless date range changes 
-		self.date_range_return = None 
+		# date_range investment return is calculated only once for each date range 
+		self.date_range_return = callback_cache.memoize(self.graph_id + '_date_range_return')(self._date_range_return)
+
+		self.callback = callback(Output(self.graph_id, 'figure'), 
+			Input(self.submit_button_id, 'n_clicks'), 
+				State(self.date_picker_id, 'start_date'),
+					State(self.date_picker_id, 'end_date'), 
+						State(self.dropdown_id, 'value'), prevent_initial_call = True)(
+							callback_cache.memoize(self.graph_id, ignore = (0,))(self.plot_stock_return))
 
-		self.layout = html.Div([
+	def build_layout(self):
+		index_name = self.index_name 
+		# note that the callback can display graphs in batches of 50 assets 
+		dropdown_range_max = self.index_object.num_assets//50 + 1 
+		return html.Div([
 			html.H2(f'return of individual stocks in {index_name}', style = styles.h2_style),
 			dbc.Row([
 				html.Main('This graph displays cumulative returns of individual stocks for the time period. Please choose a date range and the number of stocks you wish to display, then push the crunch button.', style = styles.main_style),
@@ -153,7 +214,7 @@ class StockReturns:
 					dcc.Dropdown(id = self.dropdown_id, 
 						placeholder = 'choose number of stocks to display ',
 				 			options = [{'label': 'display up to ' + str(50*count) + ' stocks', 
-												'value': 50*count} for count in range(1,self.dropdown_range_max)], style = styles.single_dropdown)
+												'value': 50*count} for count in range(1,dropdown_range_max)], style = styles.single_dropdown)
 						]),
 					]),
 				dbc.Button('crunch!', id = self.submit_button_id, n_clicks = 0, style = styles.submit),
@@ -162,12 +223,6 @@ class StockReturns:
 				 		style = {'width': '100%', 'margin-left': '20px', 'margin-top': '20px'})
 						], id = index_name + self.base_name + 'load_graph', type='cube')
 				], id = index_name + self.base_name + 'div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'), 
-			Input(self.submit_button_id, 'n_clicks'), 
-				State(self.date_picker_id, 'start_date'),
-					State(self.date_picker_id, 'end_date'), 
-						State(self.dropdown_id, 'value'), prevent_initial_call = True)(self.plot_stock_return)
 	
 	@staticmethod 
 	def sort_date_range_return(frame = None):
@@ -177,25 +232,18 @@ class StockReturns:
 		frame = frame.iloc[::-1]
 		return frame 
 
+	def _date_range_return(self, start_date, end_date):
+		frame = self.index_object.compute_investment_returns(within_dates = (start_date, end_date))
+		return StockReturns.sort_date_range_return(frame = frame)
+
 	def plot_stock_return(self, n_clicks, start_date, end_date, num_stocks):
 		start_date, end_date = tools.adjust_dates(start_date, end_date,
 				default_start = self.index_start_date, default_end=self.index_end_date)	
 		if num_stocks is None:
 			raise PreventUpdate 
 
-		if n_clicks == 1:
-			self.callback_start_date = start_date 
-			self.callback_end_date = end_date 
-			frame = self.index_object.compute_investment_returns(within_dates = (self.callback_start_date, self.callback_end_date))
-			self.date_range_return = StockReturns.sort_date_range_return(frame = frame)
-		
-		elif n_clicks > 1 and (start_date != self.callback_start_date or end_date != self.callback_end_date):
-			self.callback_start_date = start_date 
-			self.callback_end_date = end_date 
-			frame = self.index_object.compute_investment_returns(within_dates = (self.callback_start_date, self.callback_end_date))
-			self.date_range_return = StockReturns.sort_date_range_return(frame = frame)
-
-		investment_df = self.date_range_return[self.date_range_return.index <= num_stocks]
+		date_range_return = self.date_range_return(start_date, end_date)
+		investment_df = date_range_return[date_range_return.index <= num_stocks]
 		fig = px.bar(investment_df, y = 'Ticker', 
 			x = 'Return', orientation = 'h', 
 				labels = {'Return': 'return, %', 'Ticker': 'stock ticker symbol'},
@@ -216,18 +264,14 @@ class StockReturns:
 		return fig
 
 # ###### Risk-Return-Sharpe Scatter plots ###### #
-class StockRiskReturn:
+class StockRiskReturn(LazyComponent):
 	"""
 	plots scatter plots of cumulative return-volatility colored by sharpe ratio
 	"""
 	base_name = '_risk_return_'
-	def __init__(self, index_name = 's&p500', index_object = None, index_start_date = None, 
-							index_end_date = None):
-		self.index_start_date = index_start_date 
-		self.index_end_date = index_end_date 
-		self.index_object = index_object
-		self.index_object.risk_free = 'DGS10'
-		self.index_object.set_daily_risk_free()
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None):
+		super(StockRiskReturn, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
 
 		self.date_picker_id = index_name + self.base_name + 'date_picker'
 		self.dropdown_id = index_name + self.base_name + 'dropdown'
@@ -235,12 +279,21 @@ class StockRiskReturn:
 		self.graph_id = index_name + self.base_name + 'graph'
 		self.submit_button_id = index_name + self.base_name + 'submit'
 
-		# ways to reduce calculation time 
-		self.callback_start_date = index_start_date 
-		self.callback_end_date = index_end_date 
-		self.risk_return_df = None 
+		# risk return dataframe is calculated only once for each date range 
+		self.risk_return = callback_cache.memoize(self.graph_id + '_risk_return')(self._risk_return)
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'), 
+			Input(self.submit_button_id, 'n_clicks'), 
+				State(self.date_picker_id, 'start_date'),
+					State(self.date_picker_id, 'end_date'), 
+						State(self.dropdown_id, 'value'),
+							State(self.radio_id, 'value'),
+							 prevent_initial_call = True)(
+							 	callback_cache.memoize(self.graph_id, ignore = (0,), unordered = (3,))(self.plot_risk_return_sharpe))
+
+	def build_layout(self):
+		index_name = self.index_name 
+		return html.Div([
 			html.H2(f'Return - Volatility - Sharpe ratio with 10 year treasury as the risk free asset', style = styles.h2_style),
 			dbc.Row([
 				html.Main("""This graph displays cumulative
@@ -272,15 +325,13 @@ class StockRiskReturn:
 				 		style = {'width': '90%', 'margin-left': '20px', 'margin-top': '20px'})
 						], id = index_name + self.base_name + 'load_graph', type='cube')
 		], id = index_name + self.base_name + 'div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'), 
-			Input(self.submit_button_id, 'n_clicks'), 
-				State(self.date_picker_id, 'start_date'),
-					State(self.date_picker_id, 'end_date'), 
-						State(self.dropdown_id, 'value'),
-							State(self.radio_id, 'value'),
-							 prevent_initial_call = True)(self.plot_risk_return_sharpe)
 	
+	def _risk_return(self, start_date, end_date):
+		# the 10 year treasury yield is pulled once, when the first risk return is computed
+		self.index_object.risk_free = 'DGS10'
+		self.index_object.set_daily_risk_free()
+		return self.index_object.compute_risk_return(within_dates = (start_date, end_date), risk_free = None)
+
 	def plot_risk_return_sharpe(self, n_clicks, start_date, end_date, stock_names, color_by):
 		
 		if stock_names is None:
@@ -289,33 +340,22 @@ class StockRiskReturn:
 		start_date, end_date = tools.adjust_dates(start_date, end_date, default_start = self.index_start_date, 
 						default_end = self.index_end_date)
 		
-		if n_clicks == 1:
-			self.callback_start_date = start_date 
-			self.callback_end_date = end_date 
-			self.risk_return_df = self.index_object.compute_risk_return(within_dates = (self.callback_start_date,
-								 self.callback_end_date), risk_free = None)
-		
-		elif n_clicks > 1 and (start_date != self.callback_start_date or end_date != self.callback_end_date):
-			self.callback_start_date = start_date 
-			self.callback_end_date = end_date 
-			self.risk_return_df = self.index_object.compute_risk_return(within_dates = (self.callback_start_date,
-								self.callback_end_date), risk_free = None)
-		
-		select_assets = self.risk_return_df[self.risk_return_df['Name'].isin(stock_names)]
+		risk_return_df = self.risk_return(start_date, end_date)
+		select_assets = risk_return_df[risk_return_df['Name'].isin(stock_names)]
 
 		if color_by != 'Sharpe Ratio':
-			color_min = self.risk_return_df[color_by].min()
-			color_max = self.risk_return_df[color_by].quantile(0.8).mean()
+			color_min = risk_return_df[color_by].min()
+			color_max = risk_return_df[color_by].quantile(0.8).mean()
 			marker_face_color = 'Yellow'
 			marker_line_color = 'Red'
 		else:
-			color_min = self.risk_return_df[color_by].min()
-			color_max = self.risk_return_df[color_by].max()
+			color_min = risk_return_df[color_by].min()
+			color_max = risk_return_df[color_by].max()
 			marker_face_color = 'Black'
 			marker_line_color = 'Black'
 
 		fig = go.Figure()
-		fig = px.scatter(self.risk_return_df,  x='Volatility', y = 'Return',
+		fig = px.scatter(risk_return_df,  x='Volatility', y = 'Return',
 				 color = color_by, hover_data = ['Name', 'Ticker','Return', 'Volatility', color_by],
 				 	range_color = (color_min, color_max), 
 				 	height = 600, template = 'seaborn', opacity = 0.8)
@@ -341,19 +381,25 @@ class StockRiskReturn:
 		return fig 	
 		
 # ###### Sector Market Cap ###### #
-class SectorMarketCap:
+class SectorMarketCap(LazyComponent):
 	"""
 	plots pie chart of sector market cap 
 	index_end_date can be used to add a text box
 	"""
 	base_name = '_sector_market_cap_'
-	def __init__(self, index_name = 's&p500', index_object = None, index_end_date = None):
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None):
+		super(SectorMarketCap, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
 		self.show_button_id = index_name + self.base_name + 'show'
 		self.graph_id = index_name + self.base_name + 'graph'
-		self.index_object = index_object 
-		self.index_end_date = index_end_date 
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'),
+ 							Input(self.show_button_id, 'n_clicks'),
+				prevent_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,))(self.plot_sector_market_cap))
+
+	def build_layout(self):
+		index_name = self.index_name 
+		return html.Div([
 				html.H2(f'market cap share of each sector in {index_name}', style = styles.h2_style),
 					html.Main(""" this pie chart shows market cap of each sector """, style = styles.main_style),
 					dbc.Button('crunch!', id = self.show_button_id, n_clicks = 0, style = styles.submit), 
@@ -362,10 +408,6 @@ class SectorMarketCap:
 						style = {'width': '90%', 'margin-left': '10px', 'margin-top': '20px'})
 						], id = index_name + self.base_name + 'load', type = 'cube')
 			], id = index_name + self.base_name + '_div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'),
- 							Input(self.show_button_id, 'n_clicks'),
-				prevent_initial_call = True)(self.plot_sector_market_cap)
 
 	def plot_sector_market_cap(self, n_clicks):
 		fig = px.pie(self.index_object.sector_fundamentals, values = 'Market Cap', names = 'Sector')
@@ -375,17 +417,29 @@ class SectorMarketCap:
 		return fig
 
 # ###### Index Fundamentals ###### #
-class IndexFundamentals:
+class IndexFundamentals(LazyComponent):
 	base_name = '_index_fundamentals_'
-	def __init__(self, index_name = 's&p500', index_object = None):
-		self.index_object = index_object 
-		self.sector_keys = self.index_object.sector_keys 
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None):
+		super(IndexFundamentals, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
 		self.checklist_id = index_name + self.base_name + 'checklist'
 		self.radio_item_id = index_name + self.base_name + 'radio_item'
 		self.submit_button_id = index_name + self.base_name + 'show' 
 		self.graph_id = index_name + self.base_name + 'graph'
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'), 
+				Input(self.submit_button_id, 'n_clicks'),
+					State(self.checklist_id, 'value'), 
+						State(self.radio_item_id, 'value'),
+							prevent_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,), unordered = (1,))(self.plot_stock_fundamentals))
+
+	@property 
+	def sector_keys(self):
+		return self.index_object.sector_keys 
+
+	def build_layout(self):
+		index_name = self.index_name 
+		return html.Div([
 				html.H2(f'fundamentals of {index_name} stocks', style = styles.h2_style),
 					dbc.Row([
 						html.Main(""" In this graph, you see fundamentals of each stock.
@@ -407,12 +461,6 @@ class IndexFundamentals:
 							style = {'width': '90%', 'margin-left': '10px', 'margin-top': '20px'})
 									], id = index_name + self.graph_id + '_load', type = 'cube')
 						], id = index_name + self.base_name + '_div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'), 
-				Input(self.submit_button_id, 'n_clicks'),
-					State(self.checklist_id, 'value'), 
-						State(self.radio_item_id, 'value'),
-							prevent_initial_call = True)(self.plot_stock_fundamentals)
 
 	def plot_stock_fundamentals(self, n_clicks, sectors, fundamental):
 		"""
@@ -445,25 +493,29 @@ class IndexFundamentals:
 # ####################################### #
 # SP500 Specific components and callbacks #
 # ####################################### #
-class XEWDisplay:
+class XEWDisplay(LazyComponent):
 	"""
 	displays index and equal weight index in a time period 
 	this class is formatted using bootstrap components  
 	"""
 	base_name = '_index_equal_weight_display'
-	def __init__(self, index_name = 's&p500', index_start_date = None,
-				 index_end_date = None, index_object = None):
-		
-		self.index_start_date = index_start_date 
-		self.index_end_date = index_end_date 
-		self.index_object = index_object 
-		self.index_name = index_name 
+	def __init__(self, index_name = 's&p500', data_key = None, index_object = None):
+		super(XEWDisplay, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
 
 		self.graph_id = index_name + self.base_name + 'graph'
 		self.date_picker_id = index_name + self.base_name + 'date_picker'
 		self.submit_button_id = index_name + self.base_name + 'submit'
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'),
+		 							Input(self.submit_button_id, 'n_clicks'),
+									 	State(self.date_picker_id, 'start_date'), 
+											State(self.date_picker_id, 'end_date'), 
+												prevent_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,))(self.display_index_and_equal_weight))
+
+	def build_layout(self):
+		index_name = self.index_name 
+		return html.Div([
 				dbc.Row(
 					dbc.Col(
 							html.H2(f'market cap & equal weighted {index_name}', style = styles.h2_style_dbc)
@@ -497,18 +549,14 @@ class XEWDisplay:
 					),
 				)
 				], id = index_name + self.base_name + '_div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'),
-		 							Input(self.submit_button_id, 'n_clicks'),
-									 	State(self.date_picker_id, 'start_date'), 
-											State(self.date_picker_id, 'end_date'), 
-												prevent_initial_call = True)(self.display_index_and_equal_weight)
 	
 	def display_index_and_equal_weight(self, n_clicks, start_date, end_date):
 		start_date, end_date = tools.adjust_dates(start_date, end_date, default_start= self.index_start_date, default_end=self.index_end_date)
 		within_dates = (start_date, end_date)
-		x_data = tools.choose_dates_lite(self.index_object.x_index, within_dates = within_dates)
-		ew_data = tools.choose_dates_lite(self.index_object.ew_index, within_dates = within_dates)
+		x_data = tools.choose_dates_lite(self.index_object.x_index, within_dates = within_dates, 
+							ordinals = self.index_object.x_ordinals)
+		ew_data = tools.choose_dates_lite(self.index_object.ew_index, within_dates = within_dates, 
+							ordinals = self.index_object.ew_ordinals)
 
 		print('x_data is: ', x_data)
 		print('ew_data is: ', ew_data)
@@ -531,32 +579,50 @@ class XEWDisplay:
 # ############################################# #
 #  Display Analytics and Performance Components #
 # ############################################# #
-class PerformanceHist:
+class PerformanceHist(LazyComponent):
 	"""
 	generates distributions of all returns and display chosen assets using a vertical
 		line in the graphs 
 	Components: a Bar chart 
 	Dropdown menu: for choosing the stock 
 	RadioItem: for choosing the date range 
+	hist_id: the prefix of distribution names ('return'); ids are made from it 
+		so that callbacks are registered before the distributions are loaded
 	""" 
 	_dates = {'Last Week': 'LAST_WEEK',
 				'Last Month': 'LAST_MONTH', 
 					'Last Three Months': 'LAST_THREE_MONTHS', 
 						'Last Six Months': 'LAST_SIX_MONTHS', 
 							'Last Year': 'LAST_YEAR'}
-	def __init__(self, hists = None):
-		self.fields = hists._fields 
-		univ_idx = [idx for idx,field in enumerate(self.fields) if 'UNIVERSE' in field][0]
-		self.histograms = hists
-		self.hist_id = self.fields[0].split('_')[0] 
+	def __init__(self, hists = None, data_key = None, hist_id = 'return'):
+		super(PerformanceHist, self).__init__(data_key = data_key, data_object = hists)
+		self.hist_id = hist_id 
 		self.base_name = self.hist_id + '_perform_hist'
 		self.dropdown_id = self.base_name + '_dropdown'
-		self.stock_list = list(getattr(self.histograms, self.histograms._fields[univ_idx]).Name)
 		self.radio_id = self.base_name + '_radio'
 		self.graph_id = self.base_name + '_graph'
 		self.submit_button_id = self.base_name + '_submit'
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'), 
+			Input(self.submit_button_id, 'n_clicks'), 
+				State(self.radio_id, 'value'), 
+					State(self.dropdown_id, 'value'), prevet_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,), unordered = (2,))(self.plot_performance))
+
+	@property 
+	def histograms(self):
+		return self.data_object 
+
+	@property 
+	def fields(self):
+		return self.histograms._fields 
+
+	@property 
+	def stock_list(self):
+		univ_field = [field for field in self.fields if 'UNIVERSE' in field][0]
+		return list(getattr(self.histograms, univ_field).Name)
+
+	def build_layout(self):
+		return html.Div([
 			html.H2('Performance of stocks compared to all stocks', style = styles.h2_style),
 			dbc.Row([
 				html.Main(f""" This graph shows a histogram of {self.hist_id}. You can compare 
@@ -580,11 +646,6 @@ class PerformanceHist:
 							style = {'width': '90%', 'margin-left': '20px', 'margin-top': '20px'})
 								], id = self.base_name + 'load_graph', type = 'cube')
 				], id = self.base_name + '_div')
-		
-		self.callback = callback(Output(self.graph_id, 'figure'), 
-			Input(self.submit_button_id, 'n_clicks'), 
-				State(self.radio_id, 'value'), 
-					State(self.dropdown_id, 'value'), prevet_initial_call = True)(self.plot_performance)
 
 	
 	@staticmethod 
@@ -635,16 +696,18 @@ class PerformanceHist:
 # ########################################################################## #
 # compare returns and price using a double bar chart with sorting capability #
 # ########################################################################## #
-class IntervalReturnDisplay:
+class IntervalReturnDisplay(LazyComponent):
 	"""
 	This class has one dropdown menu and a radio botton
 	the values of the radio bottom is determined based on the dropdown choices 
 	it displays the results on a double-sided bar chart
+	intervals are intervals_data of the index object or the interval_df given
 	"""
 	base_name = '_interval_returns'
-	def __init__(self, index_name = None, interval_df = None):
-		self.interval_df = interval_df
-		self.display_range_max = len(self.interval_df.index)//50 + 1 
+	def __init__(self, index_name = None, data_key = None, index_object = None, interval_df = None):
+		super(IntervalReturnDisplay, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
+		self._interval_df = interval_df 
 		self.dropdown_one_id = index_name +  self.base_name + '_dropdown_1' 
 		self.dropdown_two_id = index_name + self.base_name + '_dropdown_2'
 		self.loading_id = index_name + self.base_name + '_loading'
@@ -652,29 +715,49 @@ class IntervalReturnDisplay:
 		self.radio_id = index_name + self.base_name + '_radio'
 		self.graph_id = index_name + self.base_name + '_graph'
 		self.submit_id = index_name + self.base_name + '_submit'
-		self.options = [col for col in self.interval_df.columns if 'Return' in col] 
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'),
+					Input(self.submit_id, 'n_clicks'),
+							State(self.dropdown_one_id, 'value'),
+									State(self.dropdown_two_id, 'value'),
+										State(self.radio_id, 'value'), 
+											State(self.dropdown_three_id, 'value'), prevent_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,))(self.plot_interval_returns))
+
+	@property 
+	def interval_df(self):
+		if self._interval_df is not None:
+			return self._interval_df 
+		return self.index_object.intervals_data 
+
+	@property 
+	def options(self):
+		return [col for col in self.interval_df.columns if 'Return' in col] 
+
+	def build_layout(self):
+		index_name = self.index_name 
+		options = self.options 
+		display_range_max = len(self.interval_df.index)//50 + 1 
+		return html.Div([
 			html.H2(f'compare returns at different time intervals for {index_name}', style = styles.h2_style),
 			dbc.Row([
 				html.Main('In this graph you can compare returns of stocks in different time periods', style = styles.main_style),
 				dbc.Col([
 					dcc.Dropdown(id = self.dropdown_one_id, placeholder = 'choose the first value to compare', 
-						options = self.options, style = styles.single_dropdown)
+						options = options, style = styles.single_dropdown)
 				]),
 				dbc.Col([
 					dcc.Dropdown(id = self.dropdown_two_id, placeholder = 'choose the second value to compare', 
-						options = self.options, style = styles.single_dropdown)
+						options = options, style = styles.single_dropdown)
 				]),
 			]),
 			dbc.Row([
 				dbc.Col([
 					dcc.RadioItems(id = self.radio_id, options = ['by first value', 'by second value', 'latest price low to high'],
-					 		value = self.options[1], style = styles.radio_item)]),
+					 		value = options[1], style = styles.radio_item)]),
 				dbc.Col([
 					dcc.Dropdown(id = self.dropdown_three_id, placeholder = 'choose number of stocks to display', 
 						multi = False, options = [{'label': 'display up to ' + str(50*count) + ' stocks', 
-						'value': 50*count} for count in range(1,self.display_range_max)],
+						'value': 50*count} for count in range(1,display_range_max)],
 					style = styles.single_dropdown)
 				]),
 			]),
@@ -685,12 +768,6 @@ class IntervalReturnDisplay:
 				 		style = {'width': '100%', 'margin-left': '20px', 'margin-top': '20px'})
 				], id = self.loading_id, type = 'cube')
 		], id = index_name + self.base_name + 'div')
-		self.callback = callback(Output(self.graph_id, 'figure'),
-					Input(self.submit_id, 'n_clicks'),
-							State(self.dropdown_one_id, 'value'),
-									State(self.dropdown_two_id, 'value'),
-										State(self.radio_id, 'value'), 
-											State(self.dropdown_three_id, 'value'), prevent_initial_call = True)(self.plot_interval_returns)
 		
 	
 	def plot_interval_returns(self, n_clicks, column_id_one, column_id_two, input_sort_key, num_stocks_display):
@@ -737,12 +814,15 @@ class IntervalReturnDisplay:
 # ############################################ #
 # Interval display using checklists			   #
 # ############################################ #
-class IntervalDisplayCheckList:
+class IntervalDisplayCheckList(LazyComponent):
 	base_name = '_interval_display'
 	base_keys = ['Ticker', 'Sector', 'Name', 'Latest_Price']
-	def __init__(self, index_name = None, interval_df = None, options_key = 'Return'):
-		self.interval_df = interval_df
-		self.display_range_max = len(self.interval_df.index)//50 + 1
+	def __init__(self, index_name = None, data_key = None, index_object = None, interval_df = None, 
+					options_key = 'Return'):
+		super(IntervalDisplayCheckList, self).__init__(index_name = index_name, data_key = data_key, 
+					data_object = index_object)
+		self._interval_df = interval_df 
+		self.options_key = options_key 
 		self.div_id = index_name + self.base_name + '_div'
 		self.checklist_one_id = index_name + self.base_name + '_checklist_one'
 		self.checklist_two_id = index_name + self.base_name + '_checklist_two'
@@ -751,10 +831,33 @@ class IntervalDisplayCheckList:
 		self.loading_id = index_name + self.base_name + '_loading'
 		self.graph_id = index_name + self.base_name + '_graph'
 		self.submit_id = index_name + self.base_name + '_submit'
-		self.options = [col for col in self.interval_df.columns if options_key in col]
-		self.sectors = list(set(self.interval_df['Sector']))
 
-		self.layout = html.Div([
+		self.callback = callback(Output(self.graph_id, 'figure'), 
+					Input(self.submit_id, 'n_clicks'), 
+						State(self.checklist_one_id, 'value'),
+							State(self.checklist_two_id, 'value'), 
+								State(self.checklist_three_id, 'value'), 
+									State(self.dropdown_id, 'value'), 
+									 prevent_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,), unordered = (3,))(self.plot_intervals))
+
+	@property 
+	def interval_df(self):
+		if self._interval_df is not None:
+			return self._interval_df 
+		return self.index_object.intervals_data 
+
+	@property 
+	def options(self):
+		return [col for col in self.interval_df.columns if self.options_key in col]
+
+	@property 
+	def sectors(self):
+		return list(set(self.interval_df['Sector']))
+
+	def build_layout(self):
+		options_key = self.options_key 
+		display_range_max = len(self.interval_df.index)//50 + 1
+		return html.Div([
 			html.H2(f'compare {options_key} for various time intervals on a bar chart', style = styles.h2_style),
 			dbc.Row([
 				html.Main(f"""In this graph, all {options_key} are displayed on bar chart to compare. Choose values from 
@@ -775,7 +878,7 @@ class IntervalDisplayCheckList:
 				dbc.Col([
 					dcc.Dropdown(id = self.dropdown_id, placeholder = 'choose number of stocks to display', 
 						multi = False, options = [{'label': 'display up to ' + str(50*count) + ' stocks', 
-						'value': 50*count} for count in range(1, self.display_range_max)],
+						'value': 50*count} for count in range(1, display_range_max)],
 					style = styles.single_dropdown)
 				]),
 			]),
@@ -785,13 +888,6 @@ class IntervalDisplayCheckList:
 				 		style = {'width': '100%', 'margin-left': '20px', 'margin-top': '20px'})
 			], id = self.loading_id, type = 'cube')
 		], id = self.div_id)
-		self.callback = callback(Output(self.graph_id, 'figure'), 
-					Input(self.submit_id, 'n_clicks'), 
-						State(self.checklist_one_id, 'value'),
-							State(self.checklist_two_id, 'value'), 
-								State(self.checklist_three_id, 'value'), 
-									State(self.dropdown_id, 'value'), 
-									 prevent_initial_call = True)(self.plot_intervals)
 		
 	def plot_intervals(self, n_clicks, display_keys, sort_keys, sector_keys, num_display):
 
@@ -826,7 +922,7 @@ class IntervalDisplayCheckList:
 #	Macro Trend Graph components 		   #
 # ######################################## #
 
-class IndexReturnFedAsset:
+class IndexReturnFedAsset(LazyComponent):
 	"""
 	generates a line graph of index return in a time period
 	on y1 axis and compares with fed asset on y2 axis. 
@@ -834,19 +930,33 @@ class IndexReturnFedAsset:
 	"""
 	base_name = 'index_vs_fed_'
 
-	def __init__(self, index_fed_object = None):
-		self.index_fed_object = index_fed_object
-		self.start_date, self.end_date = self.index_fed_object.available_date_range 
+	def __init__(self, index_fed_object = None, data_key = None):
+		super(IndexReturnFedAsset, self).__init__(data_key = data_key, data_object = index_fed_object)
 
 		# component ids
-		graph_id = self.base_name + 'graph'
-		date_picker_id = self.base_name + 'date_picker'
-		submit_button_id = self.base_name + 'submit'
-		loader_id = self.base_name + 'loader'
+		self.graph_id = self.base_name + 'graph'
+		self.date_picker_id = self.base_name + 'date_picker'
+		self.submit_button_id = self.base_name + 'submit'
+		self.loader_id = self.base_name + 'loader'
 		# for indices
-		checklist_id = self.base_name + 'checklist'
+		self.checklist_id = self.base_name + 'checklist'
 		# for fed asset
-		radio_id = self.base_name + 'radio'
+		self.radio_id = self.base_name + 'radio'
+		
+		self.callback = callback(Output(self.graph_id, 'figure'),
+			Input(self.submit_button_id, 'n_clicks'),
+				 State(self.date_picker_id, 'start_date'),
+				 	 State(self.date_picker_id, 'end_date'),
+					  	 State(self.radio_id, 'value'),
+						   	State(self.checklist_id, 'value'),
+							   	 prevent_initial_call = True)(callback_cache.memoize(self.graph_id, ignore = (0,))(self.plot_indices_vs_fed))
+
+	@property 
+	def index_fed_object(self):
+		return self.data_object 
+
+	def build_layout(self):
+		start_date, end_date = self.index_fed_object.available_date_range 
 		# keys 
 		fed_keys = list(self.index_fed_object.fed_assets.keys())
 		fed_labels = [' '.join(elem.split('_')[1:]) for elem in fed_keys]
@@ -855,8 +965,7 @@ class IndexReturnFedAsset:
 
 		index_keys = list(self.index_fed_object.indices.keys())
 
-		
-		self.layout = html.Div([
+		return html.Div([
 			html.H2('Compare return of indices with a fed metric such as Fed Funds Rate (interest rates)', style = styles.h2_style),
 			dbc.Row([
 				html.Main("""
@@ -866,35 +975,27 @@ class IndexReturnFedAsset:
 							and the macro data and push the submit button. 
 				""", style = styles.main_style),
 				dbc.Col([
-					dcc.DatePickerRange(id = date_picker_id,
-						 min_date_allowed = self.start_date, max_date_allowed = self.end_date,
-						  start_date = self.start_date, initial_visible_month = self.start_date,
-						   end_date = self.end_date, style = styles.date_picker)
+					dcc.DatePickerRange(id = self.date_picker_id,
+						 min_date_allowed = start_date, max_date_allowed = end_date,
+						  start_date = start_date, initial_visible_month = start_date,
+						   end_date = end_date, style = styles.date_picker)
 				]),
 				dbc.Col([
-					dcc.RadioItems(id = radio_id, options = radio_options,
+					dcc.RadioItems(id = self.radio_id, options = radio_options,
 						 value = fed_keys[0], style = styles.radio_item)
 				]), 
 				dbc.Col([
-					dcc.Checklist(id = checklist_id,
+					dcc.Checklist(id = self.checklist_id,
 				 		options = index_keys, inline = True, value = [index_keys[0]],
 				 	 		labelStyle = styles.checklist_label, style = styles.checklist)					
 				]),
 					]), 
-			dbc.Button('crunch!', id = submit_button_id, n_clicks = 0, style = styles.submit), 
+			dbc.Button('crunch!', id = self.submit_button_id, n_clicks = 0, style = styles.submit), 
 				dcc.Loading([
-					dcc.Graph(id = graph_id, figure = tools.blank_figure(),
+					dcc.Graph(id = self.graph_id, figure = tools.blank_figure(),
 					 style = {'width': '95%', 'margin-left': '20px', 'mergin-right': '20px', 'margin-top': '20px'})
-							], id = loader_id, type='cube')
+							], id = self.loader_id, type='cube')
 								], id = self.base_name + '_div')
-		
-		self.callback = callback(Output(graph_id, 'figure'),
-			Input(submit_button_id, 'n_clicks'),
-				 State(date_picker_id, 'start_date'),
-				 	 State(date_picker_id, 'end_date'),
-					  	 State(radio_id, 'value'),
-						   	State(checklist_id, 'value'),
-							   	 prevent_initial_call = True)(self.plot_indices_vs_fed)
 	
 	def plot_indices_vs_fed(self, n_clicks, start_date, end_date, fed_asset, indices):
 				
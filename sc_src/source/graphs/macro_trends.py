@@ -4,12 +4,18 @@
 import dash_bootstrap_components as dbc 
 from ..analytics import macro_trends
 from . import components 
+from . registry import registry 
 
-index_fed_object = macro_trends.IndexReturnVSFedAsset.load_assets()
+data_key = 'macro_trends'
+# index and fed datasets are read when the tab is first rendered (or prewarmed)
+registry.register(data_key, macro_trends.IndexReturnVSFedAsset.load_assets)
 
-index_vs_fed_graph = components.IndexReturnFedAsset(index_fed_object=index_fed_object).layout 
+index_vs_fed_graph = components.IndexReturnFedAsset(data_key = data_key) 
 
-macro_trend_tab = dbc.Tab([index_vs_fed_graph], label = ['MACRO TRENDS'])
+def macro_trend_layout():
+	return [index_vs_fed_graph.layout]
+
+macro_trend_tab = dbc.Tab(label = ['MACRO TRENDS'], tab_id = data_key)
 
 
 
@@ -0,0 +1,168 @@
+# ############################################ #
+# Latency, payload and cache metrics of the    #
+# callbacks in Prometheus text format          #
+# ############################################ #
+import os
+from time import perf_counter
+from threading import Lock
+import flask
+from . cache import callback_cache
+
+# upper bounds of histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 5e7)
+
+
+class Histogram:
+	"""
+	cumulative buckets of a Prometheus histogram
+	"""
+	def __init__(self, buckets = LATENCY_BUCKETS):
+		self.buckets = buckets
+		self.counts = [0]*len(buckets)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		for position, bound in enumerate(self.buckets):
+			if value <= bound:
+				self.counts[position] += 1
+		self.sum += value
+		self.count += 1
+
+	def lines(self, name, labels):
+		lines = [f'{name}_bucket{{{labels},le="{bound:g}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+		lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+		lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+		lines.append(f'{name}_count{{{labels}}} {self.count}')
+		return lines
+
+
+class CallbackMetrics:
+	"""
+	metrics of each callback output (component id) of this worker process
+		update requests (/_dash-update-component) are timed by flask hooks of the server (init_app)
+		and keyed by the output of the request
+		latency: time of the request as dispatched by dash (compute and json serialization)
+		response bytes: size of the json response
+		prevented: callbacks that raised PreventUpdate (status 204); errors: other exceptions (status 500)
+	cache hits and misses of memoized component ids are read from callback_cache
+	every worker (gunicorn) keeps its own metrics; series carry a worker label
+	"""
+	prefix = 'speakingcharts_callback'
+	update_route = '_dash-update-component'
+
+	def __init__(self):
+		self.components = {}
+		self._lock = Lock()
+
+	def _component(self, component_id):
+		if component_id not in self.components:
+			self.components[component_id] = {'latency': Histogram(LATENCY_BUCKETS), 'response_bytes': Histogram(BYTES_BUCKETS),
+							'prevented': 0, 'errors': 0}
+		return self.components[component_id]
+
+	@staticmethod
+	def component_id(output):
+		"""
+		'graph.figure' -> 'graph'; outputs of multi output callbacks ('..a.children...b.figure..') are kept
+		"""
+		if output.startswith('..'):
+			return output
+		return output.rsplit('.', 1)[0]
+
+	def observe(self, component_id, latency, response_bytes):
+		with self._lock:
+			component = self._component(component_id)
+			component['latency'].observe(latency)
+			component['response_bytes'].observe(response_bytes)
+
+	def count(self, component_id, what):
+		with self._lock:
+			self._component(component_id)[what] += 1
+
+	def _start_request(self):
+		if not flask.request.path.endswith(self.update_route):
+			return
+		body = flask.request.get_json(silent = True) or {}
+		if 'output' in body:
+			flask.g.callback_metrics = (CallbackMetrics.component_id(body['output']), perf_counter())
+
+	def _end_request(self, response):
+		timing = flask.g.pop('callback_metrics', None)
+		if timing is None:
+			return response
+		component_id, start = timing
+		if response.status_code == 204:
+			self.count(component_id, 'prevented')
+		elif response.status_code >= 500:
+			self.count(component_id, 'errors')
+		else:
+			response_bytes = response.content_length
+			if response_bytes is None:
+				response_bytes = len(response.get_data())
+			self.observe(component_id, perf_counter() - start, response_bytes)
+		return response
+
+	def _teardown_request(self, error = None):
+		# after_request does not run if an exception is not handled (debug mode for example)
+		timing = flask.g.pop('callback_metrics', None)
+		if timing is not None and error is not None:
+			self.count(timing[0], 'errors')
+
+	def init_app(self, server):
+		"""
+		times the update requests of callbacks on server (app.server)
+		"""
+		server.before_request(self._start_request)
+		server.after_request(self._end_request)
+		server.teardown_request(self._teardown_request)
+
+	@staticmethod
+	def _labels(**labels):
+		escaped = {key: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+						for key, value in labels.items()}
+		return ','.join(f'{key}="{value}"' for key, value in escaped.items())
+
+	def render(self):
+		"""
+		all metrics in the Prometheus text exposition format
+		"""
+		worker = os.getpid()
+		histograms = {'latency_seconds': ('latency', 'time of callback update requests including json serialization'),
+					'response_bytes': ('response_bytes', 'size of json responses')}
+		lines = []
+		with self._lock:
+			for name, (key, description) in histograms.items():
+				lines.append(f'# HELP {self.prefix}_{name} {description}')
+				lines.append(f'# TYPE {self.prefix}_{name} histogram')
+				for component_id, component in sorted(self.components.items()):
+					lines.extend(component[key].lines(f'{self.prefix}_{name}',
+									self._labels(component = component_id, worker = worker)))
+			for name, description in [('prevented', 'callbacks that raised PreventUpdate'), ('errors', 'callbacks that failed')]:
+				lines.append(f'# HELP {self.prefix}_{name}_total {description}')
+				lines.append(f'# TYPE {self.prefix}_{name}_total counter')
+				for component_id, component in sorted(self.components.items()):
+					lines.append(f'{self.prefix}_{name}_total{{{self._labels(component = component_id, worker = worker)}}} {component[name]}')
+		with callback_cache._lock:
+			cache_stats = {component_id: dict(stats) for component_id, stats in callback_cache.component_stats.items()}
+			cache_size = callback_cache.size
+		for name in ['hits', 'misses']:
+			lines.append(f'# HELP {self.prefix}_cache_{name}_total cache {name} of memoized component ids')
+			lines.append(f'# TYPE {self.prefix}_cache_{name}_total counter')
+			for component_id, stats in sorted(cache_stats.items()):
+				lines.append(f'{self.prefix}_cache_{name}_total{{{self._labels(component = component_id, worker = worker)}}} {stats[name]}')
+		lines.append(f'# HELP {self.prefix}_cache_hit_ratio hits/(hits + misses) of memoized component ids')
+		lines.append(f'# TYPE {self.prefix}_cache_hit_ratio gauge')
+		for component_id, stats in sorted(cache_stats.items()):
+			calls = stats['hits'] + stats['misses']
+			ratio = stats['hits']/calls if calls > 0 else 0.0
+			lines.append(f'{self.prefix}_cache_hit_ratio{{{self._labels(component = component_id, worker = worker)}}} {ratio:.4f}')
+		lines.append(f'# HELP {self.prefix}_cache_entries results in the memory cache')
+		lines.append(f'# TYPE {self.prefix}_cache_entries gauge')
+		lines.append(f'{self.prefix}_cache_entries{{{self._labels(worker = worker)}}} {cache_size}')
+		return '\n'.join(lines) + '\n'
+
+
+# one set of metrics for all callbacks of the app
+callback_metrics = CallbackMetrics()
@@ -18,44 +18,47 @@ import plotly.express as px
 from .. instruments.indices import Nasdaq 
 from .. utils import tools, keys
 from . import components 
-
-# load assets 
-# load all datasets
-nq = Nasdaq.load_assets()
-nq.load_sector_mean_returns_long()
-nq.load_fundamentals()
-nq.load_intervals_dataframe()
-
-# define dates and date differences 
-nq_start_date, nq_end_date = nq.date_range[0], nq.date_range[1]
-one_day_ago, one_week_ago, one_month_ago, six_months_ago, last_year_final_date, one_year_ago = tools.compute_time_deltas(end_date = nq_end_date)
+from . registry import registry, load_index_data 
 
 # ############# Graphs and callbacks ############## #
 index_name = 'Nasdaq'
+data_key = 'nasdaq'
+
+# load all datasets; called by the registry when the tab is first rendered (or prewarmed)
+def load_nasdaq():
+	nq = load_index_data(Nasdaq)
+	return nq 
+
+registry.register(data_key, load_nasdaq)
+
 # display date range first 
-sector_date_range_display = components.DateRangeDisplay(index_name = index_name, 
-					index_start_date = nq_start_date, index_end_date = nq_end_date).layout  
+sector_date_range_display = components.DateRangeDisplay(index_name = index_name, data_key = data_key)  
 # ##########   sector return history  ############ #
-sector_return_history = components.SectorReturnHistory(index_name = index_name,
-	 index_start_date=nq_start_date, index_end_date = nq_end_date, index_object = nq).layout 
+sector_return_history = components.SectorReturnHistory(index_name = index_name, data_key = data_key) 
 # ##########   Individual stock returns  ############ #
-stock_returns = components.StockReturns(index_name = index_name, index_start_date=nq_start_date, 
-		index_end_date = nq_end_date, index_object=nq).layout 
+stock_returns = components.StockReturns(index_name = index_name, data_key = data_key) 
+
+# ######### Risk Return Scatter Plots ########### #
+stock_risk_return = components.StockRiskReturn(index_name = index_name, data_key = data_key) 
 
 # ##########   Sector market cap pie chart ############ #
-sector_market_cap = components.SectorMarketCap(index_name = index_name, index_object=nq).layout 
+sector_market_cap = components.SectorMarketCap(index_name = index_name, data_key = data_key) 
 # ######### Methods for generating index fundamentals ######### #
 # available keys: Market Cap, P/E, Dividend %
-index_fundamentals = components.IndexFundamentals(index_name = index_name, index_object = nq).layout 
+index_fundamentals = components.IndexFundamentals(index_name = index_name, data_key = data_key) 
 # interval 
-index_interval = components.IntervalReturnDisplay(index_name = index_name, interval_df = nq.intervals_data).layout
+index_interval = components.IntervalReturnDisplay(index_name = index_name, data_key = data_key)
 
 # #############  	   Tabs     	############## #
-nasdaq_tab = dbc.Tab([
-	sector_date_range_display,
+nasdaq_components = [sector_date_range_display,
 		sector_return_history, 
 			stock_returns, 
+				stock_risk_return,
 				sector_market_cap, 
 					index_fundamentals,
-						index_interval
-], label = ['NASDAQ'])
\ No newline at end of file
+						index_interval]
+
+def nasdaq_layout():
+	return [component.layout for component in nasdaq_components]
+
+nasdaq_tab = dbc.Tab(label = ['NASDAQ'], tab_id = data_key)
\ No newline at end of file
@@ -4,12 +4,18 @@
 import dash_bootstrap_components as dbc 
 from ..analytics import performance 
 from . import components 
+from . registry import registry 
 
-histograms = performance.load_distributions()
+data_key = 'performance'
+# distributions are read from disk when the tab is first rendered (or prewarmed)
+registry.register(data_key, performance.load_distributions)
 
-asset_performance_population = components.PerformanceHist(histograms).layout 
+asset_performance_population = components.PerformanceHist(data_key = data_key, hist_id = 'return') 
 
-performance_tab = dbc.Tab([asset_performance_population], label = ['PERFORMANCE'])
+def performance_layout():
+	return [asset_performance_population.layout]
+
+performance_tab = dbc.Tab(label = ['PERFORMANCE'], tab_id = data_key)
 
 
 
@@ -0,0 +1,148 @@
+# ############################################## #
+# Registry of datasets displayed by the app;     #
+# each dataset is loaded once, when first needed #
+# ############################################## #
+import os
+from time import sleep
+from threading import Lock, Thread
+from timeit import default_timer
+from .. utils import keys, builds
+from . cache import callback_cache
+
+# SPEAKINGCHARTS_SHARED_DATA=1: indices are loaded from memory mapped files written by
+# Index.save_shared; workers of the app (gunicorn) then share one physical copy of the data
+SHARED_DATA = os.environ.get('SPEAKINGCHARTS_SHARED_DATA', '0') in ('1', 'true', 'True')
+# seconds between checks of the current build; 0 turns hot reload off
+RELOAD_INTERVAL = float(os.environ.get('SPEAKINGCHARTS_RELOAD_INTERVAL', 60))
+
+
+class DataRegistry:
+	"""
+	maps data keys (such as 'sp500') to loader functions
+		get(key) loads the data on the first call and returns the same object afterwards
+		prewarm() loads registered data on a background thread so that the
+			first tab render does not wait for disk reads
+		reload() loads the data again (from a new build) and swaps it in;
+			version changes with every swap so that layouts built from old data are rebuilt
+	"""
+	def __init__(self):
+		self._loaders = {}
+		self._data = {}
+		self._locks = {}
+		self._lock = Lock()
+		self.load_times = {}
+		self.version = None
+		self._watcher_pid = None
+		# a fork (gunicorn --preload) can copy a lock held by a prewarm thread of the parent
+		if hasattr(os, 'register_at_fork'):
+			os.register_at_fork(after_in_child = self._reset_locks)
+
+	def _reset_locks(self):
+		self._lock = Lock()
+		self._locks = {name:Lock() for name in self._loaders}
+
+	@property
+	def names(self):
+		return list(self._loaders.keys())
+
+	def register(self, name, loader):
+		with self._lock:
+			self._loaders[name] = loader
+			self._locks.setdefault(name, Lock())
+
+	def is_loaded(self, name):
+		return name in self._data
+
+	def get(self, name):
+		if name in self._data:
+			return self._data[name]
+		if name not in self._loaders:
+			raise KeyError(f'no loader is registered for {name}')
+		# one lock per key: a prewarm thread and a request never load the same data twice
+		with self._locks[name]:
+			if name not in self._data:
+				start = default_timer()
+				self._data[name] = self._loaders[name]()
+				self.load_times[name] = default_timer() - start
+		return self._data[name]
+
+	def reload(self, version = None):
+		"""
+		loads every loaded dataset again and swaps all of them in at once
+			requests are served from the old objects until the new ones are ready
+			datasets that are not loaded yet are loaded from the new build on first use
+		"""
+		names = [name for name in self.names if self.is_loaded(name)]
+		fresh = {}
+		for name in names:
+			start = default_timer()
+			fresh[name] = self._loaders[name]()
+			self.load_times[name] = default_timer() - start
+		with self._lock:
+			self._data.update(fresh)
+			self.version = version
+
+	def watch_builds(self, interval = RELOAD_INTERVAL):
+		"""
+		starts a thread (one per process) that follows the current build pointer
+			and reloads the data when a new build is published
+		"""
+		if interval <= 0 or self._watcher_pid == os.getpid():
+			return
+		self._watcher_pid = os.getpid()
+		Thread(target = self._follow_builds, args = (interval,), daemon = True, name = 'registry-builds').start()
+
+	def _follow_builds(self, interval):
+		store = builds.BuildStore()
+		while True:
+			sleep(interval)
+			version = store.current_version()
+			if version is None or version == self.version:
+				continue
+			previous_path = keys.LOAD_PATH
+			keys.LOAD_PATH = store.version_path(version)
+			try:
+				self.reload(version = version)
+			except Exception as error:
+				# the old data stays in use; the build is not tried again
+				keys.LOAD_PATH = previous_path
+				self.version = version
+				print(f'reloading build {version} failed: {error}')
+				continue
+			callback_cache.invalidate(version)
+			print(f'now serving build {version}')
+
+	def _load_all(self, names):
+		for name in names:
+			try:
+				self.get(name)
+			except Exception as error:
+				# the tab will try again (and show the error) when it is opened
+				print(f'prewarming {name} failed: {error}')
+
+	def prewarm(self, names = None, background = True):
+		names = self.names if names is None else list(names)
+		if not background:
+			self._load_all(names)
+			return None
+		thread = Thread(target = self._load_all, args = (names,), daemon = True, name = 'registry-prewarm')
+		thread.start()
+		return thread
+
+
+def load_index_data(index_class):
+	"""
+	loads an index with the datasets displayed by the app
+	"""
+	if SHARED_DATA and index_class.has_shared():
+		index = index_class.load_shared()
+	else:
+		index = index_class.load_assets()
+		index.load_fundamentals()
+		index.load_intervals_dataframe()
+	index.load_sector_mean_returns_long()
+	return index
+
+
+# one registry for all graph modules
+registry = DataRegistry()
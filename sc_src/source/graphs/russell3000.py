@@ -17,47 +17,47 @@ import plotly.express as px
 from .. instruments.indices import Russell3000 
 from .. utils import styles, tools, keys
 from . import components   
-
-# load assets 
-ru = Russell3000.load_assets()
-ru.load_sector_mean_returns_long()
-ru.load_fundamentals()
-ru.load_intervals_dataframe()
-
-# define dates and date differences 
-ru_start_date, ru_end_date = ru.date_range[0], ru.date_range[1]
-one_day_ago, one_week_ago, one_month_ago, six_months_ago, last_year_final_date, one_year_ago = tools.compute_time_deltas(end_date = ru_end_date)
+from . registry import registry, load_index_data 
 
 # ############# Graphs and callbacks ############## #
 index_name = 'russell3000'
+data_key = 'russell3000'
+
+# load assets; called by the registry when the tab is first rendered (or prewarmed)
+def load_russell3000():
+	ru = load_index_data(Russell3000)
+	return ru 
+
+registry.register(data_key, load_russell3000)
+
 # display date range first 
-sector_date_range_display = components.DateRangeDisplay(index_name = index_name, 
-					index_start_date = ru_start_date, index_end_date = ru_end_date).layout
+sector_date_range_display = components.DateRangeDisplay(index_name = index_name, data_key = data_key)
 # ##########   sector return history  ############ #
-sector_return_history = components.SectorReturnHistory(index_name = index_name,
-	 index_start_date= ru_start_date, index_end_date = ru_end_date, index_object = ru).layout
+sector_return_history = components.SectorReturnHistory(index_name = index_name, data_key = data_key)
 # ##########   Individual stock returns  ############ #
-stock_returns = components.StockReturns(index_name = index_name, index_start_date=ru_start_date, 
-		index_end_date = ru_end_date, index_object=ru).layout
+stock_returns = components.StockReturns(index_name = index_name, data_key = data_key)
+
+# ######### Risk Return Scatter Plots ########### #
+stock_risk_return = components.StockRiskReturn(index_name = index_name, data_key = data_key)
 
 # ##########   Sector market cap pie chart ############ #
-sector_market_cap = components.SectorMarketCap(index_name = index_name, index_object=ru).layout
+sector_market_cap = components.SectorMarketCap(index_name = index_name, data_key = data_key)
 # ######### Methods for generating index fundamentals ######### #
 # available keys: Market Cap, P/E, Dividend %
-index_fundamentals = components.IndexFundamentals(index_name = index_name, index_object = ru).layout
+index_fundamentals = components.IndexFundamentals(index_name = index_name, data_key = data_key)
 # index interval returns 
-index_interval = components.IntervalReturnDisplay(index_name = index_name, interval_df = ru.intervals_data).layout
+index_interval = components.IntervalReturnDisplay(index_name = index_name, data_key = data_key)
 
 # #############  	   Tabs     	############## #
-russell3000_tab = dbc.Tab([
-	sector_date_range_display,
+russell3000_components = [sector_date_range_display,
 		sector_return_history,
 			stock_returns, 
+				stock_risk_return,
 				sector_market_cap, 
 					index_fundamentals, 
-						index_interval 
-], label = ['RUSSELL3000'])
-
-
+						index_interval]
 
+def russell3000_layout():
+	return [component.layout for component in russell3000_components]
 
+russell3000_tab = dbc.Tab(label = ['RUSSELL3000'], tab_id = data_key)
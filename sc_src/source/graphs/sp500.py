@@ -17,61 +17,57 @@ import plotly.express as px
 from .. instruments.indices import SP500 
 from .. utils import tools, keys
 from . import components   
-
-# load assets 
-# load all datasets
-sp = SP500.load_assets()
-sp.load_sector_mean_returns_long()
-sp.load_fundamentals()
-# loads sp500 and spxew (equal weight sp500) dataframes
-sp.load_index()
-sp.load_intervals_dataframe()
-
-# define dates and date differences 
-sp_start_date, sp_end_date = sp.date_range[0], sp.date_range[1]
-one_day_ago, one_week_ago, one_month_ago, six_months_ago, last_year_final_date, one_year_ago = tools.compute_time_deltas(end_date = sp_end_date)
+from . registry import registry, load_index_data 
 
 # ############# 		Graphs and callbacks		 ############## #
 index_name = 's&p500'
+data_key = 'sp500'
+
+# load all datasets; called by the registry when the tab is first rendered (or prewarmed)
+def load_sp500():
+	sp = load_index_data(SP500)
+	# loads sp500 and spxew (equal weight sp500) dataframes
+	sp.load_index()
+	return sp 
 
+registry.register(data_key, load_sp500)
+
+# components register their callbacks here; layouts are built from the data on first render
 # display date range first 
-sector_date_range_display = components.DateRangeDisplay(index_name = index_name, 
-					index_start_date = sp_start_date, index_end_date = sp_end_date).layout  
+sector_date_range_display = components.DateRangeDisplay(index_name = index_name, data_key = data_key)  
 
 # ##########   index vs equal weight index performance  ############ #
-sector_xew_history = components.XEWDisplay(index_name = index_name, 
-	index_start_date = sp_start_date, index_end_date = sp_end_date, index_object = sp).layout
+sector_xew_history = components.XEWDisplay(index_name = index_name, data_key = data_key)
 # ##########   sector return history  ############ #
-sector_return_history = components.SectorReturnHistory(index_name = index_name,
-	index_start_date=sp_start_date, index_end_date = sp_end_date, index_object = sp).layout 
+sector_return_history = components.SectorReturnHistory(index_name = index_name, data_key = data_key) 
 # ##########   Individual stock returns  ############ #
-stock_returns = components.StockReturns(index_name = index_name, index_start_date=sp_start_date, 
-	index_end_date = sp_end_date, index_object=sp).layout 
+stock_returns = components.StockReturns(index_name = index_name, data_key = data_key) 
 
 # ######### Risk Return Scatter Plots ########### #
-#stock_risk_return = components.StockRiskReturn(index_name = index_name, index_start_date= sp_start_date, 
-	#	index_end_date = sp_end_date, index_object = sp).layout 
+stock_risk_return = components.StockRiskReturn(index_name = index_name, data_key = data_key) 
 
 # ##########   Sector market cap pie chart ############ #
-sector_market_cap = components.SectorMarketCap(index_name = index_name, index_object=sp).layout 
+sector_market_cap = components.SectorMarketCap(index_name = index_name, data_key = data_key) 
 # ######### Methods for generating index fundamentals ######### #
 # available keys: Market Cap, P/E, Dividend %
-index_fundamentals = components.IndexFundamentals(index_name = index_name, index_object = sp).layout
+index_fundamentals = components.IndexFundamentals(index_name = index_name, data_key = data_key)
 # index interval returns 
-index_interval = components.IntervalReturnDisplay(index_name = index_name, interval_df = sp.intervals_data).layout  
+index_interval = components.IntervalReturnDisplay(index_name = index_name, data_key = data_key)  
 # interval checklist mode 
-index_interval_checklist = components.IntervalDisplayCheckList(index_name = index_name, interval_df=sp.intervals_data, options_key = 'Return').layout
+index_interval_checklist = components.IntervalDisplayCheckList(index_name = index_name, data_key = data_key, options_key = 'Return')
 
 # #############  	   Tabs     	############## #
-sp500_tab = dbc.Tab([
-	sector_date_range_display,
+sp500_components = [sector_date_range_display,
 		sector_xew_history, 
 			sector_return_history, 
 				stock_returns, 
-					#stock_risk_return,
+					stock_risk_return,
 						sector_market_cap, 
 							index_fundamentals,
 								index_interval, 
-									index_interval_checklist 
-], label = ['SP500'])
+									index_interval_checklist]
+
+def sp500_layout():
+	return [component.layout for component in sp500_components]
 
+sp500_tab = dbc.Tab(label = ['SP500'], tab_id = data_key)
@@ -0,0 +1,196 @@
+# ############################################# #
+# Snapshot of fundamentals of all tickers with  #
+# its own refresh cadence; price updates do not #
+# pull metadata of every ticker                 #
+# ############################################# #
+import os
+from os import path
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from . securities import Asset
+from .. utils import keys, tools
+
+
+class FundamentalsSnapshot:
+    """
+    FUNDAMENTALS/
+        snapshot-<version>.parquet  one row per ticker: fundamentals, the close price at the time
+                                        of the pull and the update time of each field group
+    a refresh writes a new version with the rows it pulled; the newest row of a ticker is used
+        versions are never rewritten, so indices updated in parallel processes do not overwrite each other;
+        versions are merged into one when there are more than keep of them
+    fields are grouped by how fast they change; each group has its own ttl_hours
+        identity: name and sector
+        dividends: dividend fields
+        valuation: all other numeric fields; market cap and P/E are scaled by
+            latest price/snapshot price, so they follow the price between pulls
+    """
+    dirname = 'FUNDAMENTALS'
+    prefix = 'snapshot-'
+    price_column = 'snapshotPrice'
+    default_ttl_hours = {'identity': 24*30, 'dividends': 24*7, 'valuation': 24*7}
+    price_scaled_fields = ['marketCap', 'trailingPE']
+
+    def __init__(self, snapshot_path = None, ttl_hours = None, keep = 3):
+        self.snapshot_path = snapshot_path if snapshot_path is not None else path.join(keys.DATA_PATH, self.dirname)
+        self.ttl_hours = dict(self.default_ttl_hours, **(ttl_hours or {}))
+        self.keep = keep
+        self._table = None
+        self._read_versions = None
+
+    @classmethod
+    def at(cls, load_path = None, **kwargs):
+        if load_path is None:
+            load_path = keys.LOAD_PATH
+        return cls(path.join(load_path, cls.dirname), **kwargs)
+
+    @staticmethod
+    def field_groups():
+        dividends = [key for key in Asset.fundamentals_numeric_keys if 'dividend' in key.lower()]
+        return {'identity': list(Asset.fundamentals_id_keys), 'dividends': dividends,
+                    'valuation': [key for key in Asset.fundamentals_numeric_keys if key not in dividends]}
+
+    @staticmethod
+    def _updated_column(group):
+        return group + 'Updated'
+
+    @property
+    def exists(self):
+        return len(self.versions()) > 0
+
+    def versions(self):
+        if not path.exists(self.snapshot_path):
+            return []
+        return sorted(file_name for file_name in os.listdir(self.snapshot_path)
+                        if file_name.startswith(self.prefix) and file_name.endswith('.parquet'))
+
+    def read(self, attempts = 3):
+        """
+        returns the table of the newest row of each ticker indexed by Ticker
+        attempts: a version merged into a newer one by another process while it is read
+            is skipped by listing the versions again, at most attempts times
+        """
+        for attempt in range(attempts):
+            versions = self.versions()
+            if self._table is not None and versions == self._read_versions:
+                return self._table
+            try:
+                frames = [pd.read_parquet(path.join(self.snapshot_path, version)) for version in versions]
+                break
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+        if len(frames) == 0:
+            table = pd.DataFrame(columns = ['Ticker']).set_index('Ticker')
+        else:
+            table = pd.concat(frames, ignore_index = True).drop_duplicates(subset = ['Ticker'], keep = 'last')
+            table = table.set_index('Ticker')
+        self._table, self._read_versions = table, versions
+        return table
+
+    def stale(self, tickers, groups = None):
+        """
+        tickers that are not in the snapshot or have a field group older than its ttl
+        groups: groups that must be fresh; all groups if None
+            each group is compared with its own update time and ttl
+        """
+        table = self.read()
+        groups = list(self.ttl_hours.keys()) if groups is None else groups
+        now = pd.Timestamp(datetime.now())
+        stale_tickers = []
+        for ticker in tickers:
+            if ticker not in table.index:
+                stale_tickers.append(ticker)
+                continue
+            row = table.loc[ticker]
+            for group in groups:
+                updated = row.get(self._updated_column(group))
+                if updated is None or pd.isnull(updated) or (now - updated).total_seconds() > self.ttl_hours[group]*3600:
+                    stale_tickers.append(ticker)
+                    break
+        return stale_tickers
+
+    def put(self, fundamentals = None, prices = None, groups = None):
+        """
+        writes a new version
+        fundamentals: dictionary of {ticker: fundamentals dictionary} pulled now
+        prices: dictionary of {ticker: close price at the time of the pull}
+        groups: field groups of fundamentals that are updated; all groups if None
+            (one info call returns every group); fields and update times of other
+            groups are kept from the snapshot
+        """
+        if not fundamentals:
+            return
+        prices = prices or {}
+        groups = list(self.ttl_hours.keys()) if groups is None else groups
+        field_groups = self.field_groups()
+        table = self.read()
+        now = pd.Timestamp(datetime.now())
+        rows = []
+        for ticker, fund in fundamentals.items():
+            row = table.loc[ticker].to_dict() if ticker in table.index else {}
+            row['Ticker'] = ticker
+            row[self.price_column] = prices.get(ticker, row.get(self.price_column, np.nan))
+            for group in groups:
+                row.update({field: fund.get(field) for field in field_groups.get(group, [])})
+                row[self._updated_column(group)] = now
+            rows.append(row)
+        tools.make_dir(self.snapshot_path)
+        version = self.prefix + now.strftime('%Y%m%d-%H%M%S-%f') + f'-{os.getpid()}.parquet'
+        file_name = path.join(self.snapshot_path, version)
+        pd.DataFrame(rows).to_parquet(file_name + '.tmp', engine = 'pyarrow', index = False)
+        os.replace(file_name + '.tmp', file_name)
+        if len(self.versions()) > self.keep:
+            self.compact()
+
+    def compact(self):
+        """
+        merges all versions into one; the merged version is written before the others are removed
+        """
+        versions = self.versions()
+        table = self.read().reset_index()
+        file_name = path.join(self.snapshot_path, versions[-1].replace('.parquet', '-merged.parquet'))
+        table.to_parquet(file_name + '.tmp', engine = 'pyarrow', index = False)
+        os.replace(file_name + '.tmp', file_name)
+        for version in versions:
+            if path.join(self.snapshot_path, version) != file_name:
+                try:
+                    os.remove(path.join(self.snapshot_path, version))
+                except FileNotFoundError:
+                    pass
+        self._table = None
+
+    def get(self, tickers = None, prices = None):
+        """
+        returns a dictionary of {ticker: fundamentals dictionary} of tickers in the snapshot
+        prices: dictionary of {ticker: latest price}; price scaled fields are moved with the price
+        """
+        table = self.read()
+        fields = [field for group_fields in self.field_groups().values() for field in group_fields]
+        tickers = list(table.index) if tickers is None else [ticker for ticker in tickers if ticker in table.index]
+        prices = prices or {}
+        snapshot = {}
+        for ticker in tickers:
+            row = table.loc[ticker]
+            fund = {field: (None if pd.isnull(row.get(field)) else row.get(field)) for field in fields}
+            latest_price, snapshot_price = prices.get(ticker), row.get(self.price_column)
+            if latest_price is not None and snapshot_price is not None and not pd.isnull(snapshot_price) and snapshot_price > 0:
+                for field in self.price_scaled_fields:
+                    if isinstance(fund.get(field), (int, float, np.number)):
+                        fund[field] = fund[field]*latest_price/snapshot_price
+            snapshot[ticker] = fund
+        return snapshot
+
+    def refresh(self, tickers, download, prices = None, groups = None):
+        """
+        pulls fundamentals of stale tickers with download (a function of a list of tickers
+            returning {ticker: fundamentals dictionary}) and returns the fundamentals of all tickers
+        groups: groups that must be fresh (all groups if None); a pull returns every group,
+            so all groups of pulled tickers are updated
+        """
+        stale_tickers = self.stale(tickers, groups = groups)
+        if len(stale_tickers) > 0:
+            print(f'pulling fundamentals of {len(stale_tickers)} of {len(tickers)} tickers; the others are in the snapshot')
+            self.put(download(stale_tickers), prices = prices)
+        return self.get(tickers, prices = prices)
@@ -1,16 +1,20 @@
 
-from copy import deepcopy 
 import pandas as pd
 import numpy as np
 import pandas_datareader.data as web 
 import pickle 
 import re 
-from os import path, makedirs  
-from datetime import datetime
+from os import path, makedirs, remove  
+from datetime import datetime, date, timedelta
 import yfinance as yf 
 from . securities import Stock
+from . ingestion import BulkDownloader, IngestionCheckpoint, checkpoint_root
+from . panel import PricePanel
+from . master import SecurityMaster
+from . fundamentals import FundamentalsSnapshot
 from .. utils import market_data 
-from .. utils import keys,tools 
+from .. utils import keys,tools, shared, profiling 
+from .. utils.store import PriceStore
 
 # ####################### #
 # Base class              #
@@ -23,6 +27,8 @@ class Index:
     all calculations are performed on all stocks in the index
     """
     list_of_assets = None
+    # constituents are pulled (or read) when first needed and kept in a snapshot
+    constituents_filename = 'constituents.csv'
     # list of keys for loading files 
 
     assets_filename = keys.INDEX_ASSETS
@@ -32,6 +38,11 @@ class Index:
     sector_fundamentals_filename = keys.INDEX_SECTOR_FUNDAMENTALS 
     index_fundamentals_filename = keys.INDEX_FUNDAMENTALS 
     index_interval_data_filename = keys.INTERVAL_FRAME  
+    intervals_parquet_filename = 'intervals_data.parquet'
+    interval_histograms_filename = 'interval_histograms.parquet'
+    # memory mapped files of the serving mode; see save_shared and load_shared
+    shared_dirname = 'shared'
+    shared_tables = ['fundamentals', 'sector_fundamentals', 'intervals_data']
 
     interval_keys = keys.TIME_INTERVALS_KEYS
     fundamentals_keys = ['Market Cap', 'P/E(TTM)', 'Dividend %'] 
@@ -68,7 +79,19 @@ class Index:
         # interval return methods and attributes
         self.intervals = None 
         # contains information of return and price movement within intervals 
-        self.intervals_data = None 
+        self.intervals_data = None
+        self.interval_histograms = None
+        # throughput report of the last pull_assets(bulk = True)
+        self.ingestion_report = None
+        # latest date before an incremental update_assets
+        self.previous_latest_date = None
+        # earliest split or dividend of tickers pulled again in an incremental update;
+        #   their adjusted prices before it changed
+        self.adjusted_since = None
+        # aligned price matrix of all assets; see the panel property
+        self._panel = None
+        # sector mean returns of frequencies other than the stored monthly and quarterly ones
+        self._sector_mean_return_long = {}
         self._generate_intervals()
         
     @property 
@@ -80,6 +103,28 @@ class Index:
         if self._main_save_path == None and new_path != '':
             self._main_save_path = new_path
     
+    @property
+    def panel(self):
+        """
+        PricePanel of all assets; it is built on first use and shared by all return calculations
+        """
+        if self._panel is None:
+            self._panel = PricePanel.from_assets(assets = self.assets)
+        return self._panel
+
+    def __getstate__(self):
+        # the panel is rebuilt from assets after unpickling
+        state = self.__dict__.copy()
+        state['_panel'] = None
+        return state
+
+    @property
+    def has_new_data(self):
+        """
+        False only after an incremental update that did not add any bars or tickers
+        """
+        return self.previous_latest_date is None or self.latest_date > self.previous_latest_date
+
     @property 
     def risk_free(self):
         return self._risk_free
@@ -94,7 +139,7 @@ class Index:
     @risk_free.setter 
     def risk_free(self, new_rf):
         if self._risk_free is None and new_rf in ['DGS10']:
-            self._risk_free = web.DataReader(new_rf, 'fred', self.date_range[0], self.date_range[1])
+            self._risk_free = market_data.get_fred_series(new_rf, self.date_range[0], self.date_range[1])
     
     def set_daily_risk_free(self):
         if self.risk_free is not None and self.daily_risk_free is None:
@@ -116,8 +161,9 @@ class Index:
 
     @staticmethod 
     def _date_range_to_str(frame):
-        start = frame.index.date.min().strftime('%Y-%m-%d')
-        end = frame.index.date.max().strftime('%Y-%m-%d')
+        ordinals = tools.to_ordinals(frame.index)
+        start = tools.ordinal_to_date(ordinals.min()).strftime('%Y-%m-%d')
+        end = tools.ordinal_to_date(ordinals.max()).strftime('%Y-%m-%d')
         return start, end
 
     @staticmethod 
@@ -148,16 +194,28 @@ class Index:
         with open(file_name, 'wb') as f:
             pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
 
-    def save_assets(self):
+    def save_assets(self, master = None):
         """
         saves assets dictionary and sector_ticker dictionary if
             class is instantiated from these dictionaries
         appliable to Russell2000 index
+        price history and fundamentals are saved in the columnar PriceStore
+        master: a SecurityMaster that already stores the assets; only the membership
+            bitmap of the index is written and the PriceStore of the index is removed
         """
-        asset_name = path.join(self.main_save_path,  'all_assets.pkl')
-        with open(asset_name, 'wb') as f:
-            for asset in self.assets.values():
-                pickle.dump(asset, f, protocol = pickle.HIGHEST_PROTOCOL)
+        index_name = self.__class__.__name__
+        if master is not None:
+            master.set_members(index_name, list(self.assets.keys()))
+            store = PriceStore(self.main_save_path)
+            for file_name in [store.prices_file, store.fundamentals_file]:
+                if path.exists(file_name):
+                    remove(file_name)
+        else:
+            PriceStore(self.main_save_path).write(
+                    frames = {ticker: asset.data for ticker, asset in self.assets.items()},
+                        fundamentals = {ticker: asset.fundamentals for ticker, asset in self.assets.items()})
+            # the PriceStore of the index is read from now on
+            SecurityMaster(path.join(path.dirname(self.main_save_path), SecurityMaster.dirname)).remove_members(index_name)
         
         sector_filename = path.join(self.main_save_path, 'sectors.dat')
         
@@ -180,9 +238,14 @@ class Index:
         computes historical values of cumulative returns
             it is useful for plotting these values for a group of stocks
             for example: a plot of cumulative returns for tickers in a sector
+        daily close prices are read from the price panel; other samplings are computed for each stock
         """
         if within_dates is None:
             within_dates = self.date_range 
+        if sampling == 'D' and end_point == 'Close':
+            history = self.panel.cumulative_returns_history(within_dates = within_dates, tickers = tickers)
+            return {tickr: history[tickr].dropna() for tickr in history.columns if history[tickr].notna().any()}
+
         cumulative_returns_history = {}
         for tickr in tickers:
             cm_returns = self.assets[tickr].cumulative_return(within_dates = within_dates, 
@@ -201,13 +264,22 @@ class Index:
         NOTE: investment return is equivalent to (price[-1] - price[0])/price[0] and is cimulative_return[-1]
         Example: invest 100$: if investment return is 1.2 it means 120 return will be gained (after removing 100$ initial)
         Returns a dataframe of ['ticker','company name', 'investment return', 'sector'] sorted by investment return
+        daily close prices are read from the price panel; other samplings are computed for each stock
         """
         
         if within_dates is None:
             within_dates = self.date_range 
         
         return_key = return_prefix + 'Return'
-        
+        if sampling == 'D' and end_point == 'Close':
+            returns = self.panel.window_returns(within_dates = within_dates)
+            valid = ~np.isnan(returns)
+            main_return_dict = {return_key: returns[valid]}
+            if add_ticker_info:
+                main_return_dict.update({'Ticker': self.panel.tickers[valid], 'Sector': self.panel.sectors[valid],
+                        'Name': self.panel.names[valid], 'Latest_Price': self.panel.latest_prices[valid]})
+            return pd.DataFrame(main_return_dict)
+
         main_return_dict = {return_key:[]}
         ticker_info_dict = {'Ticker':[], 'Sector':[], 'Name':[], 'Latest_Price':[]}
         for stock in self.assets.values():
@@ -241,6 +313,9 @@ class Index:
             self.risk_free = risk_free 
             self.set_daily_risk_free()
         
+        if sampling == 'D' and end_point == 'Close':
+            return self._panel_risk_return(within_dates = within_dates)
+
         risk_return_dict = {'Ticker':[], 'Sector':[], 'Name':[],
                                  'Return':[], 'Volatility': [], 'Sharpe Ratio': [], 'Latest Price': [], 
                                     'Average Price Last Week':[], 'Average Price Last Month':[], 
@@ -252,16 +327,16 @@ class Index:
             risk_return_dict['Name'].append(stock.name)
             risk_return_dict['Sector'].append(stock.sector)
             stock.risk_free = self.daily_risk_free
-            investment_return = stock.investment_return(within_dates = within_dates, 
-                                end_point = end_point, sampling = sampling, initial_investment = 0)
+            investment_return = list(stock.investment_return(within_dates = within_dates, 
+                                end_point = end_point, sampling = sampling, initial_investment = 0).values())[0]
             volatility = stock.volatility(within_dates = within_dates, end_point = end_point, 
                                         sampling = sampling)
             sharpe = stock.sharpe(within_dates = within_dates, end_point = end_point, 
                                         sampling = sampling)
-            risk_return_dict['Return'].append(list(investment_return.values())[0])
+            risk_return_dict['Return'].append(investment_return)
             risk_return_dict['Volatility'].append(volatility)
             risk_return_dict['Sharpe Ratio'].append(sharpe)
-            risk_return_dict['Latest Price'].append(stock.price_latest)
+            risk_return_dict['Latest Price'].append(stock.latest_price)
             risk_return_dict['Average Price Last Week'].append(stock.price_avg_last_week)
             risk_return_dict['Average Price Last Month'].append(stock.price_avg_last_month)
             risk_return_dict['Average Price Last Six Months'].append(stock.price_avg_last_six_months)
@@ -270,6 +345,34 @@ class Index:
         risk_return_df = pd.DataFrame.from_dict(risk_return_dict, orient = 'columns')
         return risk_return_df 
 
+    def _panel_risk_return(self, within_dates = None):
+        """
+        compute_risk_return of daily close prices for all stocks at once using the price panel
+        """
+        panel = self.panel
+        num_periods = keys.NUM_PERIODS['D']
+        risk_free = np.nan
+        if self.daily_risk_free is not None:
+            daily_risk_free = tools.choose_dates(self.daily_risk_free, within_dates)
+            if daily_risk_free is not None:
+                risk_free = daily_risk_free.mean().values[0]
+        risk_return_df = pd.DataFrame({'Ticker': panel.tickers, 'Sector': panel.sectors, 'Name': panel.names,
+                            'Return': panel.window_returns(within_dates = within_dates),
+                                'Volatility': panel.volatility(within_dates = within_dates, num_periods = num_periods),
+                                    'Sharpe Ratio': panel.sharpe(within_dates = within_dates, risk_free = risk_free, 
+                                                num_periods = num_periods),
+                                        'Latest Price': panel.latest_prices})
+        # average prices before the latest date of each stock; few distinct latest dates exist
+        latest_dates, inverse = np.unique(panel.latest_dates, return_inverse = True)
+        latest_dates = [tools.ordinal_to_date(latest_date) for latest_date in latest_dates]
+        for column, time_delta in [('Average Price Last Week', tools.get_one_week_ago), 
+                                    ('Average Price Last Month', tools.get_one_month_ago),
+                                        ('Average Price Last Six Months', tools.get_six_months_ago),
+                                            ('Average Price Last One Year', tools.get_one_year_ago)]:
+            start_dates = np.array([tools.date_to_ordinal(time_delta(latest_date)) for latest_date in latest_dates])
+            risk_return_df[column] = panel.mean_prices_since(start_dates = start_dates[inverse])
+        return risk_return_df
+
 
     def compute_mean_volume(self, within_dates = None, fully_within_date_range = True):
         if within_dates is None:
@@ -291,6 +394,13 @@ class Index:
         for sector in sectors:
             tickers.extend(self.sectors[sector])
 
+        if sampling == 'D' and end_point == 'Close':
+            if within_dates is None:
+                within_dates = self.date_range
+            history = self.panel.cumulative_returns_history(within_dates = within_dates, tickers = tickers)
+            return pd.DataFrame({sector: history[[ticker for ticker in self.sectors[sector] if ticker in history.columns]].mean(axis = 1)
+                            for sector in sectors})
+
         cumulative_return_history = self.compute_cumulative_returns_history(within_dates = within_dates, 
                 end_point = end_point, sampling = sampling, tickers = tickers)
         
@@ -322,28 +432,76 @@ class Index:
         sector_mean_returns = Index._sort_dict(sector_mean_returns, high_to_low = True)
         return sector_mean_returns
     
-    # ### useful methods for longformat data generation ### #    
-    def generate_sector_mean_return_long(self, freq = 'M', start_date = None,
-                             end_date = None, save_data = False):
+    def sector_period_returns(self, freq = 'M', start_date = None, end_date = None):
+        """
+        mean return of stocks of each sector in consecutive periods of frequency freq (W, M, Q, A, ...)
+            periods run between consecutive dates of pd.date_range(start_date, end_date, freq)
+        returns of all stocks in all periods are computed at once from the price panel 
+        returns a dataframe of period start dates as index and sectors as columns
+        """
         if start_date is None:
             start_date = self.date_range[0]
         if end_date is None:
             end_date = self.date_range[1]
         _dates = pd.date_range(start = start_date, end = end_date, freq = freq).date
-        mean_values = []
-        for p_start, p_end in zip(_dates[:-1], _dates[1:]):
-            sector_mean_return = self.sector_mean_returns(within_dates = (p_start, p_end))
-            return_df = pd.DataFrame([sector_mean_return])
-            mean_values.append(return_df)
-        sector_mean_return_df = pd.concat(mean_values)
+        starts = np.array([tools.date_to_ordinal(_date) for _date in _dates[:-1]], dtype = np.int64)
+        ends = np.array([tools.date_to_ordinal(_date) for _date in _dates[1:]], dtype = np.int64)
+        returns = self.panel.periods_returns(starts = starts, ends = ends)
+        sector_returns = self.panel.sector_means(values = returns, sectors = self.sector_keys)
+        return pd.DataFrame(sector_returns.T, index = pd.Index(_dates[:-1], name = 'Date'),
+                        columns = self.sector_keys)
+
+    def sector_mean_return_long(self, freq = 'M'):
+        """
+        long format sector mean returns of any frequency on demand
+            loaded monthly and quarterly frames are used if available 
+        """
+        loaded = {'M': self.sector_mean_return_long_m, 'Q': self.sector_mean_return_long_q}.get(freq)
+        if loaded is not None:
+            return loaded
+        if freq not in self._sector_mean_return_long:
+            self._sector_mean_return_long[freq] = Index._sector_returns_to_long(self.sector_period_returns(freq = freq))
+        return self._sector_mean_return_long[freq]
+
+    @staticmethod
+    def _sector_returns_to_long(sector_mean_return_df):
         value_vars = list(sector_mean_return_df.columns)
-        sector_mean_return_df['Date'] = _dates[:-1]
-        sector_mean_return_long = sector_mean_return_df.melt(id_vars = ['Date'], 
+        return sector_mean_return_df.reset_index().melt(id_vars = ['Date'], 
                         value_vars = value_vars, ignore_index = True, var_name = 'Sector', 
                                     value_name = 'Return')
+
+    # ### useful methods for longformat data generation ### #    
+    def generate_sector_mean_return_long(self, freq = 'M', start_date = None,
+                             end_date = None, save_data = False, incremental = False):
+        """
+        incremental: after an incremental update_assets only periods that start after
+            the last stored period are computed and appended to the stored file
+            stored periods from the one that contains adjusted_since are computed again
+        """
+        file_name = 'sector_return_long_' + freq + '_sampling.parquet'
+        save_name = path.join(self.main_save_path, file_name)
+        stored_long = None
+        if incremental and self.previous_latest_date is not None and path.exists(save_name):
+            stored_long = pd.read_parquet(save_name)
+
+        sector_mean_return_df = self.sector_period_returns(freq = freq, start_date = start_date, 
+                                        end_date = end_date)
+        if stored_long is not None:
+            stored_dates = pd.to_datetime(stored_long['Date']).dt.date
+            recompute = sector_mean_return_df.index > stored_dates.max()
+            if self.adjusted_since is not None:
+                starts = sector_mean_return_df.index[sector_mean_return_df.index < self.adjusted_since]
+                if len(starts) > 0:
+                    recompute = recompute | (sector_mean_return_df.index >= starts.max())
+            sector_mean_return_df = sector_mean_return_df[recompute]
+            if len(sector_mean_return_df) == 0:
+                return stored_long
+            stored_long = stored_long[(stored_dates < sector_mean_return_df.index.min()).to_numpy()]
+
+        sector_mean_return_long = Index._sector_returns_to_long(sector_mean_return_df)
+        if stored_long is not None:
+            sector_mean_return_long = pd.concat([stored_long, sector_mean_return_long], ignore_index = True)
         if save_data:
-            file_name = 'sector_return_long_' + freq + '_sampling.parquet'
-            save_name = path.join(self.main_save_path, file_name)
             sector_mean_return_long.to_parquet(save_name, engine = 'auto', index = False, compression = 'snappy')
         
         return sector_mean_return_long 
@@ -370,17 +528,23 @@ class Index:
         generates four dataframes and saves them in parquet files 
             they can also be loaded 
         Note that in the final plot 0 must be dropped, otherwise None will be dropped 
+        fundamentals are read from the FundamentalsSnapshot of DATA_PATH if there is one;
+            fundamentals of Stock objects are used for tickers that are not in the snapshot
         """
         fundamentals = {'Stock':[], 'Sector':[],
                     'Market Cap':[], 'P/E(TTM)': [],
                      'Dividend %':[], 'Name':[], 'Latest Price,$': []}
+        snapshot = FundamentalsSnapshot()
+        snapshot = snapshot.get(list(self.assets.keys()), prices = {ticker: stock.latest_price 
+                        for ticker, stock in self.assets.items()}) if snapshot.exists else {}
         for ticker, stock in self.assets.items():
+            stock_fundamentals = snapshot.get(ticker, stock.fundamentals)
             fundamentals['Stock'].append(ticker)
-            fundamentals['Sector'].append(stock.sector)
-            fundamentals['Name'].append(stock.name)
-            fundamentals['Market Cap'].append(stock.fundamentals['marketCap'])
-            fundamentals['P/E(TTM)'].append(stock.fundamentals['trailingPE'])
-            fundamentals['Dividend %'].append(stock.fundamentals['dividendYield'])
+            fundamentals['Sector'].append(stock_fundamentals.get('sector') or stock.sector)
+            fundamentals['Name'].append(stock_fundamentals.get('shortName') or stock.name)
+            fundamentals['Market Cap'].append(stock_fundamentals['marketCap'])
+            fundamentals['P/E(TTM)'].append(stock_fundamentals['trailingPE'])
+            fundamentals['Dividend %'].append(stock_fundamentals['dividendYield'])
             fundamentals['Latest Price,$'].append(stock.latest_price)
         
         self.fundamentals = pd.DataFrame(fundamentals)
@@ -401,34 +565,57 @@ class Index:
         hist_df = pd.DataFrame(np.c_[bins[:, np.newaxis], hist[:, np.newaxis]], columns = [key, 'Number'])
         return hist_df[hist_df['Number'] != 0]
          
-    def generate_price_movement_and_histograms_in_intervals(self, sampling = 'D', bins = 50):
+    def compute_interval_returns(self, sampling = 'D'):
         """
-        generates price movements, returns and the latest price for all assets
+        returns (in %) of all assets in all intervals with one row per asset 
+            columns: first interval return, Ticker, Sector, Name, Latest_Price, other interval returns
+            nan where an asset has less than two prices in an interval
+        daily returns of all intervals are computed at once from the price panel
         """
-        all_intervals = []
-        for count, interval_info in enumerate(self.intervals.items()):
-            interval_key, interval = interval_info
-            if count == 0:
-                add_ticker_info = True 
-                hist_keys = [interval_key + '_Return', 'Latest_Price']
-            else:
-                add_ticker_info = False 
-                hist_keys = [interval_key + '_Return']
-            
+        return_keys = [interval_key + '_Return' for interval_key in self.intervals.keys()]
+        if sampling == 'D':
+            starts = [tools.date_to_ordinal(start) for start, _ in self.intervals.values()]
+            ends = [tools.date_to_ordinal(end) for _, end in self.intervals.values()]
+            returns = self.panel.periods_returns(starts = starts, ends = ends)*100
+            intervals_data = pd.DataFrame(returns, columns = return_keys)
+            intervals_data.insert(1, 'Ticker', self.panel.tickers)
+            intervals_data.insert(2, 'Sector', self.panel.sectors)
+            intervals_data.insert(3, 'Name', self.panel.names)
+            intervals_data.insert(4, 'Latest_Price', self.panel.latest_prices)
+            return intervals_data
+
+        intervals_data = None 
+        for interval_key, interval in self.intervals.items():
             interval_return_df = self.compute_investment_returns(within_dates = interval,
-                                    sampling = sampling, add_ticker_info = add_ticker_info, return_prefix=interval_key + '_')
-            interval_return_df[interval_key +'_'+'Return'] *= 100 
-            all_intervals.append(interval_return_df)
-            # three histograms are also generated: Return, Latest price, Price Change
-            for key in hist_keys:
-                hist_key_df = self._generate_histogram(interval_return_df, key = key, bins = bins)
-                filename =  key.lower() + '_Hist_In_Interval_Of_' + interval_key + '.csv'
-                hist_key_df.to_csv(path.join(self._main_save_path, filename), sep = ',', header = True, index = False, 
-                        float_format = '%.5f')
-
-        self.intervals_data = pd.concat(all_intervals, axis = 1)
-        self.intervals_data.to_csv(path.join(self._main_save_path, 'intervals_data.csv'), sep = ',', 
-                header = True, index = False)
+                                    sampling = sampling, return_prefix = interval_key + '_')
+            interval_return_df[interval_key + '_Return'] *= 100
+            if intervals_data is None:
+                intervals_data = interval_return_df
+            else:
+                intervals_data = intervals_data.merge(interval_return_df[['Ticker', interval_key + '_Return']],
+                                    on = 'Ticker', how = 'outer')
+        return intervals_data
+
+    def generate_price_movement_and_histograms_in_intervals(self, sampling = 'D', bins = 50, save_data = True):
+        """
+        generates returns in all intervals and the latest price for all assets and their histograms 
+        histograms of all interval returns and the latest price are stacked in one long dataframe
+            of Key (column name), Value (bin center) and Number columns
+        """
+        self.intervals_data = self.compute_interval_returns(sampling = sampling)
+        hist_keys = [column for column in self.intervals_data.columns if column.endswith('_Return')] + ['Latest_Price']
+        histograms = []
+        for key in hist_keys:
+            hist_key_df = self._generate_histogram(self.intervals_data.dropna(subset = [key]), key = key, bins = bins)
+            hist_key_df = hist_key_df.rename(columns = {key: 'Value'})
+            hist_key_df.insert(0, 'Key', key)
+            histograms.append(hist_key_df)
+        self.interval_histograms = pd.concat(histograms, ignore_index = True)
+        if save_data:
+            self.intervals_data.to_parquet(path.join(self._main_save_path, self.intervals_parquet_filename),
+                    engine = 'auto', index = False, compression = 'snappy')
+            self.interval_histograms.to_parquet(path.join(self._main_save_path, self.interval_histograms_filename),
+                    engine = 'auto', index = False, compression = 'snappy')
 
     # #### Load sector long dataframes and fundamental data  #### #   
     def load_sector_mean_returns_long(self):
@@ -443,7 +630,30 @@ class Index:
         self.fundamentals = pd.read_parquet(path.join(keys.LOAD_PATH, self.__class__.__name__.upper(), self.index_fundamentals_filename))
 	
     def load_intervals_dataframe(self):
-        self.intervals_data = pd.read_csv(path.join(keys.LOAD_PATH, self.__class__.__name__.upper(), self.index_interval_data_filename)) 
+        """
+        reads the parquet intervals table; csv files of earlier updates are read if the parquet file does not exist
+        """
+        load_path = path.join(keys.LOAD_PATH, self.__class__.__name__.upper())
+        if path.exists(path.join(load_path, self.intervals_parquet_filename)):
+            self.intervals_data = pd.read_parquet(path.join(load_path, self.intervals_parquet_filename))
+        else:
+            self.intervals_data = pd.read_csv(path.join(load_path, self.index_interval_data_filename)) 
+
+    def load_interval_histograms(self):
+        self.interval_histograms = pd.read_parquet(path.join(keys.LOAD_PATH, self.__class__.__name__.upper(),
+                    self.interval_histograms_filename))
+
+    def save_shared(self):
+        """
+        writes the price panel (.npy arrays), fundamentals and intervals tables (uncompressed Arrow IPC)
+            in the shared directory of the index; they are memory mapped by load_shared
+        """
+        shared_path = tools.make_dir(path.join(self.main_save_path, self.shared_dirname))
+        self.panel.save(path.join(shared_path, 'panel'))
+        for name in self.shared_tables:
+            frame = getattr(self, name)
+            if frame is not None:
+                shared.write_table(frame, path.join(shared_path, name + '.arrow'))
 
     def load_all(self):
         self.load_assets()
@@ -454,14 +664,147 @@ class Index:
 
     # ############################################################## #
 
-    @classmethod 
+    @staticmethod
+    def _pull_serial(symbols, period = 'max', interval = '1d', start_date = None, end_date = None,
+                        checkpoint = None, resume = False, batch_size = 100, snapshot = None, name = None):
+        """
+        pulls history and fundamentals one symbol at a time
+        checkpoint: an IngestionCheckpoint; pulled assets are checkpointed every batch_size symbols
+        snapshot: a FundamentalsSnapshot; fundamentals of fresh tickers are not pulled
+        """
+        fresh = {}
+        if snapshot is not None:
+            stale = set(snapshot.stale(symbols))
+            fresh = snapshot.get([symbol for symbol in symbols if symbol not in stale])
+        pulled = {}
+        if checkpoint is not None:
+            pulled = checkpoint.start(resume = resume)
+        for batch in tools.batched([symbol for symbol in symbols if symbol not in pulled], batch_size):
+            batch_pulled = {}
+            for symbol in batch:
+                print(f'pulling {symbol} ...')
+                with profiling.stage('fetch', cprofile = False, index = name, ticker = symbol):
+                    batch_pulled[symbol] = Stock.get_history(symbol, period = period, interval=interval,
+                                                start_date = start_date, end_date = end_date,
+                                                            fundamentals=fresh.get(symbol, True))
+            if checkpoint is not None:
+                checkpoint.save_batch({symbol: asset for symbol, asset in batch_pulled.items() if asset is not None})
+            if snapshot is not None:
+                new = {symbol: asset for symbol, asset in batch_pulled.items() if asset is not None and symbol not in fresh}
+                snapshot.put({symbol: asset.fundamentals for symbol, asset in new.items()},
+                                prices = {symbol: asset.latest_price for symbol, asset in new.items()})
+            pulled.update(batch_pulled)
+        return pulled
+
+    @classmethod
+    def _pull_constituents(cls):
+        """
+        returns the list of tickers of the index; implemented by each index
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def constituents(cls, refresh = False):
+        """
+        list of tickers of the index
+            the list is read from the snapshot saved by the last pull; nothing is
+                scraped or read when the module is imported
+            refresh: pulls the list again and saves a new snapshot;
+                if the pull fails the snapshot is used
+        """
+        if cls.list_of_assets is not None and not refresh:
+            return cls.list_of_assets
+        snapshot = path.join(keys.DATA_PATH, cls.__name__.upper(), cls.constituents_filename)
+        if not refresh and path.exists(snapshot):
+            cls.list_of_assets = pd.read_csv(snapshot, sep = ',', header = 0)['Ticker'].tolist()
+            return cls.list_of_assets
+        try:
+            tickers = list(cls._pull_constituents())
+        except Exception as error:
+            if not path.exists(snapshot):
+                raise
+            print(f'pulling {cls.__name__} constituents failed ({error}); the snapshot is used')
+            cls.list_of_assets = pd.read_csv(snapshot, sep = ',', header = 0)['Ticker'].tolist()
+            return cls.list_of_assets
+        tools.make_dir(path.dirname(snapshot))
+        pd.DataFrame({'Ticker': tickers}).to_csv(snapshot, sep = ',', header = True, index = False)
+        cls.list_of_assets = tickers
+        return cls.list_of_assets
+
+    @classmethod
     def pull_assets(cls, period = 'max', interval = '1d',
-                     start_date = None, end_date = None, save_data = True, cap = 0):
+                     start_date = None, end_date = None, save_data = True, cap = 0,
+                        bulk = False, batch_size = 100, max_workers = 8, 
+                            checkpoint = True, resume = False, freshness_hours = 24, snapshot = False):
         """
         add_index is currently used for sp500 only; but it can be activated for other indices only
-            __init__ method of Russell and Nasdaq accept **kwargs to accomodate for 
+            __init__ method of Russell and Nasdaq accept **kwargs to accomodate for
                 variable length keyworded arguments
-        note that class name will be added to subdir 
+        note that class name will be added to subdir
+        bulk: if True, history is pulled in batches of batch_size tickers and fundamentals
+            are pulled using max_workers threads; a throughput report is kept in ingestion_report
+        checkpoint: every batch of batch_size tickers is checkpointed as soon as it is pulled;
+            checkpoints are removed once the assets are saved
+        resume: tickers checkpointed by an earlier pull with the same parameters within
+            freshness_hours are read from the checkpoints instead of pulled again
+        snapshot: fundamentals are kept in the FundamentalsSnapshot of DATA_PATH and
+            only pulled for tickers that are stale in it
+        """
+        symbols = list(cls.constituents(refresh = True))
+        if cap > 0:
+            symbols = symbols[:cap]
+
+        pulled, ingestion_report, ingestion_checkpoint = Index._pull_symbols(symbols, name = cls.__name__,
+                    period = period, interval = interval, start_date = start_date, end_date = end_date,
+                        cap = cap, bulk = bulk, batch_size = batch_size, max_workers = max_workers,
+                            checkpoint = checkpoint, resume = resume, freshness_hours = freshness_hours,
+                                snapshot = snapshot)
+
+        assets, sector_tickers, date_range = Index._collect_assets(pulled)
+        main_save_path = tools.make_dir(path.join(keys.DATA_PATH, cls.__name__.upper()))
+        index = cls(assets = assets, sectors = sector_tickers,
+            date_range = date_range, main_save_path = main_save_path)
+        index.ingestion_report = ingestion_report
+        if save_data is True:
+            index.save_assets()
+            if ingestion_checkpoint is not None:
+                ingestion_checkpoint.clear()
+        return index
+
+    @staticmethod
+    def _pull_symbols(symbols, name = None, period = 'max', interval = '1d', start_date = None, end_date = None,
+                        cap = 0, bulk = False, batch_size = 100, max_workers = 8,
+                            checkpoint = True, resume = False, freshness_hours = 24, snapshot = False):
+        """
+        pulls history and fundamentals of symbols; see pull_assets for the options
+        returns a dictionary of {symbol: Stock object}, the ingestion report (None for serial pulls)
+            and the IngestionCheckpoint (None without checkpoints)
+        """
+        ingestion_report = None
+        ingestion_checkpoint = None
+        if checkpoint:
+            ingestion_checkpoint = IngestionCheckpoint(path.join(checkpoint_root(), name.upper()),
+                        params = {'period': period, 'interval': interval, 'start_date': start_date,
+                                    'end_date': end_date, 'cap': cap}, freshness_hours = freshness_hours)
+        snapshot = FundamentalsSnapshot() if snapshot else None
+        if bulk:
+            downloader = BulkDownloader(period = period, interval = interval, start_date = start_date,
+                            end_date = end_date, batch_size = batch_size, max_workers = max_workers,
+                                index_name = name, snapshot = snapshot)
+            pulled = downloader.pull(symbols, checkpoint = ingestion_checkpoint, resume = resume)
+            ingestion_report = downloader.report
+        else:
+            print(f'pulling {len(symbols)} tickers from {name} ...')
+            pulled = Index._pull_serial(symbols, period = period, interval = interval,
+                            start_date = start_date, end_date = end_date, checkpoint = ingestion_checkpoint,
+                                resume = resume, batch_size = batch_size, snapshot = snapshot, name = name)
+        return pulled, ingestion_report, ingestion_checkpoint
+
+    @staticmethod
+    def _collect_assets(pulled):
+        """
+        drops empty assets of a {symbol: Stock object} dictionary
+        returns assets, a dictionary of {sector:[ticker]} and the date range of all assets
         """
         # a dictionary of {sector:[ticker]}
         sector_tickers = {}
@@ -469,63 +812,316 @@ class Index:
         assets = {}
         date_min = datetime.strptime('2030-01-01', '%Y-%m-%d').date()
         date_max = datetime.strptime('1930-01-01', '%Y-%m-%d').date()
-        count = 0 
-        for symbol in cls.list_of_assets:
-            print(f'pulling {symbol} ... from {cls.__name__} index ...')
-            if cap > 0 and count >= cap:
-                break
-            count += 1
-            asset = Stock.get_history(symbol, period = period, interval=interval, 
-                                        start_date = start_date, end_date = end_date, 
-                                                    fundamentals=True)
+        for symbol, asset in pulled.items():
             if asset is not None and not asset.data.isnull().all().all():
                 assets[symbol] = asset
-                asset_date_min, asset_date_max = asset.date_range 
-                date_min, date_max = Index._compute_date_range(date_min = date_min, date_max = date_max, 
+                asset_date_min, asset_date_max = asset.date_range
+                date_min, date_max = Index._compute_date_range(date_min = date_min, date_max = date_max,
                             asset_date_min = asset_date_min, asset_date_max = asset_date_max)
                 sector = asset.sector
                 if sector not in sector_tickers.keys():
                     sector_tickers[sector] = []
                 sector_tickers[sector].append(symbol)
-        
-        main_save_path = tools.make_dir(path.join(keys.DATA_PATH, cls.__name__.upper()))    
+        return assets, sector_tickers, (date_min, date_max)
+
+    @classmethod
+    def update_assets(cls, end_date = None, save_data = True, period = 'max', interval = '1d',
+                        batch_size = 100, max_workers = 8, snapshot = False):
+        """
+        incremental update of the stored assets
+            only bars after the last stored date of each ticker are pulled and appended
+            fundamentals of stored tickers are kept as they are
+            new constituents and tickers with a stock split or a dividend in the new bars are pulled in full
+            stored tickers that left the index are dropped
+        previous_latest_date keeps the latest date before the update; it is None if
+            tickers were added or dropped and downstream data must be regenerated in full
+        adjusted_since is the earliest split or dividend of tickers pulled again; only downstream
+            periods that contain it are regenerated
+        snapshot: fundamentals, sectors and names of stored tickers are taken from the FundamentalsSnapshot;
+            metadata is only pulled for tickers with a field group older than its ttl; tickers that
+            are not in the snapshot yet are seeded with their stored fundamentals
+        """
+        stored = cls.load_assets(load_path = keys.DATA_PATH)
+        assets = stored.assets
+        changed, adjusted = Index._update_pulled(assets, cls.constituents(refresh = True), name = cls.__name__,
+                        end_date = end_date, period = period, interval = interval,
+                            batch_size = batch_size, max_workers = max_workers, snapshot = snapshot)
+
+        assets, sector_tickers, date_range = Index._collect_assets(assets)
+        index = cls(assets = assets, sectors = sector_tickers, date_range = date_range,
+                    main_save_path = tools.make_dir(path.join(keys.DATA_PATH, cls.__name__.upper())))
+        index.previous_latest_date = None if len(changed) > 0 else stored.latest_date
+        index.adjusted_since = min(adjusted.values()) if len(adjusted) > 0 else None
         if save_data is True:
-            with open(path.join(main_save_path, 'all_assets.pkl'), 'wb') as f:
-                for asset in assets.values():
-                    pickle.dump(asset, f, pickle.HIGHEST_PROTOCOL)
-            sector_filename = path.join(main_save_path, 'sectors.dat')
-            with open(sector_filename, 'w') as s:
-                for sector, tickers in sector_tickers.items():
-                    tickers = ','.join(tickers)
-                    s.write(sector + '>>>' + tickers + '\n')
-        return cls(assets = assets, sectors = sector_tickers,
-            date_range = (date_min, date_max), main_save_path = main_save_path) 
+            index.save_assets()
+        return index
+
+    @staticmethod
+    def _update_pulled(assets, symbols, name = None, end_date = None, period = 'max', interval = '1d',
+                        batch_size = 100, max_workers = 8, snapshot = False):
+        """
+        appends the bars missing since the last stored date to assets (in place)
+            symbols that are not in assets are pulled in full and added
+            assets that are not in symbols any more are dropped
+        returns the list of symbols added or dropped and a dictionary of {symbol: date of the earliest
+            split or dividend} of symbols pulled again for a split or a dividend in the new bars
+            symbols that fail to pull (delisted tickers of static constituent lists) are in neither
+        """
+        snapshot = FundamentalsSnapshot() if snapshot else None
+        current = set(symbols)
+        dropped = [symbol for symbol in assets if symbol not in current]
+        for symbol in dropped:
+            del assets[symbol]
+        # tickers sharing the first missing date are pulled in one batched download
+        missing_from = {}
+        for symbol, asset in assets.items():
+            first_missing = asset.latest_date + timedelta(days = 1)
+            missing_from.setdefault(first_missing, []).append(symbol)
+
+        full_pull = [symbol for symbol in symbols if symbol not in assets]
+        actions = {}
+        for first_missing, batch_symbols in missing_from.items():
+            if first_missing > date.today():
+                continue
+            downloader = BulkDownloader(start_date = first_missing.strftime('%Y-%m-%d'), end_date = end_date,
+                            interval = interval, batch_size = batch_size, max_workers = max_workers,
+                                index_name = name)
+            for symbol, new_data in downloader.download_history(batch_symbols).items():
+                new_data = tools.choose_dates(new_data, (first_missing, None))
+                if new_data is None:
+                    continue
+                # adjusted prices (auto_adjust) before a split or a dividend are stale
+                has_action = np.zeros(len(new_data), dtype = bool)
+                for action in ['Stock Splits', 'Dividends']:
+                    if action in new_data.columns:
+                        has_action |= (new_data[action].fillna(0) != 0).to_numpy()
+                if has_action.any():
+                    full_pull.append(symbol)
+                    actions[symbol] = tools.ordinal_to_date(tools.to_ordinals(new_data.index[has_action]).min())
+                else:
+                    assets[symbol].append_data(new_data)
+
+        if snapshot is not None:
+            stored = [symbol for symbol in assets if symbol not in full_pull]
+            prices = {symbol: assets[symbol].latest_price for symbol in stored}
+            # stored fundamentals seed the snapshot, so the first update with a snapshot does not pull
+            #   metadata of every ticker; seeded tickers are pulled when one of their field groups expires
+            table = snapshot.read()
+            seed = {symbol: assets[symbol].fundamentals for symbol in stored
+                        if symbol not in table.index and assets[symbol].fundamentals}
+            snapshot.put(seed, prices = {symbol: prices[symbol] for symbol in seed})
+            downloader = BulkDownloader(max_workers = max_workers, index_name = name)
+            # every field group is checked against its own ttl (valuation and dividends expire before identity)
+            fresh = snapshot.refresh(stored, downloader.download_fundamentals, prices = prices)
+            for symbol, fundamentals in fresh.items():
+                assets[symbol].fundamentals = fundamentals
+                assets[symbol].sector = fundamentals['sector']
+                assets[symbol].name = fundamentals['shortName']
+
+        added = []
+        adjusted = {}
+        if len(full_pull) > 0:
+            downloader = BulkDownloader(period = period, interval = interval, batch_size = batch_size,
+                            max_workers = max_workers, index_name = name, snapshot = snapshot)
+            for symbol, asset in downloader.pull(full_pull).items():
+                if asset is not None and not asset.data.isnull().all().all():
+                    assets[symbol] = asset
+                    if symbol in actions:
+                        adjusted[symbol] = actions[symbol]
+                    else:
+                        added.append(symbol)
+        return added + dropped, adjusted
+
+    # ### security master: tickers of all indices are pulled and stored once ### #
+    @staticmethod
+    def _master_constituents(index_classes, cap = 0):
+        constituents = {}
+        for index_class in index_classes:
+            symbols = list(index_class.constituents(refresh = True))
+            constituents[index_class.__name__.upper()] = symbols[:cap] if cap > 0 else symbols
+        # tickers in the order of their first appearance; shared tickers appear once
+        symbols = list(dict.fromkeys(symbol for index_symbols in constituents.values() for symbol in index_symbols))
+        print(f'{len(symbols)} distinct tickers in {sum(len(s) for s in constituents.values())} constituents of '
+                f'{", ".join(constituents.keys())}')
+        return constituents, symbols
+
+    @staticmethod
+    def pull_master(index_classes, period = 'max', interval = '1d', start_date = None, end_date = None,
+                        save_data = True, cap = 0, bulk = False, batch_size = 100, max_workers = 8,
+                            checkpoint = True, resume = False, freshness_hours = 24, snapshot = False):
+        """
+        pulls every ticker of index_classes once and writes the SecurityMaster of DATA_PATH
+            with one membership bitmap per index; options are the options of pull_assets
+            (cap limits the tickers of each index)
+        indices are then built from the master with from_master
+        """
+        constituents, symbols = Index._master_constituents(index_classes, cap = cap)
+        pulled, ingestion_report, ingestion_checkpoint = Index._pull_symbols(symbols, name = SecurityMaster.dirname,
+                    period = period, interval = interval, start_date = start_date, end_date = end_date,
+                        cap = cap, bulk = bulk, batch_size = batch_size, max_workers = max_workers,
+                            checkpoint = checkpoint, resume = resume, freshness_hours = freshness_hours,
+                                snapshot = snapshot)
+        assets, _, _ = Index._collect_assets(pulled)
+        master = SecurityMaster()
+        master.ingestion_report = ingestion_report
+        if save_data is True:
+            master.write(assets = assets, constituents = constituents)
+            if ingestion_checkpoint is not None:
+                ingestion_checkpoint.clear()
+        return master
+
+    @staticmethod
+    def update_master(index_classes, end_date = None, period = 'max', interval = '1d',
+                        batch_size = 100, max_workers = 8, snapshot = False):
+        """
+        incremental update of the SecurityMaster of DATA_PATH; see update_assets
+            the latest date of each index before the update is kept in the master for from_master;
+            it is None for indices whose tickers were added or dropped
+            the earliest split or dividend of members pulled again is kept as adjusted_since
+        """
+        master = SecurityMaster()
+        assets = master.read_assets()
+        constituents, symbols = Index._master_constituents(index_classes)
+        previous = {}
+        for index_name in constituents:
+            if master.has_members(index_name):
+                members = [symbol for symbol in master.members(index_name) if symbol in assets]
+                if len(members) > 0:
+                    previous[index_name] = (set(members), max(assets[symbol].latest_date for symbol in members))
+        changed, adjusted = Index._update_pulled(assets, symbols, name = SecurityMaster.dirname, end_date = end_date,
+                    period = period, interval = interval, batch_size = batch_size, max_workers = max_workers,
+                        snapshot = snapshot)
+        changed = set(changed)
+        assets, _, _ = Index._collect_assets(assets)
+        master.write(assets = assets, constituents = constituents)
+        latest_dates = {}
+        adjusted_since = {}
+        for index_name in constituents:
+            members = set(master.members(index_name))
+            previous_members, latest_date = previous.get(index_name, (None, None))
+            unchanged = previous_members == members and len(changed & members) == 0
+            latest_dates[index_name] = latest_date if unchanged else None
+            action_dates = [adjusted[symbol] for symbol in members if symbol in adjusted]
+            adjusted_since[index_name] = min(action_dates) if len(action_dates) > 0 else None
+        master.write_previous_latest_dates(latest_dates, adjusted_since = adjusted_since)
+        return master
+
+    @classmethod
+    def from_master(cls, master = None, save_data = True, incremental = False):
+        """
+        builds the index from the tickers of its membership bitmap in the SecurityMaster
+            (of DATA_PATH by default); with save_data the sectors of the index are saved
+            and prices stay in the master only
+        incremental: previous_latest_date is the latest date of the index before the last
+            incremental update of the master (see update_master), so downstream data is only
+            regenerated in full if the universe of the index changed; adjusted_since is read as well
+        """
+        if master is None:
+            master = SecurityMaster()
+        assets = master.read_assets(tickers = master.members(cls.__name__))
+        assets, sector_tickers, date_range = Index._collect_assets(assets)
+        index = cls(assets = assets, sectors = sector_tickers, date_range = date_range,
+                    main_save_path = tools.make_dir(path.join(keys.DATA_PATH, cls.__name__.upper())))
+        if incremental:
+            index.previous_latest_date = master.previous_latest_date(cls.__name__)
+            index.adjusted_since = master.adjusted_since(cls.__name__)
+        if save_data is True:
+            index.save_assets(master = master)
+        return index
 
     @classmethod
-    def load_assets(cls):
+    def load_assets(cls, load_path = None, tickers = None, within_dates = None):
         """
-        loads all stocks in sp500 from the pickle file of Stock objects
+        loads all stocks in sp500 from the PriceStore of the index
+            the pickle file of Stock objects is read if the index has not been saved in a PriceStore
+        load_path: defaults to keys.LOAD_PATH; updates read from keys.DATA_PATH
+        tickers and within_dates: load a subset of tickers and/or a date window;
+            only the needed parts of the store are read
+        indices saved with a SecurityMaster are read from the master
         """
-        assets_file = path.join(keys.LOAD_PATH, cls.__name__.upper(), cls.assets_filename)
-        sector_file = path.join(keys.LOAD_PATH, cls.__name__.upper(), cls.sector_filename)
+        if load_path is None:
+            load_path = keys.LOAD_PATH
+        index_path = path.join(load_path, cls.__name__.upper())
+        assets_file = path.join(index_path, cls.assets_filename)
+        sector_file = path.join(index_path, cls.sector_filename)
 
         assets = {}
-        with open(assets_file, 'rb') as f:
-            while True:
-                try:
-                    asset = pickle.load(f)
-                    assets[asset.symbol] = asset 
-                except EOFError:
-                    break 
+        store = PriceStore(index_path)
+        master = SecurityMaster.at(load_path)
+        if master.has_members(cls.__name__):
+            members = master.members(cls.__name__)
+            if tickers is not None:
+                members = [ticker for ticker in members if ticker in tickers]
+            assets = master.read_assets(tickers = members, within_dates = within_dates)
+        elif store.exists:
+            frames = store.read_frames(tickers = tickers, within_dates = within_dates)
+            fundamentals = store.read_fundamentals(tickers = list(frames.keys()))
+            for ticker, data in frames.items():
+                if ticker in fundamentals:
+                    assets[ticker] = Stock.from_data(ticker, data = data, fundamentals = fundamentals[ticker])
+        else:
+            with open(assets_file, 'rb') as f:
+                while True:
+                    try:
+                        asset = pickle.load(f)
+                        if tickers is None or asset.symbol in tickers:
+                            assets[asset.symbol] = asset 
+                    except EOFError:
+                        break 
                 
+        sector_dict = Index._read_sectors(sector_file)
+        if tickers is not None:
+            sector_dict = {sector:[ticker for ticker in sector_tickers if ticker in assets]
+                                for sector, sector_tickers in sector_dict.items()}
+        return cls(assets = assets, sectors = sector_dict)
+
+    @staticmethod
+    def _read_sectors(sector_file):
         sector_dict = {}
         sector_lines = open(sector_file).read().splitlines()
         for _line in sector_lines:
             line_info = _line.split('>>>')
             sector = line_info[0]
-            tickers = line_info[1].split(',')
-            sector_dict[sector] = tickers 
-        return cls(assets = assets, sectors = sector_dict)
+            sector_tickers = line_info[1].split(',')
+            sector_dict[sector] = sector_tickers 
+        return sector_dict
+
+    # ### serving mode: memory mapped datasets shared by all workers of the app ### #
+    @classmethod
+    def has_shared(cls, load_path = None):
+        if load_path is None:
+            load_path = keys.LOAD_PATH
+        return PricePanel.exists(path.join(load_path, cls.__name__.upper(), cls.shared_dirname, 'panel'))
+
+    @classmethod
+    def load_shared(cls, load_path = None):
+        """
+        loads an index without Stock objects from the files written by save_shared
+            the price panel is memory mapped read only; fundamentals and intervals tables
+                are mapped from Arrow files; app workers (gunicorn) share one physical copy of them
+            daily close calculations (returns, risk return, sector return history) run on the panel;
+                calculations that need the data of each stock (other samplings, trade volumes) are not available
+        """
+        if load_path is None:
+            load_path = keys.LOAD_PATH
+        index_path = path.join(load_path, cls.__name__.upper())
+        shared_path = path.join(index_path, cls.shared_dirname)
+        panel = PricePanel.load(path.join(shared_path, 'panel'))
+        date_range = (tools.ordinal_to_date(panel.dates[0]), tools.ordinal_to_date(panel.dates[-1]))
+        index = cls(assets = {}, sectors = Index._read_sectors(path.join(index_path, cls.sector_filename)),
+                        date_range = date_range)
+        index._panel = panel
+        index.num_assets = panel.num_tickers
+        index.asset_names = list(panel.names)
+        tables = {name: path.join(shared_path, name + '.arrow') for name in cls.shared_tables}
+        if path.exists(tables['fundamentals']):
+            index.fundamentals = shared.read_table(tables['fundamentals'])
+        if path.exists(tables['sector_fundamentals']):
+            sector_fundamentals = shared.read_table(tables['sector_fundamentals'])
+            index.sector_fundamentals = sector_fundamentals[sector_fundamentals['Sector'].isin(keys.SECTORS)]
+        if path.exists(tables['intervals_data']):
+            index.intervals_data = shared.read_table(tables['intervals_data'])
+        return index
 
     @classmethod 
     def load_index(cls):
@@ -543,32 +1139,74 @@ class Index:
     def __iadd__(self, other):
         """
         adds assets and sectors of two indices
+            a ticker in both indices keeps the asset of self (first wins, as in _merge_sectors)
         """
-        self.assets.update(other.assets)
-        new_sectors = {}
-        for sector in keys.SECTORS:
-            new_sectors[sector] = list(set(self.sectors.get(sector, [])).union(set(other.sectors.get(sector, []))))
-        self.sectors = new_sectors 
+        for symbol, asset in other.assets.items():
+            self.assets.setdefault(symbol, asset)
+        self._panel = None
+        self._sector_mean_return_long = {}
+        self.sectors = Index._merge_sectors([self, other])
         return self 
 
     def __add__(self, other):
-        assets = deepcopy(self.assets)
-        assets.update(other.assets)
-        new_sectors = {}
-        for sector in keys.SECTORS:
-            new_sectors[sector] = list(set(self.sectors.get(sector, [])).union(set(other.sectors.get(sector, []))))                
-
-        date_range = self.date_range 
-        added_names = self.__class__.__name__ + '_added_to_' + other.__class__.__name__
-        
-        main_save_path = None 
-        if self.main_save_path is not None:
-            main_save_path = re.sub(self.__class__.__name__, added_names, self.main_save_path) 
-        
-        return Index(assets = assets, sectors = new_sectors, date_range = date_range,
-                     main_save_path = main_save_path)
-        
-        
+        """
+        returns a CompositeIndex that references the assets of both indices; nothing is copied
+        """
+        return CompositeIndex([self, other])
+
+    @staticmethod
+    def _merge_sectors(indices):
+        """
+        merges {sector:[ticker]} of indices in one pass over their tickers
+            a ticker is kept once, in the sector of the first index that lists it
+        """
+        ticker_sectors = {}
+        for index in indices:
+            for sector, tickers in index.sectors.items():
+                for ticker in tickers:
+                    ticker_sectors.setdefault(ticker, sector)
+        new_sectors = {sector:[] for sector in keys.SECTORS}
+        for ticker, sector in ticker_sectors.items():
+            if sector in new_sectors:
+                new_sectors[sector].append(ticker)
+        return new_sectors
+
+
+# ###################################### #
+# ### 		Composite Index			### #
+# ###################################### #
+class CompositeIndex(Index):
+    """
+    union of indices (SP500 + Russell3000 + Nasdaq) without copies of price data
+        assets is a new {ticker: Stock object} dictionary referencing the Stock objects of
+            the indices; a ticker in several indices is kept once
+        memory grows with the number of tickers, not with the size of their data
+    Stock objects are shared with the indices: changes of one are seen by the other
+    """
+    def __init__(self, indices, main_save_path = None):
+        # sums of composites are flattened: (sp + ru) + nasdaq is a composite of three indices
+        self.indices = []
+        for index in indices:
+            self.indices.extend(index.indices if isinstance(index, CompositeIndex) else [index])
+        assets = {}
+        for index in self.indices:
+            for ticker, asset in index.assets.items():
+                assets.setdefault(ticker, asset)
+        date_range = (min(index.date_range[0] for index in self.indices),
+                        max(index.date_range[1] for index in self.indices))
+        if main_save_path is None:
+            main_save_path = self._default_save_path()
+        super(CompositeIndex, self).__init__(assets = assets, sectors = Index._merge_sectors(self.indices),
+                    date_range = date_range, main_save_path = main_save_path)
+
+    def _default_save_path(self):
+        first = self.indices[0]
+        if first.main_save_path is None:
+            return None
+        added_names = '_added_to_'.join(index.__class__.__name__ for index in self.indices)
+        return re.sub(first.__class__.__name__, added_names, first.main_save_path)
+
+
 # ################################# #
 # ### 		SP500 Index			### #
 # ################################# #  
@@ -581,16 +1219,21 @@ class SP500(Index):
         ew_index: SP500 index equal weighted
     """
 
-    list_of_assets = market_data.pull_sp500_tickers()
     # index filenmes 
     x_index_filename = keys.SP500_INDEX_FILENAME 
     ew_index_filename = keys.SPXEW_INDEX_FILENAME
 
+    @classmethod
+    def _pull_constituents(cls):
+        return market_data.pull_sp500_tickers()
+
     def __init__(self, assets = {}, sectors = None, date_range = None, main_save_path = None):
         super(SP500, self).__init__(assets = assets, sectors=sectors,
                     date_range = date_range, main_save_path=main_save_path)
         self.x_index = None
         self.ew_index = None 
+        self.x_ordinals = None
+        self.ew_ordinals = None
     
     # adds and writes index values to files
     # indices: self.sp_index ==> SP500 total index 
@@ -604,6 +1247,7 @@ class SP500(Index):
         self.ew_index = market_data.get_yfinance_index(index = 'SP500 Equal Weight', start = start_date, end = end_date)
         self.x_index.dropna(inplace = True)
         self.ew_index.dropna(inplace = True)
+        self._set_index_ordinals()
         
         sp_filename = path.join(self._main_save_path , 'sp_index.csv')
         spxew_filename = path.join(self._main_save_path, 'spxew_index.csv')
@@ -616,6 +1260,11 @@ class SP500(Index):
         self.ew_index = pd.read_csv(path.join(keys.LOAD_PATH, 'SP500', self.ew_index_filename), header = 0, sep = ',', index_col = 'Date') 
         self.x_index.index = pd.to_datetime(self.x_index.index)
         self.ew_index.index = pd.to_datetime(self.ew_index.index)
+        self._set_index_ordinals()
+
+    def _set_index_ordinals(self):
+        self.x_ordinals = tools.to_ordinals(self.x_index.index)
+        self.ew_ordinals = tools.to_ordinals(self.ew_index.index)
 
     def compute_index_cumulative_returns(self, sampling = 'D', in_percent = True, within_dates = None):
         """
@@ -625,8 +1274,8 @@ class SP500(Index):
         if within_dates is None:
             within_dates = self.date_range 
         
-        x_data = tools.choose_dates(self.x_index, within_dates)
-        ew_data = tools.choose_dates(self.ew_index, within_dates)
+        x_data = tools.choose_dates(self.x_index, within_dates, ordinals = self.x_ordinals)
+        ew_data = tools.choose_dates(self.ew_index, within_dates, ordinals = self.ew_ordinals)
         
         x_change = x_data['index_value'].resample(sampling).last().pct_change().dropna()
         ew_change = ew_data['index_value'].resample(sampling).last().pct_change().dropna()
@@ -645,7 +1294,9 @@ class SP500(Index):
 # ###################################### #
 class Russell3000(Index):
 
-    list_of_assets = pd.read_csv(path.join(keys.MAIN_DATA_PATH, keys.RUSSELL3000_CSV),
+    @classmethod
+    def _pull_constituents(cls):
+        return pd.read_csv(path.join(keys.MAIN_DATA_PATH, keys.RUSSELL3000_CSV),
              sep = ',', header = 0)['tickers']
 
     def __init__(self, assets = {}, sectors = None, date_range = None, main_save_path = None):
@@ -687,7 +1338,9 @@ class Russell2000(Index):
 # ###################################### #
 class Nasdaq(Index):
 
-    list_of_assets = pd.read_csv(path.join(keys.MAIN_DATA_PATH, keys.NASDAQ_CSV),
+    @classmethod
+    def _pull_constituents(cls):
+        return pd.read_csv(path.join(keys.MAIN_DATA_PATH, keys.NASDAQ_CSV),
              sep = ',', header = 0)['Symbol']
 
     def __init__(self, assets = {}, sectors = None, date_range = None, main_save_path = None):
@@ -0,0 +1,267 @@
+# ############################################# #
+# Bulk ingestion of price history and           #
+# fundamentals for indices with many tickers    #
+# ############################################# #
+import os
+import json
+import shutil
+from os import path, listdir
+from time import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from timeit import default_timer
+import pandas as pd
+from . securities import Stock
+from .. utils import tools, keys, http_cache, providers, profiling
+from .. utils.store import PriceStore
+
+
+@http_cache.cached('yfinance_download', ttl = 12, ignore = ('threads',), provider = True)
+def download(symbols, threads = 8, **time_kwargs):
+    """
+    one download call of a batch of symbols (yf.download with the default provider);
+        see http_cache for recorded responses
+    """
+    return providers.get_provider().download(symbols, threads = threads, **time_kwargs)
+
+
+class IngestionReport:
+    """
+    throughput report of one ingestion run
+    failures is a dictionary of {symbol: reason}
+    """
+    def __init__(self, index_name = None):
+        self.index_name = index_name
+        self.requested = 0
+        self.succeeded = 0
+        # tickers read from checkpoints of an earlier attempt instead of pulled
+        self.restored = 0
+        self.failures = {}
+        self.elapsed = 0.0
+        self._start = None
+
+    def start(self):
+        self._start = default_timer()
+
+    def stop(self):
+        self.elapsed = default_timer() - self._start
+
+    def add_failure(self, symbol, reason):
+        self.failures[symbol] = reason
+
+    @property
+    def tickers_per_second(self):
+        if self.elapsed == 0:
+            return 0.0
+        return self.requested/self.elapsed
+
+    def to_dict(self):
+        return {'index': self.index_name, 'requested': self.requested,
+                    'succeeded': self.succeeded, 'restored': self.restored, 'failed': len(self.failures),
+                        'elapsed_seconds': round(self.elapsed, 3),
+                            'tickers_per_second': round(self.tickers_per_second, 3)}
+
+    def __str__(self):
+        return (f'{self.index_name}: {self.succeeded} of {self.requested} tickers in {self.elapsed:.1f} s '
+                    f'({self.tickers_per_second:.2f} tickers/s), {len(self.failures)} failures, '
+                        f'{self.restored} restored from checkpoints')
+
+
+def checkpoint_root():
+    """
+    checkpoints are kept out of versioned builds so that they outlive a failed run
+        SPEAKINGCHARTS_CHECKPOINT_PATH overrides the default DATA_PATH/checkpoints
+    """
+    return os.environ.get('SPEAKINGCHARTS_CHECKPOINT_PATH', path.join(keys.DATA_PATH, 'checkpoints'))
+
+
+class IngestionCheckpoint:
+    """
+    per batch checkpoints of a pull
+        every pulled batch (history and fundamentals) is written as a PriceStore in checkpoint_path/batch-<n>
+        run.json keeps the parameters of the pull; checkpoints of a pull with other parameters are dropped
+    start(resume = True) returns Stock objects of tickers checkpointed within freshness_hours;
+        only the other tickers have to be pulled again
+    """
+    run_filename = 'run.json'
+    batch_prefix = 'batch-'
+
+    def __init__(self, checkpoint_path = None, params = None, freshness_hours = 24):
+        self.checkpoint_path = checkpoint_path
+        self.params = json.loads(json.dumps(params or {}, default = str, sort_keys = True))
+        self.freshness_hours = freshness_hours
+        self._num_batches = 0
+
+    def _batch_paths(self):
+        if not path.exists(self.checkpoint_path):
+            return []
+        return sorted(path.join(self.checkpoint_path, name) for name in listdir(self.checkpoint_path)
+                        if name.startswith(self.batch_prefix))
+
+    def _same_run(self):
+        run_file = path.join(self.checkpoint_path, self.run_filename)
+        if not path.exists(run_file):
+            return False
+        with open(run_file) as f:
+            return json.load(f) == self.params
+
+    def start(self, resume = False):
+        """
+        returns a dictionary of {symbol: Stock object} restored from fresh checkpoints if resume is True
+            without resume (or for a pull with other parameters) checkpoints are cleared
+        """
+        resume = resume and self._same_run()
+        if not resume:
+            self.clear()
+        tools.make_dir(self.checkpoint_path)
+        with open(path.join(self.checkpoint_path, self.run_filename), 'w') as f:
+            json.dump(self.params, f)
+        restored = {}
+        oldest = time() - self.freshness_hours*3600
+        for batch_path in self._batch_paths() if resume else []:
+            store = PriceStore(batch_path)
+            if not store.exists or path.getmtime(store.prices_file) < oldest:
+                continue
+            frames = store.read_frames()
+            fundamentals = store.read_fundamentals(tickers = list(frames.keys()))
+            for symbol, data in frames.items():
+                if symbol in fundamentals:
+                    restored[symbol] = Stock.from_data(symbol, data = data, fundamentals = fundamentals[symbol])
+        self._num_batches = len(self._batch_paths())
+        if resume:
+            print(f'{len(restored)} tickers restored from checkpoints in {self.checkpoint_path}')
+        return restored
+
+    def save_batch(self, assets = None):
+        """
+        assets: dictionary of {symbol: Stock object} pulled in one batch
+        """
+        if not assets:
+            return
+        batch_path = path.join(self.checkpoint_path, f'{self.batch_prefix}{self._num_batches:05d}')
+        PriceStore(batch_path).write(frames = {symbol: asset.data for symbol, asset in assets.items()},
+                    fundamentals = {symbol: asset.fundamentals for symbol, asset in assets.items()})
+        self._num_batches += 1
+
+    def clear(self):
+        shutil.rmtree(self.checkpoint_path, ignore_errors = True)
+
+
+class BulkDownloader:
+    """
+    pulls price history in multi-ticker batches using yf.download and
+        pulls fundamentals (yf.Ticker.info) on a bounded pool of worker threads
+    batch_size: number of tickers in each yf.download call
+    max_workers: concurrency level; used for threads of yf.download and the fundamentals pool
+    yf.download collects results in module level state; downloads of indices updated in parallel
+        are serialized by a lock shared by all downloaders
+    snapshot: a FundamentalsSnapshot; fundamentals are only pulled for tickers that are stale in it
+    """
+    _download_lock = Lock()
+
+    def __init__(self, period = 'max', interval = '1d', start_date = None, end_date = None,
+                    batch_size = 100, max_workers = 8, index_name = None, snapshot = None):
+        self.period = period
+        self.interval = interval
+        self.start_date = start_date
+        self.end_date = end_date
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.snapshot = snapshot
+        self.report = IngestionReport(index_name = index_name)
+
+    @staticmethod
+    def _split_frames(data, symbols):
+        """
+        yf.download returns a single frame with (ticker, field) columns
+            it is split into one frame per ticker; rows of missing dates are dropped
+        """
+        frames = {}
+        if not isinstance(data.columns, pd.MultiIndex):
+            frames[symbols[0]] = data.dropna(how = 'all')
+            return frames
+        available = set(data.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol in available:
+                frames[symbol] = data[symbol].dropna(how = 'all')
+        return frames
+
+    def download_history(self, symbols):
+        """
+        returns a dictionary of {symbol: history dataframe}
+        """
+        if self.start_date is None and self.end_date is None:
+            time_kwargs = {'period': self.period, 'interval': self.interval}
+        else:
+            time_kwargs = {'start': self.start_date, 'end': self.end_date, 'interval': self.interval}
+        history = {}
+        for batch in tools.batched(symbols, self.batch_size):
+            batch = list(batch)
+            print(f'pulling history of {len(batch)} tickers: {batch[0]} ... {batch[-1]}')
+            try:
+                with BulkDownloader._download_lock, profiling.stage('fetch_history_batch', cprofile = False,
+                                                        index = self.report.index_name, tickers = len(batch)):
+                    data = download(batch, threads = self.max_workers, **time_kwargs)
+            except Exception as ex:
+                for symbol in batch:
+                    self.report.add_failure(symbol, f'history: {type(ex).__name__}')
+                continue
+            history.update(self._split_frames(data, batch))
+        return history
+
+    def download_fundamentals(self, symbols):
+        """
+        returns a dictionary of {symbol: fundamentals dictionary}
+        """
+        fundamentals = {}
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            futures = {executor.submit(self._pull_fundamentals, symbol): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    fundamentals[symbol] = future.result()
+                except Exception as ex:
+                    self.report.add_failure(symbol, f'fundamentals: {type(ex).__name__}')
+        return fundamentals
+
+    def _pull_fundamentals(self, symbol):
+        with profiling.stage('fetch_fundamentals', cprofile = False, index = self.report.index_name, ticker = symbol):
+            return Stock.pull_fundamentals(symbol = symbol)
+
+    def _pull_batch(self, symbols):
+        history = self.download_history(symbols)
+        history = {symbol: data for symbol, data in history.items() if len(data) != 0}
+        for symbol in symbols:
+            if symbol not in history and symbol not in self.report.failures:
+                self.report.add_failure(symbol, 'history: no data')
+        if self.snapshot is None:
+            fundamentals = self.download_fundamentals(list(history.keys()))
+        else:
+            fundamentals = self.snapshot.refresh(list(history.keys()), self.download_fundamentals,
+                                prices = {symbol: data['Close'].iloc[-1] for symbol, data in history.items()})
+        return {symbol: Stock.from_data(symbol, data = data, fundamentals = fundamentals[symbol])
+                    for symbol, data in history.items() if symbol in fundamentals}
+
+    def pull(self, symbols, checkpoint = None, resume = False):
+        """
+        returns a dictionary of {symbol: Stock object} for all symbols
+            that have both history and fundamentals
+        history and fundamentals are pulled batch by batch; with an IngestionCheckpoint every batch
+            is checkpointed before the next one is pulled and resume skips tickers of fresh checkpoints
+        """
+        symbols = list(symbols)
+        self.report.requested = len(symbols)
+        self.report.start()
+        assets = {}
+        if checkpoint is not None:
+            assets = checkpoint.start(resume = resume)
+            self.report.restored = len(assets)
+        for batch in tools.batched([symbol for symbol in symbols if symbol not in assets], self.batch_size):
+            batch_assets = self._pull_batch(list(batch))
+            if checkpoint is not None:
+                checkpoint.save_batch(batch_assets)
+            assets.update(batch_assets)
+        self.report.succeeded = len(assets)
+        self.report.stop()
+        print(self.report)
+        return assets
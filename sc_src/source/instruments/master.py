@@ -0,0 +1,164 @@
+# ############################################# #
+# Security master: price history and            #
+# fundamentals of every ticker of all indices,  #
+# stored once, and one membership bitmap per    #
+# index                                         #
+# ############################################# #
+import os
+import json
+from os import path
+import numpy as np
+import pandas as pd
+from . securities import Stock
+from .. utils import keys, tools, shared
+from .. utils.store import PriceStore
+
+
+class SecurityMaster:
+    """
+    SECURITIES/
+        prices.parquet, asset_fundamentals.parquet   PriceStore of all tickers
+        tickers.csv                                  ordered list of all tickers
+        members/<INDEX>.npy                          packed bitmap over tickers.csv; one bit per ticker
+        previous_latest_dates.json                   latest date of each index before the last incremental
+                                                        update (null if its universe changed) and its
+                                                        earliest split or dividend of tickers pulled again
+    a ticker that belongs to several indices is pulled and stored once
+    bitmaps of different indices are written to different files; index updates running in
+        parallel processes never write the same file
+    """
+    dirname = 'SECURITIES'
+    tickers_filename = 'tickers.csv'
+    members_dirname = 'members'
+    previous_latest_dates_filename = 'previous_latest_dates.json'
+
+    def __init__(self, master_path = None):
+        self.master_path = master_path if master_path is not None else path.join(keys.DATA_PATH, self.dirname)
+        self.store = PriceStore(self.master_path)
+        self.tickers_file = path.join(self.master_path, self.tickers_filename)
+        self.members_path = path.join(self.master_path, self.members_dirname)
+        self.previous_latest_dates_file = path.join(self.master_path, self.previous_latest_dates_filename)
+        self._tickers = None
+        # throughput report of the pull that wrote the master
+        self.ingestion_report = None
+
+    @classmethod
+    def at(cls, load_path = None):
+        """
+        master of a data directory; defaults to keys.LOAD_PATH
+        """
+        if load_path is None:
+            load_path = keys.LOAD_PATH
+        return cls(path.join(load_path, cls.dirname))
+
+    @property
+    def exists(self):
+        return self.store.exists and path.exists(self.tickers_file)
+
+    @property
+    def tickers(self):
+        if self._tickers is None:
+            self._tickers = pd.read_csv(self.tickers_file, sep = ',', header = 0,
+                                keep_default_na = False)['Ticker'].to_numpy(dtype = object)
+        return self._tickers
+
+    def _members_file(self, index_name):
+        return path.join(self.members_path, index_name.upper() + '.npy')
+
+    def write(self, assets = None, constituents = None):
+        """
+        assets: dictionary of {ticker: Stock object} of all indices
+        constituents: dictionary of {index name: [ticker]}; tickers without data are left out of bitmaps
+        """
+        self.store.write(frames = {ticker: asset.data for ticker, asset in assets.items()},
+                    fundamentals = {ticker: asset.fundamentals for ticker, asset in assets.items()})
+        tickers = sorted(assets.keys())
+        tmp_name = self.tickers_file + '.tmp'
+        pd.DataFrame({'Ticker': tickers}).to_csv(tmp_name, sep = ',', header = True, index = False)
+        os.replace(tmp_name, self.tickers_file)
+        self._tickers = np.array(tickers, dtype = object)
+        # bitmaps of the old ticker list are not valid anymore; indices of a full write are regenerated in full
+        if path.exists(self.members_path):
+            for file_name in os.listdir(self.members_path):
+                os.remove(path.join(self.members_path, file_name))
+        if path.exists(self.previous_latest_dates_file):
+            os.remove(self.previous_latest_dates_file)
+        for index_name, symbols in (constituents or {}).items():
+            self.set_members(index_name, symbols)
+
+    def write_previous_latest_dates(self, latest_dates, adjusted_since = None):
+        """
+        latest_dates: dictionary of {index name: latest date before the update or None}
+        adjusted_since: dictionary of {index name: earliest split or dividend of tickers pulled again or None}
+        """
+        adjusted_since = adjusted_since or {}
+        to_str = lambda value: None if value is None else value.strftime('%Y-%m-%d')
+        tmp_name = self.previous_latest_dates_file + '.tmp'
+        with open(tmp_name, 'w') as f:
+            json.dump({index_name.upper(): {'latest_date': to_str(latest_date),
+                            'adjusted_since': to_str(adjusted_since.get(index_name))}
+                                for index_name, latest_date in latest_dates.items()}, f)
+        os.replace(tmp_name, self.previous_latest_dates_file)
+
+    def _previous_date(self, index_name, key):
+        if not path.exists(self.previous_latest_dates_file):
+            return None
+        with open(self.previous_latest_dates_file) as f:
+            value = (json.load(f).get(index_name.upper()) or {}).get(key)
+        return None if value is None else tools.to_date(value)
+
+    def previous_latest_date(self, index_name):
+        """
+        latest date of the index before the last incremental update of the master; None after a full
+            pull or if tickers of the index were added or dropped
+        """
+        return self._previous_date(index_name, 'latest_date')
+
+    def adjusted_since(self, index_name):
+        """
+        earliest split or dividend of members of the index pulled again in the last incremental update
+        """
+        return self._previous_date(index_name, 'adjusted_since')
+
+    def set_members(self, index_name, symbols):
+        tools.make_dir(self.members_path)
+        bitmap = np.isin(self.tickers, list(symbols))
+        shared.write_array(np.packbits(bitmap), self._members_file(index_name))
+
+    def remove_members(self, index_name):
+        if self.has_members(index_name):
+            os.remove(self._members_file(index_name))
+
+    def has_members(self, index_name):
+        return path.exists(self._members_file(index_name))
+
+    @property
+    def index_names(self):
+        if not path.exists(self.members_path):
+            return []
+        return sorted(file_name[:-len('.npy')] for file_name in os.listdir(self.members_path)
+                        if file_name.endswith('.npy'))
+
+    def bitmap(self, index_name):
+        packed = shared.read_array(self._members_file(index_name), mmap_mode = None)
+        return np.unpackbits(packed, count = len(self.tickers)).astype(bool)
+
+    def members(self, index_names):
+        """
+        tickers of any of index_names; the union of their bitmaps
+        """
+        if isinstance(index_names, str):
+            index_names = [index_names]
+        mask = np.zeros(len(self.tickers), dtype = bool)
+        for index_name in index_names:
+            mask |= self.bitmap(index_name)
+        return self.tickers[mask].tolist()
+
+    def read_assets(self, tickers = None, within_dates = None):
+        """
+        returns a dictionary of {ticker: Stock object}; each ticker is read once
+        """
+        frames = self.store.read_frames(tickers = tickers, within_dates = within_dates)
+        fundamentals = self.store.read_fundamentals(tickers = list(frames.keys()))
+        return {ticker: Stock.from_data(ticker, data = data, fundamentals = fundamentals[ticker])
+                    for ticker, data in frames.items() if ticker in fundamentals}
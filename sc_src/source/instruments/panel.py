@@ -0,0 +1,309 @@
+# ############################################# #
+# Aligned price matrix of all assets of an      #
+# index for universe wide return calculations   #
+# ############################################# #
+from os import path
+import numpy as np
+import pandas as pd
+from .. utils import tools, shared
+
+
+class PricePanel:
+    """
+    tickers x dates matrices of one price column (Close by default) of all assets in an index
+        dates: sorted union of trading dates of all assets as int64 day ordinals
+        cumulative_log_returns: prefix sums of log returns since the first bar of each ticker,
+            forward filled along dates; value at or before each date
+        cumulative_log_returns_next: same prefix sums back filled; value at or after each date
+        counts: cumulative number of bars of each ticker up to and including each date
+    bars with a price that is not finite or not positive are dropped
+    a date -> position index covers every calendar day between the first and the last date
+    the return of any window for all tickers is two gathers and a subtraction:
+        exp(cumulative_log_returns[:, end] - cumulative_log_returns_next[:, start]) - 1
+    ticker information (sector, name, latest price) is kept in arrays aligned with rows
+    bars of all tickers are also kept flat, row after row (bar_offsets[row]:bar_offsets[row + 1]),
+        with prefix sums of bar to bar returns; window sums of returns of all tickers are
+            differences of prefix sums at the first and the last bar of each ticker in the window
+    """
+    def __init__(self, tickers = None, dates = None, prices = None,
+                    sectors = None, names = None, latest_prices = None):
+        self.tickers = np.asarray(tickers, dtype = object)
+        self.dates = np.asarray(dates, dtype = np.int64)
+        self.sectors = np.asarray(sectors, dtype = object)
+        self.names = np.asarray(names, dtype = object)
+        self.latest_prices = np.asarray(latest_prices, dtype = float)
+        self.rows = {ticker:row for row, ticker in enumerate(self.tickers)}
+        # zero, negative and non finite closes (illiquid names on yfinance) are dropped as missing bars;
+        #   a single one would turn log prices and the flat prefix sums of every later ticker into inf/nan
+        prices = np.where(np.isfinite(prices) & (prices > 0), prices, np.nan)
+        has_bar = ~np.isnan(prices)
+        self.counts = np.cumsum(has_bar, axis = 1, dtype = np.int32)
+        # positions of the first and the last bar of each ticker
+        self.first_positions = np.argmax(has_bar, axis = 1)
+        self.last_positions = len(self.dates) - 1 - np.argmax(has_bar[:, ::-1], axis = 1)
+        self.first_prices = prices[np.arange(len(self.tickers)), self.first_positions]
+        log_prices = np.log(prices) - np.log(self.first_prices)[:, np.newaxis]
+        self.cumulative_log_returns = PricePanel._forward_fill(log_prices)
+        self.cumulative_log_returns_next = PricePanel._forward_fill(log_prices[:, ::-1])[:, ::-1]
+        # date -> position index: day ordinal - dates[0] gives the position of the
+        #   last trading date at or before and of the first trading date at or after that day
+        calendar = np.arange(self.dates[0], self.dates[-1] + 1)
+        self.positions_at_or_before = np.searchsorted(self.dates, calendar, side = 'right') - 1
+        self.positions_at_or_after = np.searchsorted(self.dates, calendar, side = 'left')
+        self._set_bars(prices, has_bar)
+
+    def _set_bars(self, prices, has_bar):
+        rows, positions = np.nonzero(has_bar)
+        self.bar_offsets = np.r_[0, np.cumsum(has_bar.sum(axis = 1))]
+        self.bar_dates = self.dates[positions]
+        self.bar_prices = prices[rows, positions]
+        # returns from the previous bar of the same ticker; zero at the first bar of each ticker
+        first_bar = np.zeros(len(rows), dtype = bool)
+        first_bar[self.bar_offsets[:-1][self.bar_offsets[:-1] < len(rows)]] = True
+        previous_prices = np.r_[np.nan, self.bar_prices[:-1]]
+        simple_returns = np.where(first_bar, 0, self.bar_prices/previous_prices - 1)
+        # log returns only count between bars on consecutive calendar days
+        #   matches log returns of daily resampled prices with missing days filled by zero
+        consecutive = ~first_bar & (np.r_[0, np.diff(self.bar_dates)] == 1)
+        log_returns = np.where(consecutive, np.log(self.bar_prices/previous_prices), 0)
+        self.sum_returns = np.cumsum(simple_returns)
+        self.sum_squared_returns = np.cumsum(simple_returns**2)
+        self.sum_log_returns = np.cumsum(log_returns)
+        self.sum_squared_log_returns = np.cumsum(log_returns**2)
+        self.sum_prices = np.r_[0, np.cumsum(self.bar_prices)]
+
+    @staticmethod
+    def _forward_fill(values):
+        positions = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+        np.maximum.accumulate(positions, axis = 1, out = positions)
+        return values[np.arange(values.shape[0])[:, np.newaxis], positions]
+
+    @classmethod
+    def from_assets(cls, assets = None, end_point = 'Close'):
+        """
+        assets: dictionary of {ticker: Stock object}
+        """
+        ordinals = [tools.to_ordinals(asset.data.index) for asset in assets.values()]
+        dates = np.unique(np.concatenate(ordinals))
+        prices = np.full((len(ordinals), len(dates)), np.nan)
+        for row, (asset, asset_ordinals) in enumerate(zip(assets.values(), ordinals)):
+            prices[row, np.searchsorted(dates, asset_ordinals)] = asset.data[end_point].values
+        return cls(tickers = list(assets.keys()), dates = dates, prices = prices,
+                    sectors = [asset.sector for asset in assets.values()],
+                        names = [asset.name for asset in assets.values()],
+                            latest_prices = [asset.latest_price for asset in assets.values()])
+
+    # ### memory mapped panels ### #
+    # numeric arrays are kept in .npy files and labels of tickers in an Arrow file
+    array_names = ['dates', 'latest_prices', 'counts', 'first_positions', 'last_positions', 'first_prices',
+                    'cumulative_log_returns', 'cumulative_log_returns_next', 'positions_at_or_before',
+                        'positions_at_or_after', 'bar_offsets', 'bar_dates', 'bar_prices', 'sum_returns',
+                            'sum_squared_returns', 'sum_log_returns', 'sum_squared_log_returns', 'sum_prices']
+    labels_filename = 'labels.arrow'
+
+    def save(self, dir_path = None):
+        tools.make_dir(dir_path)
+        for name in PricePanel.array_names:
+            shared.write_array(getattr(self, name), path.join(dir_path, name + '.npy'))
+        labels = pd.DataFrame({'Ticker': self.tickers, 'Sector': self.sectors, 'Name': self.names})
+        shared.write_table(labels, path.join(dir_path, self.labels_filename))
+
+    @classmethod
+    def load(cls, dir_path = None, mmap_mode = 'r'):
+        """
+        maps a saved panel; with mmap_mode = 'r' arrays are read only and
+            processes that load the same files share one physical copy
+        """
+        panel = cls.__new__(cls)
+        for name in cls.array_names:
+            setattr(panel, name, shared.read_array(path.join(dir_path, name + '.npy'), mmap_mode = mmap_mode))
+        labels = shared.read_table(path.join(dir_path, cls.labels_filename))
+        panel.tickers = labels['Ticker'].to_numpy(dtype = object)
+        panel.sectors = labels['Sector'].to_numpy(dtype = object)
+        panel.names = labels['Name'].to_numpy(dtype = object)
+        panel.rows = {ticker:row for row, ticker in enumerate(panel.tickers)}
+        return panel
+
+    @classmethod
+    def exists(cls, dir_path = None):
+        return all(path.exists(path.join(dir_path, name + '.npy')) for name in cls.array_names)
+
+    @property
+    def num_tickers(self):
+        return len(self.tickers)
+
+    @property
+    def latest_dates(self):
+        """
+        day ordinal of the last bar of each ticker
+        """
+        return self.bar_dates[self.bar_offsets[1:] - 1]
+
+    def positions(self, within_dates = None):
+        """
+        returns positions of the first and the last date within dates
+            start > end if there is no trading date in the window
+        """
+        start, end = (None, None) if within_dates is None else within_dates
+        start = self.dates[0] if not start else tools.date_to_ordinal(start)
+        end = self.dates[-1] if not end else tools.date_to_ordinal(end)
+        if start > self.dates[-1] or end < self.dates[0]:
+            return len(self.dates), -1
+        start = self.positions_at_or_after[max(start - self.dates[0], 0)]
+        end = self.positions_at_or_before[min(end - self.dates[0], len(self.positions_at_or_before) - 1)]
+        return start, end
+
+    def periods_positions(self, starts = None, ends = None):
+        """
+        vectorized positions: starts and ends are arrays of day ordinals of many windows
+            start > end for windows without a trading date
+        """
+        starts = np.asarray(starts, dtype = np.int64)
+        ends = np.asarray(ends, dtype = np.int64)
+        last_day = len(self.positions_at_or_before) - 1
+        start_positions = np.where(starts > self.dates[-1], len(self.dates),
+                            self.positions_at_or_after[np.clip(starts - self.dates[0], 0, last_day)])
+        end_positions = np.where(ends < self.dates[0], -1,
+                            self.positions_at_or_before[np.clip(ends - self.dates[0], 0, last_day)])
+        return start_positions, end_positions
+
+    def _bars_before(self, start):
+        if start == 0:
+            return np.zeros(self.num_tickers, dtype = np.int32)
+        return self.counts[:, start - 1]
+
+    def window_returns(self, within_dates = None):
+        """
+        investment return, price[last]/price[first] - 1, of all tickers within dates
+            nan for tickers with less than two bars in the window
+        """
+        start, end = self.positions(within_dates)
+        returns = np.full(self.num_tickers, np.nan)
+        if start > end:
+            return returns
+        num_bars = self.counts[:, end] - self._bars_before(start)
+        valid = num_bars >= 2
+        returns[valid] = np.expm1(self.cumulative_log_returns[valid, end] - self.cumulative_log_returns_next[valid, start])
+        return returns
+
+    def periods_returns(self, starts = None, ends = None):
+        """
+        investment returns of all tickers in many windows at once
+            starts, ends: arrays of day ordinals of the first and the last date of each window
+        returns a tickers x windows matrix; nan where a ticker has less than two bars in a window
+        """
+        start_positions, end_positions = self.periods_positions(starts = starts, ends = ends)
+        empty = start_positions > end_positions
+        start_positions = np.minimum(start_positions, len(self.dates) - 1)
+        end_positions = np.maximum(end_positions, 0)
+        bars_before = np.where(start_positions > 0, self.counts[:, start_positions - 1], 0)
+        num_bars = self.counts[:, end_positions] - bars_before
+        returns = np.expm1(self.cumulative_log_returns[:, end_positions] - 
+                                self.cumulative_log_returns_next[:, start_positions])
+        returns[(num_bars < 2) | empty[np.newaxis, :]] = np.nan
+        return returns
+
+    def sector_means(self, values = None, sectors = None):
+        """
+        mean of values (tickers x columns matrix) of the tickers of each sector ignoring nan
+            sectors: list of sectors; tickers of other sectors are left out
+        returns a sectors x columns matrix
+        """
+        codes = {sector:code for code, sector in enumerate(sectors)}
+        sector_index = np.array([codes.get(sector, -1) for sector in self.sectors])
+        in_sectors = np.flatnonzero(sector_index >= 0)
+        membership = np.zeros((len(sectors), self.num_tickers))
+        membership[sector_index[in_sectors], in_sectors] = 1
+        valid = ~np.isnan(values)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return (membership @ np.where(valid, values, 0))/(membership @ valid)
+
+    def _window_bars(self, within_dates = None):
+        """
+        flat positions of the first and the last bar of each ticker within dates and the number of bars
+        """
+        start, end = self.positions(within_dates)
+        if start > end:
+            num_bars = np.zeros(self.num_tickers, dtype = np.int32)
+            return self.bar_offsets[:-1], self.bar_offsets[:-1], num_bars
+        bars_before = self._bars_before(start)
+        num_bars = self.counts[:, end] - bars_before
+        first = self.bar_offsets[:-1] + bars_before
+        last = np.maximum(first + num_bars - 1, first)
+        return first, last, num_bars
+
+    @staticmethod
+    def _std(sums, squared_sums, num_values):
+        # sample standard deviation (ddof = 1) from sums of values and of squared values
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            variance = (squared_sums - sums**2/num_values)/(num_values - 1)
+        return np.sqrt(np.maximum(variance, 0))
+
+    def volatility(self, within_dates = None, num_periods = 252):
+        """
+        annualized volatility of daily log returns of all tickers within dates
+            same as Asset.volatility with daily sampling; nan for tickers with less than two bars
+        """
+        first, last, num_bars = self._window_bars(within_dates)
+        volatility = np.full(self.num_tickers, np.nan)
+        valid = num_bars >= 2
+        first, last = first[valid], last[valid]
+        num_days = self.bar_dates[last] - self.bar_dates[first] + 1
+        sums = self.sum_log_returns[last] - self.sum_log_returns[first]
+        squared_sums = self.sum_squared_log_returns[last] - self.sum_squared_log_returns[first]
+        volatility[valid] = PricePanel._std(sums, squared_sums, num_days)*np.sqrt(num_periods)
+        return volatility
+
+    def sharpe(self, within_dates = None, risk_free = 0, num_periods = 252):
+        """
+        annualized sharpe ratio of daily returns of all tickers within dates
+            same as Asset.sharpe with daily sampling; risk_free is the mean daily risk free rate
+            nan for tickers with less than two bars
+        """
+        first, last, num_bars = self._window_bars(within_dates)
+        sharpe = np.full(self.num_tickers, np.nan)
+        valid = num_bars >= 2
+        first, last = first[valid], last[valid]
+        # one return per calendar day; days without a bar have zero return
+        num_days = self.bar_dates[last] - self.bar_dates[first]
+        sums = self.sum_returns[last] - self.sum_returns[first]
+        squared_sums = self.sum_squared_returns[last] - self.sum_squared_returns[first]
+        mean_returns = (sums/num_days + 1)**num_periods - 1
+        std = PricePanel._std(sums, squared_sums, num_days)*np.sqrt(num_periods)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            sharpe[valid] = (mean_returns - risk_free)/std
+        return sharpe
+
+    def mean_prices_since(self, start_dates = None):
+        """
+        mean price of each ticker from a start date (day ordinal per ticker) to its last bar
+        """
+        # bars are sorted by (row, date); one binary search finds the first bar of every ticker
+        span = self.dates[-1] - self.dates[0] + 1
+        rows = np.repeat(np.arange(self.num_tickers), np.diff(self.bar_offsets))
+        keys = rows*span + (self.bar_dates - self.dates[0])
+        starts = np.clip(np.asarray(start_dates, dtype = np.int64) - self.dates[0], 0, span - 1)
+        first = np.searchsorted(keys, np.arange(self.num_tickers)*span + starts, side = 'left')
+        last = self.bar_offsets[1:]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return (self.sum_prices[last] - self.sum_prices[first])/(last - first)
+
+    def cumulative_returns_history(self, within_dates = None, tickers = None):
+        """
+        returns a dataframe of cumulative returns with dates as index and tickers as columns
+            values are nan before the first and after the last bar of a ticker in the window
+        """
+        start, end = self.positions(within_dates)
+        if tickers is None:
+            rows = np.arange(self.num_tickers)
+        else:
+            rows = np.array([self.rows[ticker] for ticker in tickers if ticker in self.rows], dtype = int)
+        if start > end or len(rows) == 0:
+            return pd.DataFrame(columns = self.tickers[rows])
+        history = np.expm1(self.cumulative_log_returns[rows, start:end + 1] -
+                        self.cumulative_log_returns_next[rows, start][:, np.newaxis])
+        bars = self.counts[rows, start:end + 1] - self._bars_before(start)[rows][:, np.newaxis]
+        positions = np.arange(start, end + 1)
+        history[(bars < 1) | (positions[np.newaxis, :] > self.last_positions[rows][:, np.newaxis])] = np.nan
+        return pd.DataFrame(history.T, index = tools.ordinals_to_dates(self.dates[start:end + 1]),
+                    columns = self.tickers[rows])
@@ -3,13 +3,21 @@ from abc import ABCMeta, abstractclassmethod
 from typing import Iterable 
 import pandas as pd 
 import numpy as np 
-import pandas_datareader.data as web
-import yfinance as yf 
 import datetime 
-from .. utils import market_data, tools, keys  
+from .. utils import market_data, tools, keys, http_cache, providers  
 import traceback 
 import sys 
 
+# ### calls of the data provider (see providers); responses can be recorded and replayed (see http_cache) ### #
+@http_cache.cached('yfinance_info', ttl = 24, provider = True)
+def ticker_info(symbol):
+    return providers.get_provider().info(symbol)
+
+@http_cache.cached('yfinance_history', ttl = 12, provider = True)
+def ticker_history(symbol, period = None, interval = None, start_date = None, end_date = None):
+    return providers.get_provider().history(symbol, period = period, interval = interval,
+                start_date = start_date, end_date = end_date)
+
 # ################### #
 #  Asset Base Class   #
 # ################### #
@@ -33,7 +41,9 @@ class Asset(metaclass =ABCMeta):
         self.sector = sector 
         # final date ranfge used by the model 
         self.last_date_range = None 
-        self.latest_date = self.data.index.date.max()
+        # day ordinals of the data index; date windows are sliced by binary search on them
+        self._ordinals = tools.to_ordinals(self.data.index)
+        self.latest_date = tools.ordinal_to_date(self._ordinals[-1])
         self.latest_price = self.data['Close'].iloc[-1]
         self._risk_free = None 
 
@@ -42,26 +52,22 @@ class Asset(metaclass =ABCMeta):
     @property 
     def price_avg_last_week(self):
         last_week = tools.get_one_week_ago(self.latest_date)
-        return self.data[(self.data.index.date >= last_week) & 
-            (self.data.index.date <= self.latest_date)]['Close'].mean()
+        return tools.choose_dates_lite(self.data, (last_week, self.latest_date), ordinals = self.ordinals)['Close'].mean()
     
     @property
     def price_avg_last_month(self):
         last_month = tools.get_one_month_ago(self.latest_date)
-        return self.data[(self.data.index.date >= last_month) &
-                 (self.data.index.date <= self.latest_date)]['Close'].mean()
+        return tools.choose_dates_lite(self.data, (last_month, self.latest_date), ordinals = self.ordinals)['Close'].mean()
 
     @property 
     def price_avg_last_six_months(self): 
         last_six = tools.get_six_months_ago(self.latest_date)
-        return self.data[(self.data.index.date >= last_six) &
-             (self.data.index.date <= self.latest_date)]['Close'].mean()
+        return tools.choose_dates_lite(self.data, (last_six, self.latest_date), ordinals = self.ordinals)['Close'].mean()
     
     @property 
     def price_avg_last_year(self):
         last_year = tools.get_one_year_ago(self.latest_date)
-        return self.data[(self.data.index.date >= last_year) &
-            (self.data.index.date <= self.latest_date)]['Close'].mean()
+        return tools.choose_dates_lite(self.data, (last_year, self.latest_date), ordinals = self.ordinals)['Close'].mean()
     
     @property
     def risk_free(self):
@@ -76,9 +82,16 @@ class Asset(metaclass =ABCMeta):
         if isinstance(new_risk_free, pd.Series) or isinstance(new_risk_free, pd.DataFrame):
             self._risk_free = new_risk_free 
     
+    @property
+    def ordinals(self):
+        # assets pickled before ordinals were stored compute them once on first use
+        if getattr(self, '_ordinals', None) is None or len(self._ordinals) != len(self.data.index):
+            self._ordinals = tools.to_ordinals(self.data.index)
+        return self._ordinals
+
     @property 
     def date_range(self):
-        return self.data.index.date.min(), self.data.index.date.max()
+        return tools.ordinal_to_date(self.ordinals[0]), tools.ordinal_to_date(self.ordinals[-1])
                   
     # => Carpets the dataframe for missing dates
     @staticmethod 
@@ -94,6 +107,17 @@ class Asset(metaclass =ABCMeta):
         data.dropna(inplace = True)
         return data 
     
+    def append_data(self, new_data):
+        """
+        appends new bars to data; bars of dates that already exist are replaced by the new ones
+        """
+        new_data = tools.align_index_tz(new_data, like = self.data)
+        data = pd.concat([self.data, new_data])
+        self.data = data[~data.index.duplicated(keep = 'last')].sort_index()
+        self._ordinals = tools.to_ordinals(self.data.index)
+        self.latest_date = tools.ordinal_to_date(self._ordinals[-1])
+        self.latest_price = self.data['Close'].iloc[-1]
+
     @staticmethod
     def dates(frame):
         return frame.index.min(), frame.index.max()
@@ -181,7 +205,7 @@ class Asset(metaclass =ABCMeta):
         if within_dates is None:
             within_dates = self.date_range 
          
-        data = tools.choose_dates(self.data, within_dates)
+        data = tools.choose_dates(self.data, within_dates, ordinals = self.ordinals)
         if data is not None:
             asset_return = data[end_point].resample(sampling).last().pct_change().dropna()
             cm_returns = Asset.compute_cumulative_return(returns = asset_return, in_percent=in_percent)
@@ -193,7 +217,7 @@ class Asset(metaclass =ABCMeta):
         """
         if within_dates is None:
             within_dates = self.date_range 
-        data = tools.choose_dates(self.data, within_dates)
+        data = tools.choose_dates(self.data, within_dates, ordinals = self.ordinals)
         if data is not None:
             resampled_data = data[end_point].resample(sampling).last().dropna()
             return ((resampled_data[-1] - resampled_data[0])/resampled_data[0])*100
@@ -225,7 +249,7 @@ class Asset(metaclass =ABCMeta):
             within_dates = self.date_range 
         
         volatility = None 
-        data = tools.choose_dates(self.data, within_dates) 
+        data = tools.choose_dates(self.data, within_dates, ordinals = self.ordinals) 
         if data is not None:
             data = data.resample(sampling).last()
             returns = np.log(data[end_point]/data[end_point].shift(1))
@@ -246,7 +270,7 @@ class Asset(metaclass =ABCMeta):
         if within_dates is None:
             within_dates = self.date_range
 
-        data = tools.choose_dates(self.data, within_dates)
+        data = tools.choose_dates(self.data, within_dates, ordinals = self.ordinals)
         risk_free = tools.choose_dates(self.risk_free, within_dates)
         sharpe = None 
    
@@ -268,7 +292,7 @@ class Asset(metaclass =ABCMeta):
             return None 
         if fully_within_date_range is True and self.is_fully_within_date_range(within_dates=within_dates) is False:
             return None
-        data = tools.choose_dates(self.data, within_dates)  
+        data = tools.choose_dates(self.data, within_dates, ordinals = self.ordinals)  
         return data['Volume'].mean()      
     
     # class instantiation factories
@@ -285,32 +309,45 @@ class Asset(metaclass =ABCMeta):
             return 0
 
     
-    @staticmethod 
-    def pull_history_and_fundamentals(symbol = None, period = None, 
-                    interval = None, start_date = None, end_date = None):
+    @staticmethod
+    def parse_fundamentals(info = None):
         """
-        pulls history and generates fundamentals as well 
+        converts the info dictionary of yf.Ticker into the fundamentals dictionary
         """
-        fundamentals = {key:0 for key in Asset.fundamentals_numeric_keys} 
+        fundamentals = {key:0 for key in Asset.fundamentals_numeric_keys}
         fundamentals.update({key:None for key in Asset.fundamentals_id_keys})
-        symbol_data = yf.Ticker(symbol)
-        if start_date is None and end_date is None:
-            data = symbol_data.history(period = period, interval = interval)
-        else:
-            data = symbol_data.history(start = start_date, end = end_date)
+        for key,value in info.items():
+            if key in Asset.fundamentals_numeric_keys:
+                fundamentals[key] = Asset._numeric_value_is(value)
+            elif key in Asset.fundamentals_id_keys:
+                fundamentals[key] = value
+        fundamentals['sector'] = keys.SECTOR_KEYS[fundamentals['sector']]
+        old_name = fundamentals['shortName']
+        new_name = old_name.replace('"', '')
+        fundamentals['shortName'] = new_name
+        return fundamentals
+
+    @staticmethod
+    def pull_fundamentals(symbol = None):
+        """
+        pulls fundamentals only; this is the slow metadata call of yfinance
+        """
+        return Asset.parse_fundamentals(info = ticker_info(symbol))
+
+    @staticmethod
+    def pull_history_and_fundamentals(symbol = None, period = None,
+                    interval = None, start_date = None, end_date = None, fundamentals = None):
+        """
+        pulls history and generates fundamentals as well
+        fundamentals: a fundamentals dictionary (of a FundamentalsSnapshot); the metadata call is skipped
+        """
+        data = ticker_history(symbol, period = period, interval = interval, start_date = start_date, end_date = end_date)
         if len(data) != 0:
-            for key,value in symbol_data.info.items():
-                if key in Asset.fundamentals_numeric_keys:
-                    fundamentals[key] = Asset._numeric_value_is(value)
-                elif key in Asset.fundamentals_id_keys:
-                    fundamentals[key] = value
-            fundamentals['sector'] = keys.SECTOR_KEYS[fundamentals['sector']]
-            old_name = fundamentals['shortName']
-            new_name = old_name.replace('"', '')
-            fundamentals['shortName'] = new_name    
-            return data, fundamentals 
+            if fundamentals is None:
+                fundamentals = Asset.parse_fundamentals(info = ticker_info(symbol))
+            return data, fundamentals
         else:
-            return None, None 
+            return None, None
 
 # ################### #
 #       Stocks        #
@@ -325,16 +362,26 @@ class Stock(Asset):
         period: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
         interval: 1m,2m,5m,15m,30m,60m,90m,1h,1d,5d,1wk,1mo,3mo
         start and end_date: year-month-day 
+        fundamentals: a fundamentals dictionary is used as it is; otherwise fundamentals are pulled
         """
         
         data, fundamentals = Stock.pull_history_and_fundamentals(symbol = symbol,
-                                period = period, interval = interval, start_date = start_date, end_date = end_date)
+                                period = period, interval = interval, start_date = start_date, end_date = end_date,
+                                    fundamentals = fundamentals if isinstance(fundamentals, dict) else None)
 
         if data is not None:
-            return cls(symbol = symbol, data = data, sector = fundamentals['sector'],
-                        fundamentals = fundamentals, name = fundamentals['shortName'])
+            return cls.from_data(symbol, data = data, fundamentals = fundamentals)
         elif data is None:
-            return None 
+            return None
+
+    @classmethod
+    def from_data(cls, symbol, data = None, fundamentals = None):
+        """
+        instantiates from an already downloaded history and fundamentals dictionary
+            used by bulk downloads and data stores
+        """
+        return cls(symbol = symbol, data = data, sector = fundamentals['sector'],
+                        fundamentals = fundamentals, name = fundamentals['shortName'])
 
 # ################################# #
 #  Cryptos                          #
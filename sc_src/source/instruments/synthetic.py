@@ -0,0 +1,102 @@
+# ############################################# #
+# Synthetic market data: OHLCV history and      #
+# fundamentals of made up tickers for offline   #
+# benchmarks                                    #
+# ############################################# #
+from os import path
+from datetime import date
+import numpy as np
+import pandas as pd
+from . securities import Stock, Asset
+from . indices import Index
+from .. utils import keys, tools, http_cache, market_data
+
+# universes of the benchmark and the index they are written as
+UNIVERSES = {'sp500': (500, 'SP500'), 'russell3000': (3000, 'Russell3000'), '10k': (10000, 'Russell3000')}
+
+
+def generate_dates(years = 5, end_date = None):
+    end_date = date.today() if end_date is None else tools.to_date(end_date)
+    return pd.bdate_range(end = end_date, periods = int(years*252))
+
+def generate_assets(num_tickers = 500, years = 5, end_date = None, seed = 0):
+    """
+    returns a dictionary of {ticker: Stock object}
+        closes are geometric random walks with a market and a sector factor
+        some tickers start after the first date (listings) or stop before the last one (delistings)
+            and about 2 percent of bars are missing
+        fundamentals have every key of Asset; sectors are keys.SECTORS
+    """
+    rng = np.random.default_rng(seed)
+    dates = generate_dates(years = years, end_date = end_date)
+    num_days = len(dates)
+    sectors = list(keys.SECTORS)
+    ticker_sectors = rng.integers(0, len(sectors), num_tickers)
+
+    market = rng.normal(0.0003, 0.01, num_days)
+    sector_factors = rng.normal(0, 0.006, (len(sectors), num_days))
+    betas = rng.uniform(0.5, 1.5, num_tickers)
+    log_returns = (betas[:, None]*market[None, :] + sector_factors[ticker_sectors]
+                    + rng.normal(0, 0.015, (num_tickers, num_days)))
+    closes = rng.uniform(5, 500, num_tickers)[:, None]*np.exp(np.cumsum(log_returns, axis = 1))
+
+    starts = np.where(rng.random(num_tickers) < 0.2, rng.integers(0, num_days//2, num_tickers), 0)
+    ends = np.where(rng.random(num_tickers) < 0.05, num_days - rng.integers(1, num_days//4, num_tickers), num_days)
+    assets = {}
+    for number in range(num_tickers):
+        ticker = f'SYN{number:05d}'
+        rows = np.arange(starts[number], ends[number])
+        rows = rows[rng.random(len(rows)) > 0.02]
+        close = closes[number, rows]
+        open_ = close*(1 + rng.normal(0, 0.005, len(rows)))
+        spread = np.abs(rng.normal(0, 0.01, len(rows)))
+        data = pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close)*(1 + spread),
+                    'Low': np.minimum(open_, close)*(1 - spread), 'Close': close,
+                        'Volume': rng.lognormal(13, 1, len(rows)).astype(np.int64),
+                            'Dividends': 0.0, 'Stock Splits': 0.0}, index = dates[rows])
+        assets[ticker] = Stock.from_data(ticker, data = data,
+                    fundamentals = generate_fundamentals(ticker, sectors[ticker_sectors[number]], close[-1], rng))
+    return assets
+
+def generate_fundamentals(ticker, sector, latest_price, rng):
+    fundamentals = {key: float(rng.uniform(0, 10)) for key in Asset.fundamentals_numeric_keys}
+    fundamentals.update({key: ticker for key in Asset.fundamentals_id_keys})
+    fundamentals.update({'marketCap': float(latest_price*rng.lognormal(18, 1.5)),
+                'trailingPE': float(rng.uniform(5, 60)), 'dividendYield': float(rng.uniform(0, 0.05)),
+                    'sector': sector, 'shortName': f'{ticker} Synthetic Inc'})
+    return fundamentals
+
+def generate_risk_free(dates, seed = 0):
+    """
+    a 10 year treasury yield in percent like the FRED series DGS10 (Index.risk_free); nothing is pulled
+    """
+    rng = np.random.default_rng(seed)
+    yields = 4 + np.cumsum(rng.normal(0, 0.02, len(dates)))
+    return pd.DataFrame({'DGS10': yields}, index = pd.DatetimeIndex(dates, name = 'DATE'))
+
+def record_risk_free(index, seed = 0):
+    """
+    records a synthetic DGS10 response for the date range of index in the response cache;
+        with http_cache in replay mode Index.risk_free = 'DGS10' reads it instead of pulling FRED
+    """
+    start, end = index.date_range
+    dates = pd.bdate_range(start = start, end = end)
+    key, call = http_cache.call_key(market_data.get_fred_series.__wrapped__, ('DGS10', start, end), {})
+    http_cache.write_response(market_data.get_fred_series.source, key, call, generate_risk_free(dates, seed = seed))
+
+def write_index(index_class, assets, data_path = None):
+    """
+    writes an index in the LOAD_PATH layout: PriceStore, sectors, sector returns,
+        fundamentals, intervals and the memory mapped files of save_shared
+    """
+    data_path = keys.DATA_PATH if data_path is None else data_path
+    assets, sectors, date_range = Index._collect_assets(assets)
+    index = index_class(assets = assets, sectors = sectors, date_range = date_range,
+                main_save_path = tools.make_dir(path.join(data_path, index_class.__name__.upper())))
+    index.save_assets()
+    index.generate_sector_mean_return_long(freq = 'M', save_data = True)
+    index.generate_sector_mean_return_long(freq = 'Q', save_data = True)
+    index.generate_index_fundamentals()
+    index.generate_price_movement_and_histograms_in_intervals()
+    index.save_shared()
+    return index
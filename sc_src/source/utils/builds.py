@@ -0,0 +1,157 @@
+# ############################################# #
+# Versioned data builds: each update writes a   #
+# new directory; a 'current' symlink points to  #
+# the build served by the app                   #
+# ############################################# #
+import os
+import json
+import shutil
+from os import path
+from datetime import datetime
+from contextlib import contextmanager
+from . import keys, tools
+
+# SPEAKINGCHARTS_BUILDS_PATH: root of build directories; defaults to DATA_PATH/builds
+BUILDS_PATH = os.environ.get('SPEAKINGCHARTS_BUILDS_PATH', None)
+
+
+class BuildStore:
+    """
+    root/
+        20240105-170000/        a complete build with manifest.json
+        .building-20240112-170000/  a build being written; never read by the app
+        current -> 20240105-170000
+    a build is seeded with a copy of the current build (incremental updates read it),
+        written, given a manifest and renamed; then the current symlink is replaced
+        by rename so readers see either the old or the new build and nothing in between
+    """
+    pointer_name = 'current'
+    manifest_filename = 'manifest.json'
+    building_prefix = '.building-'
+
+    def __init__(self, root = None, keep = 3):
+        self.root = root if root is not None else default_root()
+        self.keep = keep
+
+    @property
+    def pointer(self):
+        return path.join(self.root, self.pointer_name)
+
+    def version_path(self, version):
+        return path.join(self.root, version)
+
+    def current_version(self):
+        """
+        version of the current build or None if nothing has been built
+        """
+        try:
+            return path.basename(os.readlink(self.pointer).rstrip('/'))
+        except OSError:
+            return None
+
+    def current_path(self):
+        version = self.current_version()
+        return None if version is None else self.version_path(version)
+
+    def versions(self):
+        return sorted(name for name in os.listdir(self.root) if name != self.pointer_name
+                        and path.isfile(path.join(self.root, name, self.manifest_filename)))
+
+    def manifest(self, version):
+        with open(path.join(self.version_path(version), self.manifest_filename)) as f:
+            return json.load(f)
+
+    def begin(self, seed_path = None):
+        """
+        creates the directory of a new build seeded with the current build (or seed_path)
+            returns the version and the path to write to
+        """
+        version = datetime.now().strftime('%Y%m%d-%H%M%S')
+        tools.make_dir(self.root)
+        build_path = path.join(self.root, self.building_prefix + version)
+        seed_path = self.current_path() if seed_path is None else seed_path
+        if seed_path is not None and path.exists(seed_path):
+            # files are copied, not linked: writers overwrite files in place
+            root = path.realpath(self.root)
+            shutil.copytree(seed_path, build_path, symlinks = True,
+                ignore = lambda dir_name, names: [name for name in names
+                    if path.realpath(path.join(dir_name, name)) == root or name == self.manifest_filename])
+        else:
+            os.makedirs(build_path)
+        return version, build_path
+
+    def commit(self, version, build_path):
+        """
+        writes the manifest, publishes the build and points current to it
+        """
+        files = {}
+        for dir_name, _, file_names in os.walk(build_path):
+            for file_name in file_names:
+                file_path = path.join(dir_name, file_name)
+                files[path.relpath(file_path, build_path)] = path.getsize(file_path)
+        manifest = {'version': version, 'created': datetime.now().isoformat(timespec = 'seconds'),
+                        'based_on': self.current_version(), 'files': files}
+        with open(path.join(build_path, self.manifest_filename), 'w') as f:
+            json.dump(manifest, f, indent = 1)
+        os.rename(build_path, self.version_path(version))
+        # the new link is made next to the pointer and renamed over it
+        tmp_pointer = self.pointer + '.tmp'
+        if path.lexists(tmp_pointer):
+            os.remove(tmp_pointer)
+        os.symlink(version, tmp_pointer)
+        os.replace(tmp_pointer, self.pointer)
+        self.prune()
+        return manifest
+
+    def abort(self, build_path):
+        shutil.rmtree(build_path, ignore_errors = True)
+
+    def prune(self):
+        """
+        removes all but the latest keep builds; the current build is always kept
+        """
+        current = self.current_version()
+        for version in self.versions()[:-self.keep]:
+            if version != current:
+                shutil.rmtree(self.version_path(version), ignore_errors = True)
+
+
+def default_root():
+    return BUILDS_PATH if BUILDS_PATH is not None else path.join(keys.DATA_PATH, 'builds')
+
+@contextmanager
+def new_build(root = None, keep = 3):
+    """
+    update jobs run inside a new build:
+        with new_build() as build_path:
+            ...
+    DATA_PATH and LOAD_PATH point to the build while the job runs; the build is published
+        when the job finishes and removed if the job fails
+    the first build is seeded with the files of DATA_PATH
+    """
+    store = BuildStore(root = root, keep = keep)
+    # ingestion checkpoints are kept next to the builds: a failed build is removed, its checkpoints are not
+    os.environ.setdefault('SPEAKINGCHARTS_CHECKPOINT_PATH', path.join(store.root, 'checkpoints'))
+    seed_path = None if store.current_version() is not None else keys.DATA_PATH
+    version, build_path = store.begin(seed_path = seed_path)
+    data_path, load_path = keys.DATA_PATH, keys.LOAD_PATH
+    keys.DATA_PATH = keys.LOAD_PATH = build_path
+    try:
+        yield build_path
+    except BaseException:
+        store.abort(build_path)
+        raise
+    finally:
+        keys.DATA_PATH, keys.LOAD_PATH = data_path, load_path
+    manifest = store.commit(version, build_path)
+    print(f'published build {version} with {len(manifest["files"])} files')
+
+def use_current_build(root = None):
+    """
+    points LOAD_PATH to the current build; returns its version or None if nothing has been built
+    """
+    store = BuildStore(root = root)
+    version = store.current_version()
+    if version is not None:
+        keys.LOAD_PATH = store.version_path(version)
+    return version
@@ -0,0 +1,190 @@
+# ############################################# #
+# Rate limited asynchronous fetcher of web      #
+# pages and a persisted cache of parsed results #
+# ############################################# #
+import os
+import json
+import time
+import asyncio
+from os import path
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from . import tools
+
+
+class TokenBucket:
+    """
+    rate: tokens added per second; capacity: largest burst
+    acquire() waits until a token is available; waiters are served in order
+    """
+    def __init__(self, rate = 1.0, capacity = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated)*self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # the lock is made in the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens)/self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class FetchError(Exception):
+    def __init__(self, url, reason):
+        super(FetchError, self).__init__(f'{url}: {reason}')
+        self.url = url
+        self.reason = reason
+
+
+class AsyncFetcher:
+    """
+    fetches many urls with asyncio
+        requests start at most rate per second (burst: requests allowed at once after a pause)
+        at most concurrency requests are in flight; they share one requests.Session whose
+            connection pool keeps concurrency connections alive
+        connection errors and responses with a status in retry_statuses are retried up to
+            retries times with exponential backoff; Retry-After of the server is honored
+    requests run on a pool of concurrency threads; the event loop only schedules them
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate = 1.0, burst = 1, concurrency = 4, retries = 3, backoff = 1.0,
+                    timeout = 30, headers = None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers or {}
+        # number of requests sent, including retries
+        self.requests_sent = 0
+
+    def _make_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = self.concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    def _get(self, session, url, parse, key):
+        response = session.get(url, timeout = self.timeout)
+        if response.status_code != 200:
+            return response.status_code, response.headers.get('Retry-After'), None
+        if parse is None:
+            return 200, None, response.content
+        # a page that can not be parsed is a failure of its key and is not fetched again
+        try:
+            return 200, None, parse(key, response.content)
+        except Exception as error:
+            raise FetchError(url, f'parse: {type(error).__name__}: {error}')
+
+    def _retry_wait(self, attempt, retry_after = None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff*2**attempt
+
+    async def _fetch(self, key, url, parse, bucket, semaphore, session, executor):
+        loop = asyncio.get_running_loop()
+        reason = None
+        for attempt in range(self.retries + 1):
+            await bucket.acquire()
+            retry_after = None
+            async with semaphore:
+                self.requests_sent += 1
+                try:
+                    status, retry_after, result = await loop.run_in_executor(executor,
+                                                        self._get, session, url, parse, key)
+                except requests.RequestException as error:
+                    status, reason = None, type(error).__name__
+                else:
+                    if status == 200:
+                        return result
+                    reason = f'status {status}'
+                    if status not in self.retry_statuses:
+                        break
+            if attempt < self.retries:
+                await asyncio.sleep(self._retry_wait(attempt, retry_after))
+        raise FetchError(url, reason)
+
+    async def fetch_all(self, urls, parse = None, on_result = None):
+        """
+        urls: dictionary of {key: url}
+        parse: function of (key, content) applied to successful responses on the worker thread;
+            an exception of parse is a FetchError of the key
+        on_result: function of (key, result) called as soon as a url is fetched and parsed
+        returns a dictionary of {key: result} and a dictionary of {key: FetchError}
+        """
+        bucket = TokenBucket(rate = self.rate, capacity = self.burst)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results, failures = {}, {}
+        session = self._make_session()
+        with ThreadPoolExecutor(max_workers = self.concurrency) as executor:
+            tasks = [self._fetch_keyed(key, url, parse, bucket, semaphore, session, executor)
+                        for key, url in urls.items()]
+            for task in asyncio.as_completed(tasks):
+                key, result, error = await task
+                if error is not None:
+                    failures[key] = error
+                    continue
+                results[key] = result
+                if on_result is not None:
+                    on_result(key, result)
+        session.close()
+        return results, failures
+
+    async def _fetch_keyed(self, key, url, *args):
+        try:
+            return key, await self._fetch(key, url, *args), None
+        except FetchError as error:
+            return key, None, error
+
+    def run(self, urls, parse = None, on_result = None):
+        return asyncio.run(self.fetch_all(urls, parse = parse, on_result = on_result))
+
+
+class JsonCache:
+    """
+    a json file of {key: {'time': seconds since epoch, 'value': value}}
+        values older than ttl_hours are not returned; the file is written by rename
+    """
+    def __init__(self, file_name, ttl_hours = 24):
+        self.file_name = file_name
+        self.ttl_hours = ttl_hours
+        self.entries = {}
+        if path.exists(file_name):
+            with open(file_name) as f:
+                self.entries = json.load(f)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry['time'] > self.ttl_hours*3600:
+            return None
+        return entry['value']
+
+    def put(self, key, value):
+        self.entries[key] = {'time': time.time(), 'value': value}
+
+    def save(self):
+        tools.make_dir(path.dirname(self.file_name))
+        tmp_name = self.file_name + '.tmp'
+        with open(tmp_name, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_name, self.file_name)
@@ -0,0 +1,129 @@
+# ############################################# #
+# Record/replay cache of responses of upstream  #
+# data sources (yfinance, FRED, web pages)      #
+# ############################################# #
+import os
+import json
+import pickle
+import hashlib
+import inspect
+import functools
+from os import path
+from time import time
+from . import keys, tools, providers
+
+# SPEAKINGCHARTS_HTTP_CACHE_MODE:
+#   off: every call goes to the network (default)
+#   cache: responses younger than the ttl of their source are served from disk; others are pulled and recorded
+#   record: every call goes to the network and its response is recorded
+#   replay: responses are only served from disk, whatever their age; a call that was not recorded fails
+# SPEAKINGCHARTS_HTTP_CACHE_PATH: directory of recorded responses; defaults to DATA_PATH/http_cache
+MODES = ('off', 'cache', 'record', 'replay')
+
+
+class ResponseNotRecorded(LookupError):
+    pass
+
+
+# ### settings are kept in the environment so that stage processes use the same cache ### #
+def configure(mode = None, cache_path = None, ttl_hours = None):
+    """
+    mode: one of MODES
+    ttl_hours: dictionary of {source: hours}; overrides the ttl of sources
+    """
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f'cache mode must be one of {MODES}')
+        os.environ['SPEAKINGCHARTS_HTTP_CACHE_MODE'] = mode
+    if cache_path is not None:
+        os.environ['SPEAKINGCHARTS_HTTP_CACHE_PATH'] = cache_path
+    if ttl_hours is not None:
+        os.environ['SPEAKINGCHARTS_HTTP_CACHE_TTL'] = json.dumps(ttl_hours)
+
+def mode():
+    return os.environ.get('SPEAKINGCHARTS_HTTP_CACHE_MODE', 'off')
+
+def cache_path():
+    return os.environ.get('SPEAKINGCHARTS_HTTP_CACHE_PATH', path.join(keys.DATA_PATH, 'http_cache'))
+
+def ttl_hours(source, default = 24):
+    overrides = json.loads(os.environ.get('SPEAKINGCHARTS_HTTP_CACHE_TTL', '{}'))
+    return overrides.get(source, default)
+
+# hits, misses (network calls) and recorded responses of each source in this process
+stats = {}
+
+def _count(source, what):
+    stats.setdefault(source, {'hits': 0, 'misses': 0, 'recorded': 0})[what] += 1
+
+
+def call_key(func, args, kwargs, ignore = ()):
+    """
+    a call is identified by the function and the values of all arguments, defaults included;
+        functions of one source without arguments (web pages) do not share a key
+    ignore: names of arguments that do not change the response (number of threads, ...)
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: value for name, value in bound.arguments.items() if name not in ignore}
+    call = json.dumps({'function': func.__module__ + '.' + func.__qualname__, 'arguments': arguments},
+                        default = str, sort_keys = True)
+    return hashlib.sha1(call.encode()).hexdigest(), call
+
+def _response_file(source, key):
+    return path.join(cache_path(), source, key + '.pkl')
+
+def read_response(source, key):
+    """
+    returns (record time, response) or None if the call was not recorded
+    """
+    file_name = _response_file(source, key)
+    if not path.exists(file_name):
+        return None
+    with open(file_name, 'rb') as f:
+        record = pickle.load(f)
+    return record['time'], record['response']
+
+def write_response(source, key, call, response):
+    file_name = _response_file(source, key)
+    tools.make_dir(path.dirname(file_name))
+    tmp_name = file_name + f'.{os.getpid()}.tmp'
+    with open(tmp_name, 'wb') as f:
+        pickle.dump({'time': time(), 'source': source, 'call': call, 'response': response},
+                        f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_name, file_name)
+
+def cached(source, ttl = 24, ignore = (), provider = False):
+    """
+    decorates a function that pulls data from an upstream source
+        source: name of the source; responses are recorded in cache_path/source
+        ttl: hours a response is served in cache mode; overridden by configure(ttl_hours = ...)
+        ignore: arguments left out of the key of a call
+        provider: the source is served by the data provider (see providers); responses of
+            providers without network (the fake provider) are neither recorded nor replayed
+    responses must be picklable (dataframes, dictionaries, lists)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            current_mode = mode()
+            if current_mode == 'off' or (provider and not providers.get_provider().network):
+                return func(*args, **kwargs)
+            key, call = call_key(func, args, kwargs, ignore = ignore)
+            if current_mode in ('cache', 'replay'):
+                recorded = read_response(source, key)
+                if recorded is not None:
+                    record_time, response = recorded
+                    if current_mode == 'replay' or time() - record_time <= ttl_hours(source, ttl)*3600:
+                        _count(source, 'hits')
+                        return response
+                if current_mode == 'replay':
+                    raise ResponseNotRecorded(f'{source}: {call} was not recorded in {cache_path()}')
+            _count(source, 'misses')
+            response = func(*args, **kwargs)
+            write_response(source, key, call, response)
+            _count(source, 'recorded')
+            return response
+        wrapper.source = source
+        return wrapper
+    return decorator
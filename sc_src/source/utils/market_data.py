@@ -1,8 +1,8 @@
 import pandas as pd
-import pandas_datareader.data as web
-import yfinance as yf 
 from . import tools    
 from . import keys 
+from . import http_cache 
+from . import providers 
 from datetime import date, datetime
 from os import path 
 # ...
@@ -31,12 +31,13 @@ YFINANCE_ASSETS = {
       'SP BSE SENSEX':'^BSESN',
 }
 
+@http_cache.cached('yfinance_index', ttl = 12, provider = True)
 def get_yfinance_index(index: str, start: str = '1960-01-01',
                      end: str = date.today().strftime('%Y-%m-%d')) -> pd.DataFrame:
     start = tools.to_date(start)
     end = tools.to_date(end)
     if index in YFINANCE_ASSETS.keys():
-        return yf.download(YFINANCE_ASSETS[index], start = start, end = end)
+        return providers.get_provider().index_history(YFINANCE_ASSETS[index], start = start, end = end)
     else:
         raise KeyError(f'index {index} not found in YFinance asset list')
 
@@ -117,17 +118,22 @@ FRED_ASSETS = {
     }
 
 
+@http_cache.cached('fred', ttl = 24, provider = True)
+def get_fred_series(series, start = None, end = None):
+    return providers.get_provider().fred_series(series, start = start, end = end)
+
 def get_fed_asset(asset: str, start = None, end = date.today()):
     if asset not in FRED_ASSETS.keys():
         raise KeyError(f'asset {asset} does not exist in FRED assets')
     start = tools.to_date(start)
     end = tools.to_date(end)
-    return web.DataReader([FRED_ASSETS[asset]], 'fred', start, end).rename(columns = {FRED_ASSETS[asset]: asset}).dropna()
+    return get_fred_series([FRED_ASSETS[asset]], start, end).rename(columns = {FRED_ASSETS[asset]: asset}).dropna()
 
 
 # ########################################### #
 # useful functions to pull sp500 data
 # ########################################### #
+@http_cache.cached('wikipedia', ttl = 24)
 def pull_sp500_tickers():
     companies = pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]
     return companies['Symbol'].tolist() 
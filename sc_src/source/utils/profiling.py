@@ -0,0 +1,268 @@
+# ############################################# #
+# Wall time, cpu time and peak memory of update #
+# stages; optional cProfile dumps per stage     #
+# ############################################# #
+import os
+import sys
+import json
+import time
+import cProfile
+import resource
+import threading
+import tracemalloc
+import contextlib
+from os import path
+from datetime import datetime
+import numpy as np
+from . import tools
+
+# SPEAKINGCHARTS_PROFILE_PATH: directory of the records and the report of a run; profiling is off if it is not set
+# SPEAKINGCHARTS_PROFILE_CPROFILE=1: a cProfile dump of each stage is written to PROFILE_PATH/cprofile
+# SPEAKINGCHARTS_PROFILE_MEMORY=1: peak python/numpy allocations of stages are traced with tracemalloc;
+#   slows allocation heavy stages down, so it is off by default
+# stages of every process (the update stages run in a process pool) append records to
+#   PROFILE_PATH/stages-<pid>.jsonl; write_report merges them into PROFILE_PATH/report.json
+
+
+# ### settings are kept in the environment so that stage processes profile as well ### #
+def configure(profile_path = None, cprofile = False, memory = False):
+    os.environ['SPEAKINGCHARTS_PROFILE_PATH'] = tools.make_dir(profile_path)
+    os.environ['SPEAKINGCHARTS_PROFILE_CPROFILE'] = '1' if cprofile else '0'
+    os.environ['SPEAKINGCHARTS_PROFILE_MEMORY'] = '1' if memory else '0'
+
+def profile_path():
+    return os.environ.get('SPEAKINGCHARTS_PROFILE_PATH', None)
+
+def enabled():
+    return profile_path() is not None
+
+def _flag(name):
+    return os.environ.get(name, '0') == '1'
+
+def process_peak_rss_mb():
+    """
+    high water mark of the resident memory over the lifetime of this process
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on linux
+    return peak/1024**2 if sys.platform == 'darwin' else peak/1024
+
+_page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def rss_mb():
+    """
+    current resident memory of this process; None where /proc is not available (macOS)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*_page_size/1024**2
+    except (OSError, ValueError, IndexError):
+        return None
+
+# ### peak memory of stages ### #
+# ru_maxrss is the peak of the whole process: every stage after the heaviest one would report its peak
+# one sampler thread per process reads the current rss every SAMPLE_SECONDS for all open stages;
+#   a stage that raises the process peak takes the exact peak from ru_maxrss
+SAMPLE_SECONDS = 0.05
+_sampled = {}
+_sampler_lock = threading.Lock()
+_sampler = {'thread': None}
+
+def _sample():
+    while True:
+        time.sleep(SAMPLE_SECONDS)
+        current = rss_mb()
+        with _sampler_lock:
+            if current is not None:
+                for token in _sampled:
+                    _sampled[token] = max(_sampled[token], current)
+            if len(_sampled) == 0:
+                _sampler['thread'] = None
+                return
+
+def _open_memory(token):
+    start = rss_mb()
+    with _sampler_lock:
+        _sampled[token] = start or 0.0
+        if _sampler['thread'] is None and start is not None:
+            _sampler['thread'] = threading.Thread(target = _sample, daemon = True, name = 'profiling-rss')
+            _sampler['thread'].start()
+    return start, process_peak_rss_mb()
+
+def _close_memory(token, start, process_peak):
+    """
+    returns rss at the start, peak rss and the increase of rss (peak - start) of a stage in MB
+    """
+    end = rss_mb()
+    with _sampler_lock:
+        peak = _sampled.pop(token)
+    peak = max(peak, end or 0.0)
+    end_process_peak = process_peak_rss_mb()
+    if end_process_peak > process_peak:
+        peak = max(peak, end_process_peak)
+    if start is None:
+        # without /proc only stages that raise the process peak have a known peak
+        return None, (end_process_peak if end_process_peak > process_peak else None), end_process_peak - process_peak
+    return start, peak, peak - start
+
+_write_lock = threading.Lock()
+# one cProfile and one tracemalloc stack per process; nested stages and stages of other threads are not profiled by them
+_state = {'cprofile': False, 'traced': []}
+_state_lock = threading.Lock()
+
+def _write_record(record):
+    file_name = path.join(profile_path(), f'stages-{os.getpid()}.jsonl')
+    with _write_lock:
+        with open(file_name, 'a') as f:
+            f.write(json.dumps(record, default = str) + '\n')
+
+@contextlib.contextmanager
+def stage(name, cprofile = True, **labels):
+    """
+    records wall time, cpu time and memory of the block as stage name
+        labels: e.g. index = 'SP500', ticker = 'AAPL'; stages are summed by name and index
+        cprofile: False for small stages with many records (one fetch)
+    cpu_seconds is the cpu time of the process (threads of the stage included);
+        thread_cpu_seconds is the cpu time of the calling thread
+    peak_rss_mb is the peak resident memory of the process while the stage ran and rss_increase_mb
+        its increase over rss_start_mb; process_peak_rss_mb (lifetime peak) is kept for reference only
+    """
+    if not enabled():
+        yield
+        return
+    main_thread = threading.current_thread() is threading.main_thread()
+    profiler = None
+    with _state_lock:
+        if cprofile and main_thread and _flag('SPEAKINGCHARTS_PROFILE_CPROFILE') and not _state['cprofile']:
+            _state['cprofile'] = True
+            profiler = cProfile.Profile()
+    traced = main_thread and _flag('SPEAKINGCHARTS_PROFILE_MEMORY')
+    if traced:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if _state['traced']:
+            # the peak of the enclosing stage so far is kept before the peak is reset
+            _state['traced'][-1] = max(_state['traced'][-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        _state['traced'].append(0)
+    started = datetime.now()
+    token = object()
+    rss_start, process_peak = _open_memory(token)
+    wall, cpu, thread_cpu = time.perf_counter(), time.process_time(), time.thread_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall, cpu, thread_cpu = time.perf_counter() - wall, time.process_time() - cpu, time.thread_time() - thread_cpu
+        rss_start, peak_rss, rss_increase = _close_memory(token, rss_start, process_peak)
+        record = {'stage': name, 'labels': labels, 'started': started.isoformat(timespec = 'milliseconds'),
+                    'wall_seconds': wall, 'cpu_seconds': cpu, 'thread_cpu_seconds': thread_cpu,
+                        'rss_start_mb': rss_start, 'peak_rss_mb': peak_rss, 'rss_increase_mb': rss_increase,
+                            'process_peak_rss_mb': process_peak_rss_mb(), 'pid': os.getpid(),
+                                'thread': threading.current_thread().name}
+        if traced:
+            peak = max(_state['traced'].pop(), tracemalloc.get_traced_memory()[1])
+            record['peak_traced_mb'] = peak/1024**2
+            if _state['traced']:
+                _state['traced'][-1] = max(_state['traced'][-1], peak)
+            else:
+                tracemalloc.stop()
+        if profiler is not None:
+            dump_path = tools.make_dir(path.join(profile_path(), 'cprofile'))
+            label = '-'.join(str(value) for value in labels.values())
+            record['cprofile'] = path.join(dump_path, f'{name}-{label}-{started.strftime("%H%M%S%f")}.prof'
+                                            if label else f'{name}-{started.strftime("%H%M%S%f")}.prof')
+            profiler.dump_stats(record['cprofile'])
+            with _state_lock:
+                _state['cprofile'] = False
+        _write_record(record)
+
+def read_records(profile_path = None):
+    profile_path = profile_path or os.environ.get('SPEAKINGCHARTS_PROFILE_PATH')
+    records = []
+    for file_name in sorted(os.listdir(profile_path)):
+        if file_name.startswith('stages-') and file_name.endswith('.jsonl'):
+            with open(path.join(profile_path, file_name)) as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+def stage_key(record):
+    index = record['labels'].get('index')
+    return record['stage'] if index is None else record['stage'] + '/' + str(index)
+
+def _max_of(values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+def summarize(records, slowest = 5):
+    """
+    sums records by stage and index: {key: {count, wall and cpu totals, wall percentiles, peak memory}}
+        stages with many records (fetches) keep their slowest records
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(stage_key(record), []).append(record)
+    summary = {}
+    for key in sorted(groups):
+        group = groups[key]
+        walls = np.array([record['wall_seconds'] for record in group])
+        summary[key] = {'count': len(group), 'wall_seconds': float(walls.sum()),
+                    'cpu_seconds': float(sum(record['cpu_seconds'] for record in group)),
+                        'wall_p50': float(np.percentile(walls, 50)), 'wall_p95': float(np.percentile(walls, 95)),
+                            'wall_max': float(walls.max()),
+                                'peak_rss_mb': _max_of(record.get('peak_rss_mb') for record in group),
+                                    'rss_increase_mb': _max_of(record.get('rss_increase_mb') for record in group)}
+        traced = [record['peak_traced_mb'] for record in group if 'peak_traced_mb' in record]
+        if traced:
+            summary[key]['peak_traced_mb'] = max(traced)
+        if len(group) > slowest:
+            summary[key]['slowest'] = [{'labels': record['labels'], 'wall_seconds': record['wall_seconds']}
+                        for record in sorted(group, key = lambda record: record['wall_seconds'], reverse = True)[:slowest]]
+        else:
+            summary[key]['cprofile'] = [record['cprofile'] for record in group if 'cprofile' in record]
+    return summary
+
+def write_report(profile_path = None, wall_seconds = None, **meta):
+    """
+    writes PROFILE_PATH/report.json and returns it; meta is stored as it is (input file, asset, ...)
+    """
+    profile_path = profile_path or os.environ.get('SPEAKINGCHARTS_PROFILE_PATH')
+    report = {'meta': dict(meta, wall_seconds = wall_seconds, written = datetime.now().isoformat(timespec = 'seconds')),
+                'stages': summarize(read_records(profile_path))}
+    with open(path.join(profile_path, 'report.json'), 'w') as f:
+        json.dump(report, f, indent = 2, default = str)
+    return report
+
+def print_report(report):
+    print(f'{"stage":<60}{"count":>8}{"wall s":>12}{"cpu s":>12}{"peak rss MB":>14}{"rss +MB":>10}')
+    for key, summary in report['stages'].items():
+        peak, increase = summary.get('peak_rss_mb'), summary.get('rss_increase_mb')
+        print(f'{key:<60}{summary["count"]:>8}{summary["wall_seconds"]:>12.2f}{summary["cpu_seconds"]:>12.2f}'
+                f'{"-" if peak is None else f"{peak:.0f}":>14}{"-" if increase is None else f"{increase:.0f}":>10}')
+
+def diff_reports(old, new):
+    """
+    returns {key: {old, new wall seconds and their ratio}} of stages in both reports
+    """
+    diff = {}
+    for key in sorted(set(old['stages']) | set(new['stages'])):
+        old_wall = old['stages'].get(key, {}).get('wall_seconds')
+        new_wall = new['stages'].get(key, {}).get('wall_seconds')
+        ratio = new_wall/old_wall if old_wall and new_wall is not None else None
+        diff[key] = {'old_wall_seconds': old_wall, 'new_wall_seconds': new_wall, 'ratio': ratio}
+    return diff
+
+if __name__ == '__main__':
+    # python -m source.utils.profiling old/report.json new/report.json
+    with open(sys.argv[1]) as f:
+        old_report = json.load(f)
+    with open(sys.argv[2]) as f:
+        new_report = json.load(f)
+    print(f'{"stage":<60}{"old s":>12}{"new s":>12}{"ratio":>10}')
+    for key, stage_diff in diff_reports(old_report, new_report).items():
+        old_wall, new_wall, ratio = stage_diff['old_wall_seconds'], stage_diff['new_wall_seconds'], stage_diff['ratio']
+        print(f'{key:<60}{"-" if old_wall is None else f"{old_wall:.2f}":>12}'
+                f'{"-" if new_wall is None else f"{new_wall:.2f}":>12}{"-" if ratio is None else f"{ratio:.2f}":>10}')
@@ -0,0 +1,288 @@
+# ############################################# #
+# Data providers of price history, fundamentals #
+# and FRED series: yfinance/FRED and a local    #
+# fake provider for load tests                  #
+# ############################################# #
+import os
+import re
+import json
+import time
+import zlib
+import random
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from datetime import date
+from threading import Lock
+import numpy as np
+import pandas as pd
+import pandas_datareader.data as web
+import yfinance as yf
+from . import keys, tools
+
+# SPEAKINGCHARTS_PROVIDER: yahoo (yfinance and FRED; default) or fake
+# SPEAKINGCHARTS_PROVIDER_OPTIONS: json of keyword arguments of the provider,
+#   e.g. {"latency": 0.2, "error_rate": 0.05, "rate_limit": 20, "retries": 2}
+
+
+class ProviderError(ConnectionError):
+    """
+    a transient error of a provider; calls are retried up to retries times
+    """
+    pass
+
+
+class ProviderThrottled(ProviderError):
+    """
+    the provider refused a request over its rate limit (HTTP 429)
+    """
+    pass
+
+
+class DataProvider(metaclass = ABCMeta):
+    """
+    all calls of upstream data sources go through a provider
+        info: the info dictionary of a ticker (yf.Ticker.info)
+        history: price history of a ticker (yf.Ticker.history); the index is timezone aware
+        download: history of a batch of tickers in one call (yf.download);
+            a frame with (ticker, field) columns or a single frame for one ticker
+        index_history: history of a market index (yf.download of one symbol)
+        fred_series: series of FRED (pandas_datareader)
+    transient errors are retried with exponential backoff; stats counts requests, errors,
+        throttled requests and retries of each call
+    network: False for providers that serve local data; their responses are not recorded by http_cache
+    """
+    name = None
+    network = True
+    transient_errors = (ProviderError, ConnectionError, TimeoutError)
+
+    def __init__(self, retries = 0, backoff = 1.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {}
+        self._stats_lock = Lock()
+
+    def _count(self, call, what):
+        with self._stats_lock:
+            self.stats.setdefault(call, {'requests': 0, 'errors': 0, 'throttled': 0, 'retries': 0})[what] += 1
+
+    def _call(self, call, func, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self._count(call, 'requests')
+            try:
+                return func(*args, **kwargs)
+            except self.transient_errors as error:
+                self._count(call, 'throttled' if isinstance(error, ProviderThrottled) else 'errors')
+                if attempt == self.retries:
+                    raise
+                self._count(call, 'retries')
+                time.sleep(self.backoff*2**attempt)
+
+    def info(self, symbol):
+        return self._call('info', self._info, symbol)
+
+    def history(self, symbol, period = None, interval = None, start_date = None, end_date = None):
+        return self._call('history', self._history, symbol, period = period, interval = interval,
+                    start_date = start_date, end_date = end_date)
+
+    def download(self, symbols, threads = 8, **time_kwargs):
+        return self._call('download', self._download, symbols, threads = threads, **time_kwargs)
+
+    def index_history(self, symbol, start = None, end = None):
+        return self._call('index_history', self._index_history, symbol, start = start, end = end)
+
+    def fred_series(self, series, start = None, end = None):
+        return self._call('fred_series', self._fred_series, series, start = start, end = end)
+
+    @abstractmethod
+    def _info(self, symbol):
+        pass
+
+    @abstractmethod
+    def _history(self, symbol, period = None, interval = None, start_date = None, end_date = None):
+        pass
+
+    @abstractmethod
+    def _download(self, symbols, threads = 8, **time_kwargs):
+        pass
+
+    @abstractmethod
+    def _index_history(self, symbol, start = None, end = None):
+        pass
+
+    @abstractmethod
+    def _fred_series(self, series, start = None, end = None):
+        pass
+
+
+class YahooProvider(DataProvider):
+    """
+    yfinance for tickers and indices, FRED for series
+    """
+    name = 'yahoo'
+
+    def _info(self, symbol):
+        return yf.Ticker(symbol).info
+
+    def _history(self, symbol, period = None, interval = None, start_date = None, end_date = None):
+        if start_date is None and end_date is None:
+            return yf.Ticker(symbol).history(period = period, interval = interval)
+        return yf.Ticker(symbol).history(start = start_date, end = end_date)
+
+    def _download(self, symbols, threads = 8, **time_kwargs):
+        return yf.download(symbols, group_by = 'ticker', auto_adjust = True, actions = True,
+                    threads = threads, progress = False, **time_kwargs)
+
+    def _index_history(self, symbol, start = None, end = None):
+        return yf.download(symbol, start = start, end = end)
+
+    def _fred_series(self, series, start = None, end = None):
+        return web.DataReader(series, 'fred', start, end)
+
+
+class FakeProvider(DataProvider):
+    """
+    serves deterministic synthetic data without the network
+        the history of a symbol is a random walk seeded by the symbol and seed; every call
+            returns the same bars, so runs with the same options are reproducible
+        latency: seconds each request takes; jitter: relative spread of the latency
+        error_rate: fraction of requests that fail with ProviderError
+        rate_limit: requests accepted per second; requests over the limit fail with ProviderThrottled
+    a batch download is one request, as with yf.download
+    """
+    name = 'fake'
+    network = False
+    periods = {'d': 1, 'wk': 5, 'mo': 21, 'y': 252}
+    intervals = {'1d': None, '5d': '5B', '1wk': 'W-FRI', '1mo': 'BM', '3mo': 'BQ'}
+
+    def __init__(self, latency = 0.0, jitter = 0.0, error_rate = 0.0, rate_limit = None,
+                    seed = 0, start = '2000-01-01', retries = 0, backoff = 0.1):
+        super(FakeProvider, self).__init__(retries = retries, backoff = backoff)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.seed = seed
+        self.dates = pd.bdate_range(start = tools.to_date(start), end = date.today())
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        self._recent = deque()
+
+    def _request(self):
+        """
+        waits for the latency of a request and fails it by the error rate or the rate limit
+        """
+        with self._lock:
+            if self.rate_limit is not None:
+                now = time.monotonic()
+                while len(self._recent) > 0 and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    raise ProviderThrottled('fake provider: rate limit exceeded')
+                self._recent.append(now)
+            delay = self.latency*(1 + self.jitter*self._random.uniform(-1, 1))
+            failed = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise ProviderError('fake provider: request failed')
+
+    def _rng(self, symbol):
+        return np.random.default_rng([self.seed, zlib.crc32(str(symbol).encode())])
+
+    def _bars(self, symbol):
+        rng = self._rng(symbol)
+        num_days = len(self.dates)
+        # one of five symbols is listed after the first date
+        first = int(rng.integers(0, num_days//2)) if rng.random() < 0.2 else 0
+        close = rng.uniform(5, 500)*np.exp(np.cumsum(rng.normal(0.0003, 0.02, num_days - first)))
+        open_ = close*(1 + rng.normal(0, 0.005, len(close)))
+        spread = np.abs(rng.normal(0, 0.01, len(close)))
+        return pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close)*(1 + spread),
+                    'Low': np.minimum(open_, close)*(1 - spread), 'Close': close,
+                        'Volume': rng.lognormal(13, 1, len(close)).astype(np.int64),
+                            'Dividends': 0.0, 'Stock Splits': 0.0}, index = self.dates[first:])
+
+    def _select(self, bars, period = None, interval = None, start_date = None, end_date = None):
+        if start_date is not None or end_date is not None:
+            start_date = bars.index[0] if start_date is None else pd.Timestamp(tools.to_date(start_date))
+            end_date = bars.index[-1] if end_date is None else pd.Timestamp(tools.to_date(end_date))
+            bars = bars[(bars.index >= start_date) & (bars.index <= end_date)]
+        elif period == 'ytd':
+            bars = bars[bars.index.year == bars.index[-1].year]
+        elif period not in (None, 'max'):
+            number, unit = re.fullmatch(r'(\d+)(d|wk|mo|y)', period).groups()
+            bars = bars.iloc[-int(number)*self.periods[unit]:]
+        rule = self.intervals.get(interval or '1d')
+        if rule is not None:
+            bars = bars.resample(rule).agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+                        'Volume': 'sum', 'Dividends': 'sum', 'Stock Splits': 'sum'}).dropna(subset = ['Close'])
+        return bars
+
+    def _info(self, symbol):
+        self._request()
+        rng = self._rng(symbol)
+        info = {key: float(rng.uniform(0, 10)) for key in keys.FUNDAMENTALS_NUMERIC_KEYS.values()}
+        info.update({key: str(symbol) for key in keys.FUNDAMENTALS_ID_KEYS.values()})
+        sectors = sorted(keys.SECTOR_KEYS.keys())
+        info.update({'marketCap': float(rng.lognormal(22, 1.5)), 'trailingPE': float(rng.uniform(5, 60)),
+                    'dividendYield': float(rng.uniform(0, 0.05)), 'sector': sectors[int(rng.integers(0, len(sectors)))],
+                        'shortName': f'{symbol} Fake Inc'})
+        return info
+
+    def _history(self, symbol, period = None, interval = None, start_date = None, end_date = None):
+        self._request()
+        bars = self._select(self._bars(symbol), period = period, interval = interval,
+                    start_date = start_date, end_date = end_date)
+        return bars.tz_localize('America/New_York')
+
+    def _download(self, symbols, threads = 8, **time_kwargs):
+        self._request()
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        frames = {symbol: self._select(self._bars(symbol), period = time_kwargs.get('period'),
+                        interval = time_kwargs.get('interval'), start_date = time_kwargs.get('start'),
+                            end_date = time_kwargs.get('end')) for symbol in symbols}
+        if len(symbols) == 1:
+            return frames[symbols[0]]
+        return pd.concat(frames, axis = 1)
+
+    def _index_history(self, symbol, start = None, end = None):
+        self._request()
+        bars = self._select(self._bars(symbol), start_date = start, end_date = end)
+        bars = bars.drop(columns = ['Dividends', 'Stock Splits'])
+        bars.insert(4, 'Adj Close', bars['Close'])
+        return bars
+
+    def _fred_series(self, series, start = None, end = None):
+        self._request()
+        series = [series] if isinstance(series, str) else list(series)
+        values = pd.DataFrame({name: 4 + np.cumsum(self._rng(name).normal(0, 0.02, len(self.dates)))
+                        for name in series}, index = pd.DatetimeIndex(self.dates, name = 'DATE'))
+        return self._select(values, start_date = start, end_date = end)
+
+
+PROVIDERS = {'yahoo': YahooProvider, 'fake': FakeProvider}
+
+# ### the provider is chosen in the environment so that stage processes use the same one ### #
+def configure(name = None, **options):
+    """
+    name: a key of PROVIDERS; options: keyword arguments of the provider
+    """
+    if name is not None:
+        if name not in PROVIDERS:
+            raise ValueError(f'provider must be one of {list(PROVIDERS.keys())}')
+        os.environ['SPEAKINGCHARTS_PROVIDER'] = name
+    os.environ['SPEAKINGCHARTS_PROVIDER_OPTIONS'] = json.dumps(options)
+
+_providers = {}
+_providers_lock = Lock()
+
+def get_provider():
+    """
+    the provider of this process; one instance is shared by all threads
+    """
+    name = os.environ.get('SPEAKINGCHARTS_PROVIDER', 'yahoo')
+    options = os.environ.get('SPEAKINGCHARTS_PROVIDER_OPTIONS', '{}')
+    with _providers_lock:
+        if (name, options) not in _providers:
+            _providers[(name, options)] = PROVIDERS[name](**json.loads(options))
+        return _providers[(name, options)]
@@ -0,0 +1,112 @@
+# ############################################# #
+# Runs update stages as a dependency graph;     #
+# independent stages run in parallel processes  #
+# ############################################# #
+import traceback
+from datetime import datetime
+from timeit import default_timer
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+def _run_stage(func, kwargs):
+    """
+    runs in a worker process; returns the wall time of the stage and its error (None if it succeeded)
+        errors are returned as text; exceptions of some libraries can not be pickled
+    """
+    start = default_timer()
+    try:
+        func(**kwargs)
+    except Exception as error:
+        return default_timer() - start, repr(error) + '\n' + traceback.format_exc()
+    return default_timer() - start, None
+
+
+class StageScheduler:
+    """
+    stages are functions with keyword arguments and a list of stages they depend on
+        a stage is submitted to the process pool as soon as all of its dependencies succeed
+        if a stage fails, stages that depend on it (directly or not) are skipped and all other stages run
+    functions and arguments must be picklable (module level functions)
+    initializer and initargs are passed to the process pool; for example to set data paths in workers
+    report: {stage: {'status': 'done' | 'failed' | 'skipped', 'seconds', 'started', 'error'}}
+    """
+    def __init__(self, max_workers = None, initializer = None, initargs = ()):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.stages = {}
+        self.report = {}
+        self.wall_time = 0
+
+    def add(self, name, func, depends_on = (), **kwargs):
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f'stage {name} depends on {dependency} which is not added yet')
+        self.stages[name] = {'func': func, 'kwargs': kwargs, 'depends_on': list(depends_on)}
+        return self
+
+    @property
+    def failed(self):
+        return [name for name, stage in self.report.items() if stage['status'] != 'done']
+
+    def _ready(self, pending):
+        return [name for name in pending
+                    if all(self.report.get(dependency, {}).get('status') == 'done'
+                            for dependency in self.stages[name]['depends_on'])]
+
+    def _skip_dependents(self, pending):
+        # a stage is skipped once one of its dependencies did not finish
+        skipped = True
+        while skipped:
+            skipped = False
+            for name in list(pending):
+                blocked = [dependency for dependency in self.stages[name]['depends_on']
+                            if self.report.get(dependency, {}).get('status') in ('failed', 'skipped')]
+                if blocked:
+                    self.report[name] = {'status': 'skipped', 'seconds': 0, 'started': None,
+                                            'error': 'dependency failed: ' + ', '.join(blocked)}
+                    pending.remove(name)
+                    skipped = True
+
+    def run(self):
+        """
+        runs all stages and returns the report; exceptions of stages are kept in the report
+        """
+        self.report = {}
+        pending = list(self.stages.keys())
+        running = {}
+        start = default_timer()
+        with ProcessPoolExecutor(max_workers = self.max_workers, initializer = self.initializer,
+                                    initargs = self.initargs) as executor:
+            while pending or running:
+                for name in self._ready(pending):
+                    stage = self.stages[name]
+                    print(f'stage {name} started')
+                    running[executor.submit(_run_stage, stage['func'], stage['kwargs'])] = (name, datetime.now())
+                    pending.remove(name)
+                if not running:
+                    break
+                done, _ = wait(running, return_when = FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    try:
+                        seconds, error = future.result()
+                    except Exception as pool_error:
+                        # the worker process died (killed, out of memory, ...)
+                        seconds, error = (datetime.now() - started).total_seconds(), repr(pool_error)
+                    if error is None:
+                        print(f'stage {name} finished in {seconds:.1f} seconds')
+                    else:
+                        print(f'stage {name} failed after {seconds:.1f} seconds: {error}')
+                    self.report[name] = {'status': 'done' if error is None else 'failed', 'seconds': seconds,
+                                            'started': started, 'error': None if error is None else error.splitlines()[0]}
+                self._skip_dependents(pending)
+        self.wall_time = default_timer() - start
+        return self.report
+
+    def print_report(self):
+        print(f'{"stage":<20}{"status":<10}{"seconds":>10}  error')
+        for name in self.stages:
+            stage = self.report.get(name, {'status': 'not run', 'seconds': 0, 'error': None})
+            print(f'{name:<20}{stage["status"]:<10}{stage["seconds"]:>10.1f}  {stage["error"] or ""}')
+        print(f'all stages finished within {self.wall_time:.1f} seconds')
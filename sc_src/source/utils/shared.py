@@ -0,0 +1,68 @@
+# ############################################# #
+# Read only, memory mapped datasets shared by   #
+# all workers of the app                        #
+# ############################################# #
+import os
+import resource
+from os import path
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# ### files are written next to the target and renamed: workers that mapped the old
+# ### file keep reading it and new workers map the new one
+def write_array(array, file_name):
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array), allow_pickle = False)
+    os.replace(tmp_name, file_name)
+
+def read_array(file_name, mmap_mode = 'r'):
+    """
+    with mmap_mode = 'r' pages of the array are read from the page cache on first
+        access and shared by every process that maps the same file
+    """
+    return np.load(file_name, mmap_mode = mmap_mode, allow_pickle = False)
+
+def write_table(frame, file_name):
+    """
+    writes a dataframe as an uncompressed Arrow IPC (feather v2) file so that it can be mapped
+    """
+    tmp_name = file_name + '.tmp'
+    feather.write_feather(frame.reset_index(drop = True), tmp_name, compression = 'uncompressed')
+    os.replace(tmp_name, file_name)
+
+def read_table(file_name):
+    """
+    maps an Arrow IPC file; numeric columns without nulls are converted to
+        pandas without copies and stay backed by the mapped file
+    """
+    table = pa.ipc.open_file(pa.memory_map(file_name, 'r')).read_all()
+    return table.to_pandas(split_blocks = True)
+
+# ### memory report of the current process ### #
+def memory_usage():
+    """
+    resident memory of this process in kB
+        rss: resident pages including pages shared with other processes
+        pss: proportional share; shared pages are divided by the number of processes mapping them
+            the sum of pss over all workers is the physical memory used by the app
+        shared and private: resident pages shared with other processes or private to this one
+    on systems without /proc only the peak rss is reported
+    """
+    usage = {'pid': os.getpid()}
+    rollup = '/proc/self/smaps_rollup'
+    if not path.exists(rollup):
+        usage['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage
+    fields = {}
+    with open(rollup) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    usage.update({'rss': fields.get('Rss'), 'pss': fields.get('Pss'),
+                    'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+                        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)})
+    return usage
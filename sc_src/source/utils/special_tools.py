@@ -9,26 +9,32 @@ import re
 import requests 
 import pandas as pd 
 from . import keys, tools 
+from . fetcher import AsyncFetcher, JsonCache 
+from . import http_cache 
 from bs4 import BeautifulSoup
 #from pandas_datareader.nasdaq_trader import get_nasdaq_symbols 
 from datetime import date, datetime  
 from os import path 
 
 # ############## Nasdaq List of Companies ################# #
+@http_cache.cached('wikipedia', ttl = 24)
+def pull_nasdaq_companies():
+    url = 'https://en.wikipedia.org/wiki/Nasdaq-100'
+    headers = { 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:101.0) Gecko/20100101 Firefox/101.0',
+                    'Accept': 'application/json',
+                        'Accept-Language': 'en-US,en;q=0.5'}
+    response = requests.get(url, headers = headers)
+    soup = BeautifulSoup(response.content, 'html.parser')
+    tables = soup.find_all('table')
+    return pd.read_html(str(tables))[4]
+
 def generate_nasdaq_companies():
     """
     generates a dataframe of Nasdaq Companies; column names are:
         Company, Symbol, GIGS Sector GICS Sub-Industry 
     """
-    url = 'https://en.wikipedia.org/wiki/Nasdaq-100'
-    headers = { 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:101.0) Gecko/20100101 Firefox/101.0',
-                    'Accept': 'application/json',
-                        'Accept-Language': 'en-US,en;q=0.5'}
     try:
-        response = requests.get(url, headers = headers)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        tables = soup.find_all('table')
-        nasdaq_df = pd.read_html(str(tables))[4]
+        nasdaq_df = pull_nasdaq_companies()
         nasdaq_df.rename(columns = {'Ticker':'Symbol'}, inplace = True)
         nasdaq_df.to_csv(path.join(keys.DATA_PATH, 'Nasdaq_Companies.csv'), sep = ',', header = True, index = False)
     except Exception as ex:
@@ -102,38 +108,64 @@ def parse_row(row, asset_fund = None):
                 asset_fund[key] = float(values[0])*factor 
     return asset_fund 
         
-def pull_fundamentals_finviz(stock_list = None):
-     
-     total_length = len(stock_list)
-     BATCH_SIZE = 4
-     stock_batch = tools.batched(stock_list, BATCH_SIZE)
-     url_base = 'https://finviz.com/quote.ashx?t='
-     request_headers = {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:76.0) Gecko/20100101 Firefox/76.0'}
+FINVIZ_URL = 'https://finviz.com/quote.ashx?t='
+FINVIZ_HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:76.0) Gecko/20100101 Firefox/76.0'}
 
-     list_df = []
-     downloaded = 0 
-     for tickers in stock_batch:
-         time.sleep(20)
-         print(f'start downloading {tickers} after the pause; {downloaded} out of {total_length} so far')
-         for ticker in tickers:
-             asset_url = url_base + ticker  
-             html_soup = BeautifulSoup(requests.get(asset_url, headers = request_headers).content, 'html.parser')
-             asset_fund = {'P/E': None, 'EPS-ttm': None, 'Shares Outstanding': None, 
-                 'Market Cap': None, 'Floating Shares': None, 
-                         'PEG': None, 'P/S': None, 'Book/Share Ratio': None, 
-                             'ROA': None, 'Dividend $': None, 'Dividend %': None, 
-                                 'D/E': None, 'Stock': ticker}
-        
-             for row in html_soup.select('.snapshot-table2 tr'):
-                 asset_fund = parse_row(row, asset_fund=asset_fund)
-        
-             asset_df = pd.DataFrame([asset_fund])
-             if list(asset_df.columns) == list(asset_fund.keys()):
-                 list_df.append(asset_df)
-         downloaded += len(list_df)*BATCH_SIZE
-     list_df = pd.concat(list_df)
-     save_name = 'list_of_stocks_fundamentals_from_finviz_on_' + datetime.now().strftime('%Y-%m-%d-%H-%M') + '.csv'
-     list_df.to_csv(path.join(keys.DATA_PATH, save_name), sep = ',', header = True, index = False, float_format = '%.4f')
+def parse_finviz_page(ticker, content):
+    """
+    returns the fundamentals dictionary of a finviz quote page
+    """
+    html_soup = BeautifulSoup(content, 'html.parser')
+    asset_fund = {'P/E': None, 'EPS-ttm': None, 'Shares Outstanding': None, 
+        'Market Cap': None, 'Floating Shares': None, 
+                'PEG': None, 'P/S': None, 'Book/Share Ratio': None, 
+                    'ROA': None, 'Dividend $': None, 'Dividend %': None, 
+                        'D/E': None, 'Stock': ticker}
+    for row in html_soup.select('.snapshot-table2 tr'):
+        asset_fund = parse_row(row, asset_fund=asset_fund)
+    return asset_fund
+
+def pull_fundamentals_finviz(stock_list = None, base_url = FINVIZ_URL, rate = 1.0, burst = 1,
+                                concurrency = 4, retries = 3, cache_hours = 24, save_data = True):
+    """
+    pulls finviz fundamentals of stock_list and returns a dataframe with one row per ticker
+        at most rate requests per second are sent (see fetcher.AsyncFetcher); the
+            time of a refresh is bounded by the rate, not by pauses between batches
+        parsed fundamentals are cached per ticker in DATA_PATH/finviz_cache.json; tickers
+            pulled within cache_hours are not pulled again
+    base_url: quote page url without the ticker; e.g. a local test server
+    """
+    cache = JsonCache(path.join(keys.DATA_PATH, 'finviz_cache.json'), ttl_hours = cache_hours)
+    fundamentals = {ticker: cache.get(ticker) for ticker in stock_list}
+    missing = [ticker for ticker, fund in fundamentals.items() if fund is None]
+    print(f'pulling finviz fundamentals of {len(missing)} tickers; {len(stock_list) - len(missing)} are cached')
+
+    num_results = 0
+    def on_result(ticker, asset_fund):
+        nonlocal num_results
+        cache.put(ticker, asset_fund)
+        num_results += 1
+        # the cache is saved every 25 results of this pull; an interrupted refresh keeps what it pulled
+        #   (stale tickers replace their entries, so the number of entries is not a count of results)
+        if num_results % 25 == 0:
+            cache.save()
+
+    fetcher = AsyncFetcher(rate = rate, burst = burst, concurrency = concurrency, retries = retries,
+                    headers = FINVIZ_HEADERS)
+    try:
+        pulled, failures = fetcher.run({ticker: base_url + ticker for ticker in missing},
+                                parse = parse_finviz_page, on_result = on_result)
+    finally:
+        cache.save()
+    fundamentals.update(pulled)
+    for ticker, error in failures.items():
+        print(f'did not pull finviz fundamentals of {ticker}: {error.reason}')
+
+    list_df = pd.DataFrame([fund for fund in fundamentals.values() if fund is not None])
+    if save_data:
+        save_name = 'list_of_stocks_fundamentals_from_finviz_on_' + datetime.now().strftime('%Y-%m-%d-%H-%M') + '.csv'
+        list_df.to_csv(path.join(keys.DATA_PATH, save_name), sep = ',', header = True, index = False, float_format = '%.4f')
+    return list_df
 
 def pull_fundamentals(source = 'finviz', stock_list = None):
     {'finviz': pull_fundamentals_finviz}[source](stock_list = stock_list)
@@ -0,0 +1,118 @@
+# ############################################# #
+# Columnar on-disk store of price history and   #
+# fundamentals of all assets in an index        #
+# ############################################# #
+import os
+from os import path
+import numpy as np
+import pandas as pd
+from . import tools
+
+
+class PriceStore:
+    """
+    a directory with two parquet tables
+        prices: long table of bars with Ticker and Date columns, sorted by Ticker then Date
+            row groups are contiguous in Ticker; filters on Ticker skip row groups of other tickers
+        fundamentals: one row of fundamentals per Ticker
+    a subset of tickers, columns or a date window is read without loading the entire table
+    """
+    prices_filename = 'prices.parquet'
+    fundamentals_filename = 'asset_fundamentals.parquet'
+    row_group_size = 100000
+
+    def __init__(self, store_path = None):
+        self.store_path = store_path
+        self.prices_file = path.join(store_path, self.prices_filename)
+        self.fundamentals_file = path.join(store_path, self.fundamentals_filename)
+
+    @property
+    def exists(self):
+        return path.exists(self.prices_file) and path.exists(self.fundamentals_file)
+
+    @staticmethod
+    def _write_parquet(frame, file_name, **kwargs):
+        # written next to the target and renamed so readers never see a half written file
+        tmp_name = file_name + '.tmp'
+        frame.to_parquet(tmp_name, engine = 'pyarrow', index = False, compression = 'snappy', **kwargs)
+        os.replace(tmp_name, file_name)
+
+    @staticmethod
+    def to_long(frames = None):
+        """
+        converts a dictionary of {ticker: dataframe indexed by date} into the long table
+        """
+        long_frames = []
+        for ticker, frame in frames.items():
+            dates = frame.index
+            if dates.tz is not None:
+                dates = dates.tz_localize(None)
+            long_frame = frame.reset_index(drop = True)
+            long_frame.insert(0, 'Date', dates)
+            long_frame.insert(0, 'Ticker', ticker)
+            long_frames.append(long_frame)
+        prices = pd.concat(long_frames, ignore_index = True)
+        return prices.sort_values(['Ticker', 'Date'], kind = 'mergesort', ignore_index = True)
+
+    @staticmethod
+    def split_by_ticker(prices = None):
+        """
+        converts the long table into a dictionary of {ticker: dataframe indexed by date}
+            the table is sorted by ticker, so each frame is a slice of one frame
+        """
+        if len(prices) == 0:
+            return {}
+        tickers = prices['Ticker'].values
+        bounds = np.flatnonzero(tickers[1:] != tickers[:-1]) + 1
+        starts = np.r_[0, bounds]
+        ends = np.r_[bounds, len(tickers)]
+        data = prices.drop(columns = ['Ticker']).set_index('Date')
+        return {tickers[start]: data.iloc[start:end] for start, end in zip(starts, ends)}
+
+    def write(self, frames = None, fundamentals = None):
+        """
+        frames: dictionary of {ticker: history dataframe}
+        fundamentals: dictionary of {ticker: fundamentals dictionary}
+        """
+        tools.make_dir(self.store_path)
+        PriceStore._write_parquet(PriceStore.to_long(frames), self.prices_file,
+                    row_group_size = self.row_group_size)
+        fundamentals_df = pd.DataFrame.from_dict(fundamentals, orient = 'index')
+        fundamentals_df.index.name = 'Ticker'
+        PriceStore._write_parquet(fundamentals_df.reset_index(), self.fundamentals_file)
+
+    def read_prices(self, tickers = None, within_dates = None, columns = None):
+        """
+        returns the long table of prices
+        tickers: list of tickers; all tickers if None
+        within_dates: (start, end) where each end can be None
+        columns: list of bar columns such as ['Close']; all columns if None
+        """
+        filters = []
+        if tickers is not None:
+            filters.append(('Ticker', 'in', list(tickers)))
+        if within_dates is not None:
+            start, end = within_dates
+            if start:
+                filters.append(('Date', '>=', pd.Timestamp(tools.to_date(start))))
+            if end:
+                filters.append(('Date', '<', pd.Timestamp(tools.to_date(end)) + pd.Timedelta(days = 1)))
+        if columns is not None:
+            columns = ['Ticker', 'Date'] + [column for column in columns if column not in ['Ticker', 'Date']]
+        return pd.read_parquet(self.prices_file, engine = 'pyarrow', columns = columns,
+                        filters = filters if len(filters) > 0 else None)
+
+    def read_frames(self, tickers = None, within_dates = None, columns = None):
+        prices = self.read_prices(tickers = tickers, within_dates = within_dates, columns = columns)
+        return PriceStore.split_by_ticker(prices)
+
+    def read_fundamentals(self, tickers = None):
+        """
+        returns a dictionary of {ticker: fundamentals dictionary}
+        """
+        filters = None
+        if tickers is not None:
+            filters = [('Ticker', 'in', list(tickers))]
+        fundamentals_df = pd.read_parquet(self.fundamentals_file, engine = 'pyarrow', filters = filters)
+        fundamentals_df = fundamentals_df.astype(object).where(fundamentals_df.notnull(), None)
+        return fundamentals_df.set_index('Ticker').to_dict(orient = 'index')
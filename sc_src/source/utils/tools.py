@@ -4,8 +4,9 @@ from datetime import datetime, date
 from itertools import islice 
 from os import path, makedirs  
 import plotly.graph_objects as go  
-import pandas as pd 
-from datetime import date,timedelta 
+import pandas as pd
+import numpy as np
+from datetime import date,timedelta
 from dateutil.relativedelta import relativedelta
 
 
@@ -53,31 +54,66 @@ def adjust_dates(start_date, end_date, default_start = None, default_end = None)
 	
 	return start_date, end_date
 
-def choose_dates(frame, within_dates = None):
+# #### date windows #### #
+# frames are sorted by date; windows are found by binary search on day ordinals
+# and returned as positional slices of the frame (no copy of the data) 
+# ordinals: day ordinals of the frame index normalised at load time; computed if not given
+def window_positions(ordinals, within_dates = None):
 	start, end = within_dates
-	if start:
-		start = to_date(start)
-		frame = frame[frame.index.date >= start]
-	if end:
-		end = to_date(end)
-		frame = frame[frame.index.date <= end]
+	first = 0 if not start else np.searchsorted(ordinals, date_to_ordinal(start), side = 'left')
+	last = len(ordinals) if not end else np.searchsorted(ordinals, date_to_ordinal(end), side = 'right')
+	return slice(first, last)
+
+def choose_dates(frame, within_dates = None, ordinals = None):
+	frame = choose_dates_lite(frame, within_dates, ordinals = ordinals)
 	return {True: None,
 			False: frame}[frame.empty] 
 
-# lite version of choose_dates: within_dates is a tuple of [datetime.date, datetime.date]
-choose_dates_lite = lambda frame, within_dates: frame[(frame.index.date >= within_dates[0]) & (frame.index.date <= within_dates[1])]
+# #### day ordinals: int64 number of days since 1970-01-01 #### #
+# timezone aware indices are converted using their local dates  #
+def to_ordinals(index):
+	if getattr(index, 'tz', None) is not None:
+		index = index.tz_localize(None)
+	return pd.DatetimeIndex(index).values.astype('datetime64[D]').astype(np.int64)
+
+def date_to_ordinal(input_date):
+	return np.datetime64(to_date(input_date), 'D').astype(np.int64)
+
+def ordinals_to_dates(ordinals):
+	return pd.DatetimeIndex(np.asarray(ordinals).astype('datetime64[D]'))
+
+def ordinal_to_date(ordinal):
+	return date(1970, 1, 1) + timedelta(days = int(ordinal))
+
+# frames from yf.Ticker.history are timezone aware and frames from yf.download are not
+def align_index_tz(frame, like = None):
+	if like.index.tz is not None and frame.index.tz is None:
+		frame = frame.tz_localize(like.index.tz)
+	elif like.index.tz is None and frame.index.tz is not None:
+		frame = frame.tz_localize(None)
+	elif like.index.tz is not None:
+		frame = frame.tz_convert(like.index.tz)
+	return frame
+
+# lite version of choose_dates: returns an empty frame instead of None 
+def choose_dates_lite(frame, within_dates, ordinals = None):
+	if ordinals is None:
+		ordinals = to_ordinals(frame.index)
+	return frame.iloc[window_positions(ordinals, within_dates)]
 
 
 def find_assets_common_times(*assets):
 	mins = [] 
 	maxs = [] 
-	for asset in assets:
-		mins.append(asset.index.date.min())
-		maxs.append(asset.index.date.max())
-	min_date = max(mins)
-	max_date = min(maxs)
-
-	return [choose_dates(asset, within_dates = (min_date, max_date)) for asset in assets]
+	all_ordinals = [to_ordinals(asset.index) for asset in assets]
+	for ordinals in all_ordinals:
+		mins.append(ordinals[0])
+		maxs.append(ordinals[-1])
+	min_date = ordinal_to_date(max(mins))
+	max_date = ordinal_to_date(min(maxs))
+
+	return [choose_dates(asset, within_dates = (min_date, max_date), ordinals = ordinals) 
+				for asset, ordinals in zip(assets, all_ordinals)]
 
 
 # #### time difference operations #### #
@@ -0,0 +1,66 @@
+# ############################################# #
+# CallbackCache keys, ttl and data versions     #
+# ############################################# #
+import time
+from datetime import date
+from source.graphs.cache import CallbackCache
+
+
+def test_normalise_dates_and_lists():
+    assert CallbackCache.normalise(date(2024, 1, 5)) == '2024-01-05'
+    assert CallbackCache.normalise('2024-01-05T00:00:00') == '2024-01-05'
+    # order of lists is kept unless they are unordered selections; sets are always sorted
+    assert CallbackCache.normalise(['b', 'a']) == ('b', 'a')
+    assert CallbackCache.normalise(['b', 'a'], unordered = True) == ('a', 'b')
+    assert CallbackCache.normalise({'b', 'a'}) == ('a', 'b')
+
+
+def test_memoize_keys():
+    cache = CallbackCache(max_size = 10, ttl = 60)
+    calls = []
+
+    @cache.memoize('graph', ignore = (0,), unordered = (2,))
+    def plot(n_clicks, sort_keys, sectors):
+        calls.append((sort_keys, sectors))
+        return len(calls)
+
+    assert plot(1, ['x', 'y'], ['Energy', 'Utilities']) == 1
+    # clicks are ignored and selected sectors are unordered
+    assert plot(2, ['x', 'y'], ['Utilities', 'Energy']) == 1
+    # sort keys are ordered
+    assert plot(3, ['y', 'x'], ['Energy', 'Utilities']) == 2
+    assert cache.component_stats['graph'] == {'hits': 1, 'misses': 2}
+
+
+def test_ttl_and_size():
+    cache = CallbackCache(max_size = 2, ttl = 0.05)
+    cache.set(('a',), 1)
+    assert cache.get(('a',)) == (True, 1)
+    time.sleep(0.1)
+    assert cache.get(('a',)) == (False, None)
+    for key in ['a', 'b', 'c']:
+        cache.set((key,), key)
+    assert cache.size == 2 and cache.get(('a',)) == (False, None)
+
+
+def test_invalidate_version(tmp_path):
+    cache = CallbackCache(ttl = 60, disk_path = str(tmp_path), version = 'v1')
+    cache.set(('a',), 1)
+    # another worker of the same version reads the result from disk
+    other = CallbackCache(ttl = 60, disk_path = str(tmp_path), version = 'v1')
+    assert other.get(('a',)) == (True, 1)
+    cache.invalidate('v2')
+    assert cache.get(('a',)) == (False, None)
+    assert [version_dir.name for version_dir in tmp_path.iterdir()] in ([], ['v2'])
+
+
+def test_results_of_an_old_version_are_not_cached():
+    cache = CallbackCache(ttl = 60, version = 'v1')
+
+    @cache.memoize('graph')
+    def compute(value):
+        cache.invalidate('v2')
+        return value
+
+    assert compute(1) == 1
+    assert cache.size == 0
@@ -0,0 +1,18 @@
+# ############################################# #
+# TokenBucket pacing                            #
+# ############################################# #
+import asyncio
+import time
+from source.utils.fetcher import TokenBucket
+
+
+def test_token_bucket_pacing():
+    async def acquire_all(bucket, count):
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(count)])
+        return time.monotonic() - start
+
+    # a burst of capacity tokens is immediate; the rest wait 1/rate seconds each
+    seconds = asyncio.run(acquire_all(TokenBucket(rate = 50, capacity = 2), 12))
+    assert 0.18 <= seconds < 1.0
+    assert asyncio.run(acquire_all(TokenBucket(rate = 50, capacity = 5), 5)) < 0.05
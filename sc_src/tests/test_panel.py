@@ -0,0 +1,99 @@
+# ############################################# #
+# PricePanel window calculations against the    #
+# per asset calculations of Asset               #
+# ############################################# #
+import numpy as np
+import pandas as pd
+import pytest
+from source.instruments.securities import Stock
+from source.instruments.panel import PricePanel
+from source.utils import tools
+
+WINDOWS = [None, ('2021-02-01', '2021-08-31'), ('2021-06-15', '2021-06-30'), ('2020-12-24', '2021-01-04')]
+
+
+def make_assets(num_assets = 12, num_days = 400, seed = 0):
+    """
+    random walks on business days with gaps; tickers start and end on different dates
+    """
+    rng = np.random.default_rng(seed)
+    all_dates = pd.bdate_range('2020-06-01', periods = num_days)
+    assets = {}
+    for number in range(num_assets):
+        first = rng.integers(0, num_days//4)
+        last = num_days - rng.integers(0, num_days//5)
+        dates = all_dates[first:last]
+        dates = dates[rng.random(len(dates)) > 0.05]
+        close = 50*np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        data = pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                                'Volume': rng.integers(1, 1000, len(dates))}, index = dates)
+        symbol = 'T' + str(number)
+        fundamentals = {'sector': ['Energy', 'Utilities', 'Financials'][number % 3], 'shortName': symbol}
+        assets[symbol] = Stock.from_data(symbol, data = data, fundamentals = fundamentals)
+    return assets
+
+
+@pytest.fixture(scope = 'module')
+def assets():
+    return make_assets()
+
+
+@pytest.fixture(scope = 'module')
+def panel(assets):
+    return PricePanel.from_assets(assets = assets)
+
+
+def _within(asset, window):
+    return asset.date_range if window is None else (tools.to_date(window[0]), tools.to_date(window[1]))
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_window_returns(assets, panel, window):
+    returns = panel.window_returns(within_dates = window)
+    for row, asset in enumerate(assets.values()):
+        cumulative_return = asset.cumulative_return(within_dates = _within(asset, window), end_point = 'Close')
+        if cumulative_return is None or len(cumulative_return) == 0:
+            assert np.isnan(returns[row])
+        else:
+            assert returns[row] == pytest.approx(cumulative_return.values[-1], rel = 1e-9, abs = 1e-12)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_volatility(assets, panel, window):
+    volatility = panel.volatility(within_dates = window)
+    for row, asset in enumerate(assets.values()):
+        expected = asset.volatility(within_dates = _within(asset, window))
+        if expected is None or np.isnan(expected):
+            assert np.isnan(volatility[row])
+        else:
+            assert volatility[row] == pytest.approx(expected, rel = 1e-7)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_sharpe(assets, panel, window):
+    sharpe = panel.sharpe(within_dates = window, risk_free = 0)
+    for row, asset in enumerate(assets.values()):
+        asset.risk_free = pd.DataFrame({'rate': 0.0}, index = pd.date_range(asset.date_range[0], asset.date_range[1]))
+        expected = asset.sharpe(within_dates = _within(asset, window))
+        if expected is None or np.isnan(expected):
+            assert np.isnan(sharpe[row])
+        else:
+            assert sharpe[row] == pytest.approx(expected, rel = 1e-7)
+
+
+def test_periods_returns_match_window_returns(panel):
+    starts = ['2020-07-01', '2021-01-01', '2021-05-10']
+    ends = ['2020-12-31', '2021-03-31', '2021-05-12']
+    returns = panel.periods_returns(starts = [tools.date_to_ordinal(start) for start in starts],
+                                        ends = [tools.date_to_ordinal(end) for end in ends])
+    for column, window in enumerate(zip(starts, ends)):
+        np.testing.assert_allclose(returns[:, column], panel.window_returns(within_dates = window), rtol = 1e-12)
+
+
+def test_bad_prices_are_missing_bars():
+    prices = np.array([[10.0, 0.0, 11.0, 12.0], [5.0, 5.5, np.inf, 6.0]])
+    panel = PricePanel(tickers = ['A', 'B'], dates = np.arange(18000, 18004), prices = prices,
+                        sectors = ['Energy', 'Energy'], names = ['A', 'B'], latest_prices = [12.0, 6.0])
+    np.testing.assert_allclose(panel.window_returns(), [0.2, 0.2])
+    assert np.isfinite(panel.sum_log_returns).all()
+    assert list(panel.bar_offsets) == [0, 3, 6]
@@ -0,0 +1,37 @@
+# ############################################# #
+# StageScheduler: failed stages only stop the   #
+# stages that depend on them                    #
+# ############################################# #
+from source.utils.scheduler import StageScheduler
+
+
+def succeed():
+    pass
+
+
+def fail():
+    raise ValueError('stage failed')
+
+
+def test_failures_skip_dependents_only():
+    scheduler = StageScheduler(max_workers = 2)
+    scheduler.add('pull', succeed)
+    scheduler.add('broken', fail)
+    scheduler.add('generate', succeed, depends_on = ['broken'])
+    scheduler.add('publish', succeed, depends_on = ['generate'])
+    scheduler.add('report', succeed, depends_on = ['pull'])
+    report = scheduler.run()
+    assert {name: stage['status'] for name, stage in report.items()} == {'pull': 'done', 'broken': 'failed',
+                            'generate': 'skipped', 'publish': 'skipped', 'report': 'done'}
+    assert 'ValueError' in report['broken']['error']
+    assert report['publish']['error'] == 'dependency failed: generate'
+    assert sorted(scheduler.failed) == ['broken', 'generate', 'publish']
+
+
+def test_unknown_dependency():
+    scheduler = StageScheduler()
+    try:
+        scheduler.add('generate', succeed, depends_on = ['pull'])
+    except ValueError:
+        return
+    raise AssertionError('a stage that depends on a stage that is not added must raise')
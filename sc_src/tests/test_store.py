@@ -0,0 +1,43 @@
+# ############################################# #
+# PriceStore round trips                        #
+# ############################################# #
+import numpy as np
+import pandas as pd
+from source.utils.store import PriceStore
+
+
+def make_frames():
+    frames = {}
+    for number, symbol in enumerate(['MSFT', 'AAPL', 'XOM']):
+        dates = pd.bdate_range('2023-01-02', periods = 30 + 10*number)
+        close = np.linspace(10, 20, len(dates)) + number
+        frames[symbol] = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1,
+                                        'Close': close, 'Volume': np.arange(len(dates))}, index = dates)
+    return frames
+
+
+def test_round_trip(tmp_path):
+    frames = make_frames()
+    fundamentals = {symbol: {'sector': 'Technology', 'shortName': symbol, 'marketCap': 1.0e9, 'trailingPE': None}
+                        for symbol in frames}
+    store = PriceStore(str(tmp_path))
+    store.write(frames = frames, fundamentals = fundamentals)
+    assert store.exists
+    read = store.read_frames()
+    assert sorted(read) == sorted(frames)
+    for symbol, frame in frames.items():
+        pd.testing.assert_frame_equal(read[symbol], frame, check_names = False, check_freq = False,
+                                        check_index_type = False)
+    assert store.read_fundamentals() == fundamentals
+
+
+def test_read_subsets(tmp_path):
+    frames = make_frames()
+    store = PriceStore(str(tmp_path))
+    store.write(frames = frames, fundamentals = {symbol: {'sector': 'Energy'} for symbol in frames})
+    read = store.read_frames(tickers = ['XOM'], within_dates = ('2023-01-10', '2023-01-20'), columns = ['Close'])
+    expected = frames['XOM'].loc['2023-01-10':'2023-01-20', ['Close']]
+    assert list(read) == ['XOM']
+    assert list(read['XOM'].columns) == ['Close']
+    np.testing.assert_allclose(read['XOM']['Close'].values, expected['Close'].values)
+    assert store.read_fundamentals(tickers = ['AAPL']) == {'AAPL': {'sector': 'Energy'}}
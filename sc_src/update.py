@@ -3,13 +3,20 @@
 # Updates datasets by reading from an input yml file #
 # ################################################## #
 
-from source.instruments.indices import SP500, Russell3000, Russell2000, Nasdaq 
+from source.instruments.indices import Index, SP500, Russell3000, Russell2000, Nasdaq 
+from source.instruments.master import SecurityMaster 
 from source.analytics.performance import Performance 
 from source.analytics.macro_trends import IndexReturnVSFedAsset 
+from source.utils import builds, keys, http_cache, providers, profiling 
+from source.utils.scheduler import StageScheduler 
 from timeit import default_timer 
 import yaml 
 import argparse 
+import traceback 
+import sys 
 import re 
+from os import path 
+from datetime import datetime 
 
 def parse_inputs(yml_file):
 	try:
@@ -26,88 +33,237 @@ def set_time_interval(period, interval, start_date, end_date):
 		return None, None, start_date, end_date 
 
 
+def ingestion_options(**kwargs):
+	"""
+	options of the bulk downloader; bulk is off unless requested in the input file
+	resume: tickers checkpointed by a failed run within freshness_hours are not pulled again 
+	snapshot: fundamentals are read from the fundamentals snapshot and pulled when stale 
+	"""
+	return {'cap': kwargs.get('cap', 0), 'bulk': kwargs.get('bulk', False),
+				'batch_size': kwargs.get('batch_size', 100), 'max_workers': kwargs.get('max_workers', 8), 
+					'resume': kwargs.get('resume', False), 'freshness_hours': kwargs.get('freshness_hours', 24), 
+						'snapshot': kwargs.get('fundamentals_snapshot', False)}
+
+def pull_index(index_class, period = '5y', interval = '1d', start_date = None, end_date = None, **kwargs):
+	"""
+	pulls all assets of an index or, with incremental: true in the input file,
+		appends the bars missing since the last stored date 
+	with security_master: true the index is read from the master written by update_security_master
+	"""
+	with profiling.stage('pull', index = index_class.__name__):
+		return _pull_index(index_class, period = period, interval = interval, start_date = start_date, 
+					end_date = end_date, **kwargs)
+
+def _pull_index(index_class, period = '5y', interval = '1d', start_date = None, end_date = None, **kwargs):
+	options = ingestion_options(**kwargs)
+	if kwargs.get('security_master', False):
+		return index_class.from_master(incremental = kwargs.get('incremental', False))
+	if kwargs.get('incremental', False):
+		return index_class.update_assets(end_date = end_date, save_data = True, period = period or '5y', interval = interval or '1d',
+					batch_size = options['batch_size'], max_workers = options['max_workers'], snapshot = options['snapshot'])
+	return index_class.pull_assets(period = period, interval = interval, start_date = start_date,
+					end_date = end_date, save_data = True, **options)
+
+def update_security_master(period = '5y', interval = '1d', 
+		start_date = None, end_date = None, **kwargs):
+	"""
+	pulls every ticker of SP500, Russell3000 and Nasdaq once into the security master 
+	"""
+	period, interval, start_date, end_date = set_time_interval(period, interval, start_date, end_date)
+	print('start updating the security master ...')
+	index_classes = [SP500, Russell3000, Nasdaq]
+	with profiling.stage('pull', index = SecurityMaster.dirname):
+		_pull_master(index_classes, period = period, interval = interval, start_date = start_date, 
+					end_date = end_date, **kwargs)
+
+def _pull_master(index_classes, period = '5y', interval = '1d', start_date = None, end_date = None, **kwargs):
+	options = ingestion_options(**kwargs)
+	if kwargs.get('incremental', False):
+		Index.update_master(index_classes, end_date = end_date, period = period or '5y', interval = interval or '1d',
+					batch_size = options['batch_size'], max_workers = options['max_workers'], snapshot = options['snapshot'])
+	else:
+		Index.pull_master(index_classes, period = period, interval = interval, start_date = start_date,
+					end_date = end_date, save_data = True, **options)
+
+def generate_index_data(index, incremental = False):
+	"""
+	generates the datasets of an index; incremental sector returns only add the new periods
+	each step is a stage of the profile report (-profile)
+	"""
+	name = type(index).__name__ 
+	with profiling.stage('generate_sector_mean_return_long', index = name, freq = 'M'):
+		index.generate_sector_mean_return_long(freq = 'M', save_data = True, incremental = incremental)
+	with profiling.stage('generate_sector_mean_return_long', index = name, freq = 'Q'):
+		index.generate_sector_mean_return_long(freq = 'Q', save_data = True, incremental = incremental)	
+	with profiling.stage('generate_index_fundamentals', index = name):
+		index.generate_index_fundamentals()
+	with profiling.stage('generate_price_movement_and_histograms_in_intervals', index = name):
+		index.generate_price_movement_and_histograms_in_intervals()
+	# memory mapped copies of the panel, fundamentals and intervals for the app workers
+	with profiling.stage('save_shared', index = name):
+		index.save_shared()
+
+def save_index(index):
+	with profiling.stage('save', index = type(index).__name__):
+		index.save()
+
 def update_sp500_index(period = '5y', interval = '1d',
 		start_date = None, end_date = None, **kwargs):
 
 	period, interval, start_date, end_date = set_time_interval(period, interval, start_date, end_date)
 	print('start updating SP500 index ...')
-	sp = SP500.pull_assets(period = period, interval = interval, start_date = start_date,
-					end_date = end_date, save_data = True, cap = kwargs.get('cap', 0))
-
-	sp.generate_sector_mean_return_long(freq = 'M', save_data = True)
-	sp.generate_sector_mean_return_long(freq = 'Q', save_data = True)	
-	sp.generate_index_fundamentals()
-	sp.generate_price_movement_and_histograms_in_intervals()
-	sp.add_index()
-	sp.save()
+	sp = pull_index(SP500, period = period, interval = interval, start_date = start_date,
+					end_date = end_date, **kwargs)
+	if not sp.has_new_data:
+		print('SP500 is up to date')
+		return 
+	generate_index_data(sp, incremental = kwargs.get('incremental', False))
+	with profiling.stage('add_index', index = 'SP500'):
+		sp.add_index()
+	save_index(sp)
 
 def update_russell_index(period = '5y', interval = '1d',
 		start_date = None, end_date = None, **kwargs):
 
 	period, interval, start_date, end_date = set_time_interval(period, interval, start_date, end_date)
 	print('start updating Russell2000 and 3000 index ...')
-	ru = Russell3000.pull_assets(period = period, interval = interval, start_date = start_date,
-					end_date = end_date, save_data = True, cap = kwargs.get('cap', 0))
-	ru.generate_sector_mean_return_long(freq = 'M', save_data = True)
-	ru.generate_sector_mean_return_long(freq = 'Q', save_data = True)	
-	ru.generate_index_fundamentals()
-	ru.generate_price_movement_and_histograms_in_intervals()
-	ru.save()
+	ru = pull_index(Russell3000, period = period, interval = interval, start_date = start_date,
+					end_date = end_date, **kwargs)
+	if not ru.has_new_data:
+		print('Russell3000 and Russell2000 are up to date')
+		return 
+	generate_index_data(ru, incremental = kwargs.get('incremental', False))
+	save_index(ru)
 
 	ru2000_assets, ru2000_sectors = ru.generate_russell2000_assets()
 	ru2000_main_save_path = re.sub('3000', '2000', ru.main_save_path)
 	ru2000 = Russell2000(assets = ru2000_assets, sectors = ru2000_sectors,
 	 		main_save_path = ru2000_main_save_path)
+	ru2000.previous_latest_date = ru.previous_latest_date
+	ru2000.adjusted_since = ru.adjusted_since
 	
-	ru2000.save_assets()
-	ru2000.generate_sector_mean_return_long(freq='M', save_data = True)
-	ru2000.generate_sector_mean_return_long(freq = 'Q', save_data = True)
-	ru2000.generate_index_fundamentals()
-	ru2000.generate_price_movement_and_histograms_in_intervals()
-	ru2000.save()
+	with profiling.stage('save_assets', index = 'Russell2000'):
+		ru2000.save_assets(master = SecurityMaster() if kwargs.get('security_master', False) else None)
+	generate_index_data(ru2000, incremental = kwargs.get('incremental', False))
+	save_index(ru2000)
 
 def update_nasdaq(period = '5y', interval = '1d',
 		start_date = None, end_date = None, **kwargs):
 
 	period, interval, start_date, end_date = set_time_interval(period, interval, start_date, end_date)
 	print('start updating Nasdaq ...')
-	nasdaq = Nasdaq.pull_assets(period = period, interval = interval, start_date = start_date,
-					end_date = end_date, save_data = True, cap = kwargs.get('cap', 0))
-	nasdaq.generate_sector_mean_return_long(freq = 'M', save_data = True)
-	nasdaq.generate_sector_mean_return_long(freq = 'Q', save_data = True)	
-	nasdaq.generate_index_fundamentals()
-	nasdaq.generate_price_movement_and_histograms_in_intervals()
-	nasdaq.save()
+	nasdaq = pull_index(Nasdaq, period = period, interval = interval, start_date = start_date,
+					end_date = end_date, **kwargs)
+	if not nasdaq.has_new_data:
+		print('Nasdaq is up to date')
+		return 
+	generate_index_data(nasdaq, incremental = kwargs.get('incremental', False))
+	save_index(nasdaq)
 
 def update_performance_distributions(*args, **kwargs):
 	print('Now updating performance >>>')
-	performance = Performance.load_assets_from_indices()
-	performance.compute_and_save_for_dates() 
+	with profiling.stage('load_assets_from_indices', index = 'Performance'):
+		performance = Performance.load_assets_from_indices()
+	with profiling.stage('compute_and_save_for_dates', index = 'Performance'):
+		performance.compute_and_save_for_dates(incremental = kwargs.get('incremental', False)) 
 
 def update_index_return_vs_fed(start_date = None, end_date = None, **kwargs):
 	print('Now updating index_vs_fed >>>')
-	IndexReturnVSFedAsset.pull_assets(start_date = start_date, end_date = end_date, save_data = True)
+	with profiling.stage('pull', index = 'IndexReturnVSFedAsset'):
+		IndexReturnVSFedAsset.pull_assets(start_date = start_date, end_date = end_date, save_data = True)
+
+def set_data_paths(data_path, load_path):
+	# stage processes write to the same paths as the parent (a versioned build for example)
+	keys.DATA_PATH = data_path 
+	keys.LOAD_PATH = load_path 
 
 def update_all(**kwargs):
-	update_sp500_index(**kwargs)
-	update_russell_index(**kwargs)
-	update_nasdaq(**kwargs)
+	"""
+	stages run in a process pool as soon as the stages they depend on are done
+	a failed stage only stops the stages that depend on it; returns the stages that did not finish
+	with versioned builds the build is still published: it is seeded with the current build,
+		so failed and skipped stages keep the files of the previous update
+	"""
+	scheduler = StageScheduler(max_workers = kwargs.get('stage_workers', None), initializer = set_data_paths, 
+						initargs = (keys.DATA_PATH, keys.LOAD_PATH))
+	# with a security master, indices are built from the tickers pulled once by the securities stage
+	index_depends_on = []
+	if kwargs.get('security_master', False):
+		scheduler.add('securities', update_security_master, **kwargs)
+		index_depends_on = ['securities']
+	scheduler.add('sp500', update_sp500_index, depends_on = index_depends_on, **kwargs)
+	scheduler.add('russell', update_russell_index, depends_on = index_depends_on, **kwargs)
+	scheduler.add('nasdaq', update_nasdaq, depends_on = index_depends_on, **kwargs)
 	# Note that performance distributions can not be calculated without all indices
-	update_performance_distributions()
-	update_index_return_vs_fed(**kwargs)
+	scheduler.add('performance', update_performance_distributions, 
+					depends_on = ['sp500', 'russell', 'nasdaq'], **kwargs)
+	scheduler.add('index_vs_fed', update_index_return_vs_fed, **kwargs)
+	scheduler.run()
+	scheduler.print_report()
+	if scheduler.failed:
+		print(f'update stages did not finish: {", ".join(scheduler.failed)}')
+	return scheduler.failed
 
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description = 'input file')
 	parser.add_argument('-filenames', nargs = '*', type = str, help = 'input files')
+	parser.add_argument('-profile', '--profile', action = 'store_true', 
+				help = 'records wall time, cpu time and peak memory of each stage in a json report')
+	parser.add_argument('-profile_path', type = str, default = None, 
+				help = 'directory of the profile report; defaults to DATA_PATH/profiles/<time>')
+	parser.add_argument('-cprofile', action = 'store_true', help = 'with -profile, a cProfile dump of each stage')
+	parser.add_argument('-trace_memory', action = 'store_true', 
+				help = 'with -profile, peak allocations of each stage are traced (slower)')
 	args = parser.parse_args()
+	# an input file that fails does not stop the next ones; the exit status is 1 if any failed
+	failures = {}
 	for _file in args.filenames:
 		inputs = parse_inputs(_file)
 		start = default_timer()
-		{'sp500': update_sp500_index, 
+		update = {'sp500': update_sp500_index, 
 				'russell': update_russell_index, 
 					'nasdaq': update_nasdaq,
+						'securities': update_security_master,
 						'index_vs_fed': update_index_return_vs_fed,
-						'all': update_all}[inputs['asset']](**inputs)
-		end = default_timer()
-		print(f'finished upading process within {end - start} seconds')
+						'all': update_all}[inputs['asset']]
+		# recorded responses are kept outside of builds; replay runs the pipeline offline
+		# yaml reads an unquoted off as False; every input file sets all options, so a file
+		#	does not inherit the cache of the file before it
+		http_cache.configure(mode = inputs.get('cache_mode') or 'off', ttl_hours = inputs.get('cache_ttl_hours') or {},
+					cache_path = inputs.get('cache_path') or path.join(keys.DATA_PATH, 'http_cache'))
+		# provider: fake serves synthetic data with the latency, errors and throttling of provider_options 
+		providers.configure(inputs.get('provider') or 'yahoo', **(inputs.get('provider_options') or {}))
+		# profiles are kept outside of builds; one directory per input file 
+		if args.profile:
+			profile_path = args.profile_path or path.join(keys.DATA_PATH, 'profiles', 
+						datetime.now().strftime('%Y%m%d-%H%M%S') + '-' + inputs['asset'])
+			if len(args.filenames) > 1:
+				profile_path = path.join(profile_path, path.splitext(path.basename(_file))[0])
+			profiling.configure(profile_path, cprofile = args.cprofile, memory = args.trace_memory)
+		# versioned builds: the update writes a new build that the app swaps in when it is complete
+		#	an update that raises leaves the current build as it is; see update_all for failed stages
+		failed = []
+		try:
+			if inputs.get('versioned_builds', False):
+				with builds.new_build(keep = inputs.get('keep_builds', 3)):
+					failed = update(**inputs) or []
+			else:
+				failed = update(**inputs) or []
+		except Exception:
+			traceback.print_exc()
+			failed = [inputs['asset']]
+		finally:
+			end = default_timer()
+			print(f'finished upading process within {end - start} seconds')
+			if args.profile:
+				report = profiling.write_report(wall_seconds = end - start, input_file = _file, asset = inputs['asset'],
+								failed_stages = failed)
+				profiling.print_report(report)
+				print(f'profile report is written to {path.join(profiling.profile_path(), "report.json")}')
+		if failed:
+			failures[_file] = failed
+	for _file, failed in failures.items():
+		print(f'{_file}: {", ".join(failed)} did not finish')
+	if failures:
+		sys.exit(1)
 